@@ -0,0 +1,55 @@
+class Field:
+    '''
+    Описание поля ответа API: какие поля модели нужно загрузить,
+    какие связи подтянуть через select_related и как получить
+    значение из объекта.
+    '''
+
+    def __init__(self, source, related=None, getter=None):
+        self.source = source
+        self.related = related
+        self.getter = getter
+
+    def get(self, obj):
+        if self.getter is not None:
+            return self.getter(obj)
+        value = obj
+        for attr in self.source.split('__'):
+            value = getattr(value, attr)
+            if value is None:
+                break
+        return value
+
+
+POST_FIELDS = {
+    'id': Field('id'),
+    'text': Field('text'),
+    'pub_date': Field('pub_date'),
+    'author': Field('author__username', related='author'),
+    'group': Field('group__slug', related='group'),
+    'image': Field('image',
+                   getter=lambda post: post.image.url if post.image else None),
+    'comments_count': Field('comments_count'),
+}
+
+COMMENT_FIELDS = {
+    'id': Field('id'),
+    'post': Field('post', getter=lambda comment: comment.post_id),
+    'author': Field('author__username', related='author'),
+    'text': Field('text'),
+    'created': Field('created'),
+}
+
+GROUP_FIELDS = {
+    'id': Field('id'),
+    'title': Field('title'),
+    'slug': Field('slug'),
+    'description': Field('description'),
+    'posts_count': Field('posts_count'),
+}
+
+FOLLOW_FIELDS = {
+    'id': Field('id'),
+    'user': Field('user__username', related='user'),
+    'author': Field('author__username', related='author'),
+}
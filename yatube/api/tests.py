@@ -0,0 +1,124 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class TestApi(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.posts = [
+            Post.objects.create(text=f'Пост {i}', author=cls.author,
+                                group=cls.group if i % 2 else None)
+            for i in range(5)
+        ]
+        Comment.objects.create(post=cls.posts[0], author=cls.reader,
+                               text='Комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def test_posts_cursor_pagination(self):
+        '''Посты отдаются страницами с курсором на следующую'''
+        url = reverse('api:post_list')
+        response = self.client.get(url, {'limit': 3})
+        data = response.json()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([post['id'] for post in data['results']],
+                         [post.pk for post in self.posts[:1:-1]])
+        self.assertIsNone(data['previous'])
+
+        data = self.client.get(data['next']).json()
+        self.assertEqual([post['id'] for post in data['results']],
+                         [self.posts[1].pk, self.posts[0].pk])
+        self.assertIsNone(data['next'])
+
+    def test_sparse_fields(self):
+        '''Ответ содержит только запрошенные поля'''
+        response = self.client.get(reverse('api:post_list'),
+                                   {'fields': 'id,author', 'limit': 1})
+        self.assertEqual(response.json()['results'],
+                         [{'id': self.posts[-1].pk, 'author': 'author'}])
+
+    def test_fields_limit_queries(self):
+        '''Связи подтягиваются одним запросом только когда нужны'''
+        url = reverse('api:post_list')
+        with self.assertNumQueries(1):
+            self.client.get(url, {'fields': 'id,text'})
+        with self.assertNumQueries(1):
+            self.client.get(url, {'fields': 'id,author,group'})
+
+    def test_unknown_field(self):
+        '''Неизвестное поле дает ошибку 400'''
+        response = self.client.get(reverse('api:post_list'),
+                                   {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.json()['error'])
+
+    def test_filters(self):
+        '''Посты фильтруются по группе и автору'''
+        data = self.client.get(reverse('api:post_list'),
+                               {'group': 'group'}).json()
+        self.assertEqual(len(data['results']), 2)
+        data = self.client.get(reverse('api:post_list'),
+                               {'author': 'reader'}).json()
+        self.assertEqual(data['results'], [])
+
+    def test_detail_endpoints(self):
+        '''Отдельные объекты и вложенные списки'''
+        pages = {
+            reverse('api:post_detail', args=[self.posts[0].pk]): {
+                'id': self.posts[0].pk},
+            reverse('api:group_detail', args=['group']): {
+                'slug': 'group', 'posts_count': 2},
+        }
+        for url, expected in pages.items():
+            with self.subTest(url=url):
+                data = self.client.get(url).json()
+                for key, value in expected.items():
+                    self.assertEqual(data[key], value)
+
+        comments = self.client.get(
+            reverse('api:comment_list', args=[self.posts[0].pk])).json()
+        self.assertEqual(comments['results'][0]['author'], 'reader')
+        follows = self.client.get(reverse('api:follow_list'),
+                                  {'user': 'reader'}).json()
+        self.assertEqual(follows['results'][0]['author'], 'author')
+
+    def test_not_found(self):
+        '''Несуществующие объекты дают JSON с ошибкой 404'''
+        urls = [
+            reverse('api:post_detail', args=[10 ** 6]),
+            reverse('api:comment_list', args=[10 ** 6]),
+            reverse('api:group_detail', args=['missing']),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 404)
+                self.assertIn('error', response.json())
+
+    def test_etag(self):
+        '''Повторный запрос с ETag получает 304, после изменения - 200'''
+        url = reverse('api:post_list')
+        etag = self.client.get(url)['ETag']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Post.objects.create(text='Новый пост', author=self.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_read_only(self):
+        '''API не принимает изменяющие запросы'''
+        response = self.client.post(reverse('api:post_list'))
+        self.assertEqual(response.status_code, 405)
@@ -0,0 +1,150 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.views.decorators.http import require_GET
+
+from posts.models import Comment, Follow, Group, Post
+from posts.paginators import CursorPaginator
+
+from .fields import COMMENT_FIELDS, FOLLOW_FIELDS, GROUP_FIELDS, POST_FIELDS
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def api_view(view):
+    '''
+    Оборачивает view API: только GET, ошибки в виде JSON
+    и ETag по содержимому ответа с ответом 304, если клиент
+    уже получил эти данные.
+    '''
+    @require_GET
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            data = view(request, *args, **kwargs)
+        except ApiError as error:
+            return JsonResponse({'error': str(error)}, status=error.status)
+        response = JsonResponse(data)
+        etag = quote_etag(hashlib.md5(response.content).hexdigest())
+        response['ETag'] = etag
+        return get_conditional_response(request, etag=etag,
+                                        response=response)
+    return wrapper
+
+
+def requested_fields(request, spec):
+    '''
+    Разбирает параметр ?fields=a,b,c (sparse fieldsets).
+    '''
+    fields = request.GET.get('fields')
+    if not fields:
+        return list(spec)
+    names = [name.strip() for name in fields.split(',') if name.strip()]
+    unknown = [name for name in names if name not in spec]
+    if unknown:
+        raise ApiError(f'Неизвестные поля: {", ".join(unknown)}. '
+                       f'Доступны: {", ".join(spec)}.')
+    return names
+
+
+def load(queryset, spec, fields, ordering=()):
+    '''
+    Ограничивает запрос полями, нужными для ответа: only() по
+    запрошенным полям и полям сортировки, select_related только
+    для запрошенных связей.
+    '''
+    only = {spec[name].source for name in fields}
+    only.update(field.lstrip('-') for field in ordering)
+    related = {spec[name].related for name in fields} - {None}
+    return queryset.select_related(*related).only(*only)
+
+
+def serialize(obj, spec, fields):
+    return {name: spec[name].get(obj) for name in fields}
+
+
+def page_size(request):
+    try:
+        size = int(request.GET.get('limit', settings.POSTS_AMOUNT))
+    except ValueError:
+        raise ApiError('Параметр limit должен быть числом.')
+    return max(1, min(size, settings.API_MAX_PAGE_SIZE))
+
+
+def cursor_url(request, cursor):
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query['cursor'] = cursor
+    return request.build_absolute_uri(f'{request.path}?{query.urlencode()}')
+
+
+def paginated(request, queryset, spec, ordering):
+    fields = requested_fields(request, spec)
+    queryset = load(queryset, spec, fields, ordering)
+    paginator = CursorPaginator(queryset, page_size(request), ordering)
+    page = paginator.get_page(request.GET.get('cursor'))
+    return {
+        'next': cursor_url(request, page.next_cursor),
+        'previous': cursor_url(request, page.previous_cursor),
+        'results': [serialize(obj, spec, fields) for obj in page],
+    }
+
+
+def detail(request, queryset, spec, **lookup):
+    fields = requested_fields(request, spec)
+    obj = load(queryset, spec, fields).filter(**lookup).first()
+    if obj is None:
+        raise ApiError('Объект не найден.', status=404)
+    return serialize(obj, spec, fields)
+
+
+@api_view
+def post_list(request):
+    posts = Post.objects.all()
+    if 'author' in request.GET:
+        posts = posts.filter(author__username=request.GET['author'])
+    if 'group' in request.GET:
+        posts = posts.filter(group__slug=request.GET['group'])
+    return paginated(request, posts, POST_FIELDS, ('-pub_date', '-id'))
+
+
+@api_view
+def post_detail(request, post_id):
+    return detail(request, Post.objects.all(), POST_FIELDS, pk=post_id)
+
+
+@api_view
+def comment_list(request, post_id):
+    if not Post.objects.filter(pk=post_id).exists():
+        raise ApiError('Объект не найден.', status=404)
+    comments = Comment.objects.filter(post_id=post_id)
+    return paginated(request, comments, COMMENT_FIELDS, ('-created', '-id'))
+
+
+@api_view
+def group_list(request):
+    return paginated(request, Group.objects.all(), GROUP_FIELDS, ('id',))
+
+
+@api_view
+def group_detail(request, slug):
+    return detail(request, Group.objects.all(), GROUP_FIELDS, slug=slug)
+
+
+@api_view
+def follow_list(request):
+    follows = Follow.objects.all()
+    if 'user' in request.GET:
+        follows = follows.filter(user__username=request.GET['user'])
+    if 'author' in request.GET:
+        follows = follows.filter(author__username=request.GET['author'])
+    return paginated(request, follows, FOLLOW_FIELDS, ('-id',))
@@ -0,0 +1,43 @@
+from django.contrib import admin
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Job
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['pk', 'name', 'status', 'attempts', 'max_attempts',
+                    'run_at', 'started', 'finished']
+    list_filter = ['status', 'name']
+    search_fields = ['name']
+    date_hierarchy = 'created'
+    readonly_fields = ['created', 'started', 'finished', 'last_error']
+    actions = ['retry_jobs']
+    change_list_template = 'core/job_change_list.html'
+
+    def changelist_view(self, request, extra_context=None):
+        '''
+        Дополняет список задач сводкой по статусам для мониторинга.
+        '''
+        summary = dict(Job.objects.order_by()
+                       .values_list('status')
+                       .annotate(total=Count('pk')))
+        extra_context = extra_context or {}
+        extra_context['job_summary'] = [
+            (title, summary.get(status, 0))
+            for status, title in Job.STATUSES
+        ]
+        extra_context['job_overdue'] = Job.objects.filter(
+            status=Job.QUEUED, run_at__lt=timezone.now()
+        ).count()
+        return super().changelist_view(request, extra_context)
+
+    def retry_jobs(self, request, queryset):
+        updated = queryset.exclude(status=Job.RUNNING).update(
+            status=Job.QUEUED, attempts=0, run_at=timezone.now()
+        )
+        self.message_user(request, f'Возвращено в очередь задач: {updated}')
+    retry_jobs.short_description = 'Повторить выбранные задачи'
+
+
+admin.site.register(Job, JobAdmin)
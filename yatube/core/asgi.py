@@ -0,0 +1,223 @@
+import asyncio
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from .events import EventStreamResponse, async_event_stream
+
+#  Тело запроса больше этого размера уходит из памяти во временный файл.
+BODY_MEMORY_SIZE = 2621440
+
+
+def build_environ(scope, body):
+    '''
+    Переводит HTTP-scope ASGI в окружение WSGI.
+    '''
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        #  WSGI передает путь как байты, декодированные в latin-1.
+        'PATH_INFO': scope['path'].encode().decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': str(server[0]),
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+        'REMOTE_ADDR': client[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = f'HTTP_{name}'
+        if name in environ:
+            value = f'{environ[name]},{value}'
+        environ[name] = value
+    return environ
+
+
+class ClientDisconnected(Exception):
+    '''
+    Клиент закрыл соединение, не дочитав ответ.
+    '''
+
+
+async def watch_disconnect(receive, disconnected):
+    '''
+    Ждет от сервера http.disconnect и отмечает его в disconnected.
+    '''
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            disconnected.set()
+            return
+
+
+class WsgiToAsgi:
+    '''
+    ASGI-приложение поверх WSGI-приложения Django.
+
+    Django 2.2 не умеет выполнять асинхронные view, поэтому каждый
+    запрос выполняется целиком в потоке из пула ASGI_THREADS, а цикл
+    событий сервера только принимает соединения и передает байты.
+    Медленный клиент (загрузка картинки, чтение длинного ответа)
+    занимает цикл событий, а не поток: тело запроса читается до
+    запуска view, ответ отправляется по частям по мере готовности.
+    Пока ответ отправляется, задача watch_disconnect следит
+    за отключением клиента: тогда следующая отправка прерывает
+    перебор ответа и поток возвращается в пул.
+
+    Исключение - EventStreamResponse (потоки /events/): view
+    только проверяет доступ, поток сразу возвращается в пул,
+    а события отдает корутина из asyncio-очереди брокера, пока
+    клиент не отключится.
+    '''
+
+    def __init__(self, application, threads=None):
+        self.application = application
+        self.executor = ThreadPoolExecutor(
+            max_workers=threads or settings.ASGI_THREADS,
+            thread_name_prefix='asgi'
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise ValueError(f'Неподдерживаемый тип соединения: '
+                             f'{scope["type"]}')
+        body = await self.read_body(receive)
+        if body is None:
+            return
+        loop = asyncio.get_running_loop()
+        disconnected = threading.Event()
+        watcher = asyncio.ensure_future(
+            watch_disconnect(receive, disconnected)
+        )
+        try:
+            stream = await loop.run_in_executor(
+                self.executor, self.run, build_environ(scope, body),
+                loop, send, disconnected
+            )
+            if stream is not None:
+                await self.send_events(stream, send, watcher)
+        except ClientDisconnected:
+            pass
+        finally:
+            watcher.cancel()
+            body.close()
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def read_body(self, receive):
+        '''
+        Читает тело запроса; большое тело сбрасывается на диск.
+        Если клиент отключился, не дождавшись ответа, возвращает None.
+        '''
+        body = tempfile.SpooledTemporaryFile(max_size=BODY_MEMORY_SIZE)
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return None
+            body.write(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        body.seek(0)
+        return body
+
+    async def send_events(self, stream, send, watcher):
+        '''
+        Отдает поток событий EventStreamResponse до его конца
+        или до отключения клиента.
+        '''
+        async def events():
+            await send({'type': 'http.response.start',
+                        'status': stream['status'],
+                        'headers': stream['headers']})
+            response = stream['events']
+            async for chunk in async_event_stream(response.channels,
+                                                  response.event_name):
+                await send({'type': 'http.response.body',
+                            'body': chunk.encode(), 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+
+        sender = asyncio.ensure_future(events())
+        try:
+            await asyncio.wait({sender, watcher},
+                               return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            sender.cancel()
+        #  Отмена закрывает подписку в finally async_event_stream.
+        await asyncio.wait({sender})
+
+    def run(self, environ, loop, send, disconnected):
+        '''
+        Выполняет WSGI-приложение в потоке пула и отправляет ответ
+        через цикл событий. После отключения клиента (disconnected)
+        очередная отправка бросает ClientDisconnected, и ответ
+        закрывается в finally. Поток освобождается не сразу,
+        а когда ответ отдаст следующую часть: потоковый ответ
+        должен отдавать части регулярно.
+
+        EventStreamResponse не перебирается: ответ закрывается,
+        а статус, заголовки и сам ответ возвращаются корутине
+        для send_events.
+        '''
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [
+                (name.lower().encode('latin-1'), value.encode('latin-1'))
+                for name, value in headers
+            ]
+
+        def emit(message):
+            if disconnected.is_set():
+                raise ClientDisconnected
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        def start():
+            if not response.get('started'):
+                response['started'] = True
+                emit({'type': 'http.response.start',
+                      'status': response['status'],
+                      'headers': response['headers']})
+
+        result = self.application(environ, start_response)
+        if isinstance(result, EventStreamResponse):
+            result.close()
+            response['events'] = result
+            return response
+        try:
+            for chunk in result:
+                if chunk:
+                    start()
+                    emit({'type': 'http.response.body', 'body': chunk,
+                          'more_body': True})
+            start()
+            emit({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
@@ -0,0 +1,228 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+'''
+
+
+class SQLiteCache(BaseCache):
+    '''
+    Кэш в файле SQLite (LOCATION), общий для всех процессов
+    машины: запись или удаление ключа в одном воркере сразу видны
+    остальным, внешний сервис не нужен.
+
+    Файл работает в режиме WAL, поэтому чтения не ждут записей.
+    При переполнении MAX_ENTRIES удаляется 1/CULL_FREQUENCY давно
+    не читавшихся ключей (LRU). Время чтения обновляется не чаще
+    раза в LRU_RESOLUTION секунд, чтобы частые чтения горячего
+    ключа не превращались в записи. add и incr выполняются
+    в транзакции BEGIN IMMEDIATE и атомарны между процессами.
+    '''
+    LRU_RESOLUTION = 1.0
+    BUSY_TIMEOUT = 5
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.location = location
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.ready = False
+
+    def connection(self):
+        '''
+        Соединение текущего потока. После fork соединение
+        родителя не используется: SQLite это запрещает.
+        '''
+        connection = getattr(self.local, 'connection', None)
+        if connection is None or self.local.pid != os.getpid():
+            connection = sqlite3.connect(self.location,
+                                         timeout=self.BUSY_TIMEOUT,
+                                         isolation_level=None,
+                                         check_same_thread=False)
+            connection.execute('PRAGMA journal_mode = WAL')
+            connection.execute('PRAGMA synchronous = NORMAL')
+            with self.lock:
+                if not self.ready:
+                    connection.executescript(SCHEMA)
+                    self.ready = True
+            self.local.connection = connection
+            self.local.pid = os.getpid()
+        return connection
+
+    def key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def expiry(self, timeout):
+        return self.get_backend_timeout(timeout)
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = {self.key(key, version): key for key in keys}
+        if not keys:
+            return {}
+        now = time.time()
+        connection = self.connection()
+        rows = connection.execute(
+            f'SELECT key, value, expires, accessed FROM cache '
+            f'WHERE key IN ({", ".join("?" * len(keys))})',
+            list(keys)
+        ).fetchall()
+        result = {}
+        stale = []
+        for key, value, expires, accessed in rows:
+            if expires is not None and expires <= now:
+                continue
+            result[keys[key]] = pickle.loads(value)
+            if now - accessed >= self.LRU_RESOLUTION:
+                stale.append((now, key))
+        if stale:
+            connection.executemany(
+                'UPDATE cache SET accessed = ? WHERE key = ?', stale
+            )
+        return result
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.expiry(timeout)
+        now = time.time()
+        rows = [
+            (self.key(key, version),
+             pickle.dumps(value, pickle.HIGHEST_PROTOCOL), expires, now)
+            for key, value in data.items()
+        ]
+        with self.transaction() as connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO cache (key, value, expires, accessed) '
+                'VALUES (?, ?, ?, ?)', rows
+            )
+            self.cull(connection, now)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.key(key, version)
+        now = time.time()
+        with self.transaction() as connection:
+            row = connection.execute(
+                'SELECT expires FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is not None and (row[0] is None or row[0] > now):
+                return False
+            connection.execute(
+                'INSERT OR REPLACE INTO cache (key, value, expires, accessed) '
+                'VALUES (?, ?, ?, ?)',
+                (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                 self.expiry(timeout), now)
+            )
+            self.cull(connection, now)
+        return True
+
+    def incr(self, key, delta=1, version=None):
+        cache_key = self.key(key, version)
+        with self.transaction() as connection:
+            row = connection.execute(
+                'SELECT value, expires FROM cache WHERE key = ?',
+                (cache_key,)
+            ).fetchone()
+            if row is None or (row[1] is not None and row[1] <= time.time()):
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (pickle.dumps(value, pickle.HIGHEST_PROTOCOL), cache_key)
+            )
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        cursor = self.connection().execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self.expiry(timeout), self.key(key, version), time.time())
+        )
+        return bool(cursor.rowcount)
+
+    def has_key(self, key, version=None):
+        return self.connection().execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self.key(key, version), time.time())
+        ).fetchone() is not None
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self.key(key, version) for key in keys]
+        if keys:
+            self.connection().execute(
+                f'DELETE FROM cache WHERE key IN '
+                f'({", ".join("?" * len(keys))})', keys
+            )
+
+    def clear(self):
+        self.connection().execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        #  Соединение живет, пока жив поток: открывать файл
+        #  на каждый запрос дороже, чем держать его открытым.
+        pass
+
+    def transaction(self):
+        return ImmediateTransaction(self.connection())
+
+    def cull(self, connection, now):
+        '''
+        Удаляет просроченные ключи, а если их все равно больше
+        MAX_ENTRIES - давно не читавшиеся.
+        '''
+        count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count <= self._max_entries:
+            return
+        connection.execute('DELETE FROM cache WHERE expires <= ?', (now,))
+        count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count <= self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            connection.execute('DELETE FROM cache')
+            return
+        connection.execute(
+            'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+            'ORDER BY accessed LIMIT ?)',
+            (max(count // self._cull_frequency,
+                 count - self._max_entries),)
+        )
+
+
+class ImmediateTransaction:
+    '''
+    Транзакция, сразу захватывающая блокировку записи:
+    чтение и запись внутри нее не пересекаются с другими
+    процессами.
+    '''
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute('BEGIN IMMEDIATE')
+        return self.connection
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.connection.execute('ROLLBACK' if exc_type else 'COMMIT')
@@ -0,0 +1,98 @@
+import math
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .metrics import CACHE_REQUESTS
+from .routers import primary_reads
+
+
+def early_expired(expires, delta, beta, now):
+    '''
+    Вероятностное досрочное истечение (XFetch): чем ближе срок
+    и чем дольше пересчет delta, тем вероятнее запись считается
+    истекшей. Запросы обновляют ее по одному и заранее, а не все
+    разом в момент истечения.
+    '''
+    return now - delta * beta * math.log(1 - random.random()) >= expires
+
+
+def get_or_recompute(key, recompute, timeout, version=None, metric=None):
+    '''
+    Возвращает (значение, актуально ли оно для version) из кэша,
+    пересчитывая его recompute() по правилу stale-while-revalidate.
+
+    Запись хранит значение, version (например, поколение кэша),
+    срок годности и время последнего пересчета. Ключ не зависит
+    от version, поэтому после смены версии старое значение еще
+    доступно. Устаревшую (по сроку, досрочно или по версии)
+    запись пересчитывает только запрос, захвативший блокировку
+    cache.add(key:lock); остальные сразу получают старое
+    значение. Запись живет в кэше еще CACHE_STALE_TIMEOUT секунд
+    после срока годности. Если записи нет совсем, блокировку
+    тоже берет один запрос, а остальные до CACHE_LOCK_WAIT секунд
+    ждут, пока он положит запись в кэш; не дождавшись, считают
+    сами.
+
+    metric - префикс для счетчика yatube_cache_requests_total
+    (результаты hit, stale и miss). recompute() читает основную
+    базу (core.routers.primary_reads).
+    '''
+    now = time.time()
+    entry = cache.get(key)
+    lock_key = f'{key}:lock'
+    if entry is not None:
+        value, entry_version, expires, delta = entry
+        current = entry_version == version
+        if current and not early_expired(expires, delta,
+                                         settings.CACHE_EARLY_BETA, now):
+            count(metric, 'hit')
+            return value, True
+        locked = cache.add(lock_key, 1, settings.CACHE_LOCK_TIMEOUT)
+        if not locked:
+            #  Пересчитывает другой запрос: отдаем, что есть.
+            count(metric, 'stale')
+            return value, current
+    else:
+        locked = cache.add(lock_key, 1, settings.CACHE_LOCK_TIMEOUT)
+        if not locked:
+            #  Запись уже считает другой запрос: ждем ее.
+            entry = wait_for(key)
+            if entry is not None:
+                count(metric, 'hit')
+                return entry[0], entry[1] == version
+    count(metric, 'miss')
+    started = time.perf_counter()
+    try:
+        #  Значение уйдет в общий кэш под текущей версией, поэтому
+        #  читается из основной базы, а не из отстающей реплики.
+        with primary_reads():
+            value = recompute()
+        delta = time.perf_counter() - started
+        cache.set(key, (value, version, time.time() + timeout, delta),
+                  timeout + settings.CACHE_STALE_TIMEOUT)
+    finally:
+        if locked:
+            cache.delete(lock_key)
+    return value, True
+
+
+def wait_for(key):
+    '''
+    Ждет до CACHE_LOCK_WAIT секунд, пока запись key появится
+    в кэше, и возвращает ее (или None, если не дождалась).
+    '''
+    deadline = time.monotonic() + settings.CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(settings.CACHE_LOCK_POLL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+    return None
+
+
+def count(metric, result):
+    if metric is not None:
+        CACHE_REQUESTS.inc(prefix=metric, result=result)
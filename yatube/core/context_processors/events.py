@@ -0,0 +1,11 @@
+from django.conf import settings
+
+
+def live_posts(request):
+    '''
+    Помещает в контекст под ключом live_posts, подключать ли
+    на страницах живые обновления лент (EVENTS_ENABLED)
+    '''
+    return {
+        'live_posts': settings.EVENTS_ENABLED
+    }
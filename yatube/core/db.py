@@ -0,0 +1,58 @@
+import sqlite3
+
+from django.conf import settings
+
+#  Настройки SQLite для боевого сервера: журнал WAL не дает
+#  писателю блокировать читателей, synchronous=NORMAL в режиме WAL
+#  не теряет целостность при сбое, mmap и кэш страниц уменьшают
+#  число системных вызовов, busy_timeout заставляет ждать
+#  блокировку, а не сразу падать с "database is locked".
+PRODUCTION_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64000,
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+}
+
+
+def apply_pragmas(cursor, pragmas):
+    '''
+    Выполняет PRAGMA из словаря {имя: значение}.
+    '''
+    for name, value in pragmas.items():
+        if not name.isidentifier():
+            raise ValueError(f'Недопустимое имя PRAGMA: {name}')
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    '''
+    Выполняет SQLITE_PRAGMAS на каждом новом соединении с SQLite:
+    большинство PRAGMA действует только на соединение. Запросы идут
+    мимо обертки курсора Django, поэтому не попадают в счетчики
+    запросов и в бюджет view.
+    '''
+    if connection.vendor != 'sqlite' or not settings.SQLITE_PRAGMAS:
+        return
+    cursor = connection.connection.cursor()
+    try:
+        apply_pragmas(cursor, settings.SQLITE_PRAGMAS)
+    finally:
+        cursor.close()
+
+
+def copy_database(source_path, target_path):
+    '''
+    Копирует базу SQLite через backup API. Копия согласована:
+    backup читает снимок исходной базы, а читатели копии ждут
+    окончания записи.
+    '''
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(target_path)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
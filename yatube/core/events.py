@@ -0,0 +1,261 @@
+import asyncio
+import json
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils.module_loading import import_string
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+class Subscription:
+    '''
+    Подписка на события каналов channels. События копятся
+    в ограниченной очереди: если клиент не успевает их забирать,
+    новые события для него отбрасываются.
+    '''
+
+    def __init__(self, broker, channels):
+        self.broker = broker
+        self.channels = frozenset(channels)
+        self.events = queue.Queue(maxsize=settings.EVENTS_QUEUE_SIZE)
+
+    def put(self, event):
+        try:
+            self.events.put_nowait(event)
+        except queue.Full:
+            pass
+
+    def get(self, timeout):
+        '''
+        Ждет следующее событие не дольше timeout секунд,
+        при таймауте возвращает None.
+        '''
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class AsyncSubscription(Subscription):
+    '''
+    Подписка для корутины: события из потоков брокера передаются
+    в asyncio.Queue через цикл событий, и ожидание не занимает
+    поток.
+    '''
+
+    def __init__(self, broker, channels, loop):
+        self.broker = broker
+        self.channels = frozenset(channels)
+        self.loop = loop
+        self.events = asyncio.Queue(maxsize=settings.EVENTS_QUEUE_SIZE)
+
+    def put(self, event):
+        try:
+            self.loop.call_soon_threadsafe(self.put_nowait, event)
+        except RuntimeError:
+            #  Цикл событий уже закрыт.
+            pass
+
+    def put_nowait(self, event):
+        try:
+            self.events.put_nowait(event)
+        except asyncio.QueueFull:
+            pass
+
+    async def get(self, timeout):
+        try:
+            return await asyncio.wait_for(self.events.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class LocalBroker:
+    '''
+    Pub/sub внутри одного процесса: событие сразу раскладывается
+    в очереди подписок на его каналы.
+    '''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = {}
+
+    def subscribe(self, channels):
+        return self.attach(Subscription(self, channels))
+
+    def subscribe_async(self, channels, loop):
+        return self.attach(AsyncSubscription(self, channels, loop))
+
+    def attach(self, subscription):
+        with self.lock:
+            for channel in subscription.channels:
+                self.subscriptions.setdefault(channel, set()).add(
+                    subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            for channel in subscription.channels:
+                subscribers = self.subscriptions.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self.subscriptions[channel]
+
+    def publish(self, channels, event):
+        self.deliver(channels, event)
+
+    def deliver(self, channels, event):
+        with self.lock:
+            targets = set()
+            for channel in channels:
+                targets.update(self.subscriptions.get(channel, ()))
+        for subscription in targets:
+            subscription.put(event)
+
+
+class FileBroker(LocalBroker):
+    '''
+    Брокер для нескольких процессов на одной машине: события
+    дописываются строками JSON в общий файл EVENTS_FILE, а поток
+    в каждом процессе читает новые строки и раздает их локальным
+    подпискам. Так на процесс приходится один опрос файла,
+    сколько бы клиентов ни было подключено. Файл обнуляется,
+    когда превышает EVENTS_FILE_MAX_SIZE.
+    '''
+
+    def __init__(self):
+        super().__init__()
+        self.path = settings.EVENTS_FILE
+        open(self.path, 'ab').close()
+        self.offset = os.path.getsize(self.path)
+        self.stopped = threading.Event()
+        self.reader = threading.Thread(target=self.follow, daemon=True,
+                                       name='events-reader')
+        self.reader.start()
+
+    def publish(self, channels, event):
+        line = json.dumps({'channels': list(channels), 'event': event},
+                          ensure_ascii=False) + '\n'
+        with open(self.path, 'ab') as spool:
+            if spool.tell() > settings.EVENTS_FILE_MAX_SIZE:
+                spool.truncate(0)
+            #  Одна запись в режиме добавления не перемешивается
+            #  с записями других процессов.
+            spool.write(line.encode())
+
+    def follow(self):
+        while not self.stopped.wait(settings.EVENTS_POLL_INTERVAL):
+            try:
+                self.read_new()
+            except (OSError, ValueError):
+                self.offset = 0
+
+    def stop(self):
+        self.stopped.set()
+        self.reader.join()
+
+    def read_new(self):
+        if os.path.getsize(self.path) < self.offset:
+            #  Файл обнулили: читаем его с начала.
+            self.offset = 0
+        with open(self.path, 'rb') as spool:
+            spool.seek(self.offset)
+            for line in spool:
+                if not line.endswith(b'\n'):
+                    break
+                self.offset += len(line)
+                message = json.loads(line)
+                self.deliver(message['channels'], message['event'])
+
+
+def get_broker():
+    '''
+    Брокер процесса, класс задается настройкой EVENTS_BROKER.
+    '''
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(settings.EVENTS_BROKER)()
+    return _broker
+
+
+def format_event(event, name):
+    data = json.dumps(event, ensure_ascii=False)
+    return f'id: {event["id"]}\nevent: {name}\ndata: {data}\n\n'
+
+
+def event_stream(channels, name='message'):
+    '''
+    Генератор тела ответа text/event-stream с событиями каналов
+    channels. Подписка создается при первом чтении, до отправки
+    первой строки, и снимается, когда поток закрывают.
+    Пока событий нет, раз в EVENTS_KEEPALIVE секунд отправляет
+    комментарий, чтобы соединение не закрыли прокси. Через
+    EVENTS_MAX_AGE секунд поток завершается, и браузер
+    переподключается сам.
+
+    Этот генератор держит поток воркера все время соединения,
+    поэтому годится только для разработки и тестов; через
+    yatube.asgi поток отдается корутиной async_event_stream.
+    '''
+    deadline = time.monotonic() + settings.EVENTS_MAX_AGE
+    subscription = get_broker().subscribe(channels)
+    try:
+        yield f'retry: {settings.EVENTS_RETRY}\n\n'
+        while time.monotonic() < deadline:
+            event = subscription.get(settings.EVENTS_KEEPALIVE)
+            if event is None:
+                yield ': keepalive\n\n'
+                continue
+            yield format_event(event, name)
+    finally:
+        subscription.close()
+
+
+async def async_event_stream(channels, name='message'):
+    '''
+    То же, что event_stream, для цикла событий ASGI: соединение
+    занимает только корутину и очередь, а не поток.
+    '''
+    deadline = time.monotonic() + settings.EVENTS_MAX_AGE
+    subscription = get_broker().subscribe_async(
+        channels, asyncio.get_running_loop()
+    )
+    try:
+        yield f'retry: {settings.EVENTS_RETRY}\n\n'
+        while time.monotonic() < deadline:
+            event = await subscription.get(settings.EVENTS_KEEPALIVE)
+            if event is None:
+                yield ': keepalive\n\n'
+                continue
+            yield format_event(event, name)
+    finally:
+        subscription.close()
+
+
+class EventStreamResponse(StreamingHttpResponse):
+    '''
+    Ответ text/event-stream с событиями каналов channels.
+    Через WSGI тело отдается генератором event_stream, а
+    core.asgi.WsgiToAsgi узнает такой ответ, сразу освобождает
+    поток и отдает события корутиной async_event_stream.
+    '''
+
+    def __init__(self, channels, name='message'):
+        super().__init__(event_stream(channels, name),
+                         content_type='text/event-stream')
+        self.channels = list(channels)
+        self.event_name = name
+        self['Cache-Control'] = 'no-cache'
+        #  Просим nginx не буферизовать поток:
+        self['X-Accel-Buffering'] = 'no'
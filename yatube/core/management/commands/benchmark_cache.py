@@ -0,0 +1,99 @@
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+BACKENDS = (
+    ('LocMemCache', 'django.core.cache.backends.locmem.LocMemCache'),
+    ('FileBasedCache', 'django.core.cache.backends.filebased.FileBasedCache'),
+    ('SQLiteCache', 'core.cache_backends.SQLiteCache'),
+)
+SHARED_KEYS = 100
+
+
+def fill(cache, prefix):
+    for number in range(SHARED_KEYS):
+        cache.set(f'{prefix}:{number}', number)
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает скорость LocMemCache, FileBasedCache и '
+            'SQLiteCache и проверяет, видит ли процесс записи '
+            'другого процесса. Кэши создаются во временном каталоге.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keys', type=int, default=1000,
+                            help='Разных ключей')
+        parser.add_argument('--operations', type=int, default=20000,
+                            help='Чтений в замере')
+        parser.add_argument('--threads', type=int, default=4,
+                            help='Потоков, одновременно работающих с кэшем')
+        parser.add_argument('--size', type=int, default=4096,
+                            help='Размер значения, байт')
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp()
+        try:
+            self.stdout.write(f'{"кэш":<16}{"set/с":>10}{"get/с":>10}'
+                              f'{"miss/с":>10}{"incr/с":>10}  '
+                              f'виден другому процессу')
+            #  Места хватает на все ключи, чтобы замер не включал вытеснение.
+            max_entries = options['keys'] * 2 + SHARED_KEYS
+            for name, backend in BACKENDS:
+                cache = import_string(backend)(
+                    os.path.join(directory, name),
+                    {'OPTIONS': {'MAX_ENTRIES': max_entries}}
+                )
+                self.stdout.write(self.measure(name, cache, options))
+        finally:
+            shutil.rmtree(directory)
+
+    def measure(self, name, cache, options):
+        keys = [f'page:{number}' for number in range(options['keys'])]
+        value = 'x' * options['size']
+        chooser = random.Random(0)
+        reads = [chooser.choice(keys) for _ in range(options['operations'])]
+        misses = [f'missing:{key}' for key in reads]
+        increments = options['operations'] // 10
+        cache.set('counter', 0)
+
+        rates = [
+            self.rate(lambda key: cache.set(key, value), keys, options),
+            self.rate(cache.get, reads, options),
+            self.rate(cache.get, misses, options),
+            self.rate(lambda key: cache.incr(key), ['counter'] * increments,
+                      options),
+        ]
+        #  Значение после параллельных incr показывает, атомарны ли они.
+        atomic = cache.get('counter') == increments
+        return (f'{name:<16}'
+                + ''.join(f'{rate:>10.0f}' for rate in rates)
+                + f'  {self.shared(cache, name)}'
+                + ('' if atomic else '  (incr не атомарен)'))
+
+    def rate(self, operation, arguments, options):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as executor:
+            for _ in executor.map(operation, arguments):
+                pass
+        return len(arguments) / (time.perf_counter() - started)
+
+    def shared(self, cache, name):
+        '''
+        Доля ключей, записанных дочерним процессом,
+        которые видит этот процесс.
+        '''
+        process = multiprocessing.get_context('fork').Process(
+            target=fill, args=(cache, name)
+        )
+        process.start()
+        process.join()
+        found = cache.get_many([f'{name}:{number}'
+                                for number in range(SHARED_KEYS)])
+        return f'{len(found) * 100 // SHARED_KEYS}%'
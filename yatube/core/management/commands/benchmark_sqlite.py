@@ -0,0 +1,131 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.db import PRODUCTION_PRAGMAS, apply_pragmas
+
+MODES = (
+    #  Как в базовых настройках: журнал отката, новое соединение
+    #  на каждый запрос (CONN_MAX_AGE = 0).
+    ('по умолчанию', {}, False),
+    #  Как в settings_production: WAL и постоянные соединения.
+    ('production', PRODUCTION_PRAGMAS, True),
+)
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность SQLite при одновременных '
+            'чтении и записи с настройками по умолчанию и с настройками '
+            'settings_production. Замер идет на временной базе.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8,
+                            help='Потоков, читающих ленту')
+        parser.add_argument('--writers', type=int, default=2,
+                            help='Потоков, добавляющих посты')
+        parser.add_argument('--duration', type=float, default=5,
+                            help='Длительность замера каждого режима, с')
+        parser.add_argument('--rows', type=int, default=10000,
+                            help='Строк в таблице перед замером')
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp()
+        try:
+            for number, (mode, pragmas, persistent) in enumerate(MODES):
+                path = os.path.join(directory, f'{number}.sqlite3')
+                self.prepare(path, options['rows'])
+                counts = self.run(path, pragmas, persistent, options)
+                duration = options['duration']
+                self.stdout.write(
+                    f'{mode}: чтений {counts["read"] / duration:.0f}/с, '
+                    f'записей {counts["write"] / duration:.0f}/с, '
+                    f'ошибок блокировки: {counts["locked"]}'
+                )
+        finally:
+            shutil.rmtree(directory)
+
+    def prepare(self, path, rows):
+        connection = sqlite3.connect(path)
+        connection.execute('CREATE TABLE post (id INTEGER PRIMARY KEY, '
+                           'author INTEGER, text TEXT, pub_date REAL)')
+        connection.execute('CREATE INDEX post_pub_date ON post (pub_date)')
+        connection.executemany(
+            'INSERT INTO post (author, text, pub_date) VALUES (?, ?, ?)',
+            ((number % 100, 'текст поста ' * 20, number)
+             for number in range(rows))
+        )
+        connection.commit()
+        connection.close()
+
+    def run(self, path, pragmas, persistent, options):
+        counts = {'read': 0, 'write': 0, 'locked': 0}
+        lock = threading.Lock()
+        deadline = time.monotonic() + options['duration']
+
+        def worker(kind, operation):
+            connection = connect(path, pragmas) if persistent else None
+            while time.monotonic() < deadline:
+                result = execute(connection or connect(path, pragmas),
+                                 operation, keep=persistent) or kind
+                with lock:
+                    counts[result] += 1
+            if connection:
+                connection.close()
+
+        threads = (
+            [threading.Thread(target=worker, args=('read', read_posts))
+             for _ in range(options['readers'])]
+            + [threading.Thread(target=worker, args=('write', write_post))
+               for _ in range(options['writers'])]
+        )
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return counts
+
+
+def connect(path, pragmas):
+    #  Django открывает SQLite с таймаутом 5 секунд
+    #  и в режиме автокоммита.
+    connection = sqlite3.connect(path, timeout=5, isolation_level=None,
+                                 check_same_thread=False)
+    apply_pragmas(connection.cursor(), pragmas)
+    return connection
+
+
+def execute(connection, operation, keep):
+    '''
+    Выполняет операцию; при ошибке блокировки возвращает 'locked'.
+    Если соединение не постоянное, закрывает его.
+    '''
+    try:
+        operation(connection)
+    except sqlite3.OperationalError:
+        if connection.in_transaction:
+            connection.execute('ROLLBACK')
+        return 'locked'
+    finally:
+        if not keep:
+            connection.close()
+    return None
+
+
+def read_posts(connection):
+    connection.execute('SELECT id, author, text FROM post '
+                       'ORDER BY pub_date DESC LIMIT 10').fetchall()
+    connection.execute('SELECT COUNT(*) FROM post').fetchone()
+
+
+def write_post(connection):
+    connection.execute('BEGIN')
+    connection.execute(
+        'INSERT INTO post (author, text, pub_date) VALUES (?, ?, ?)',
+        (1, 'новый пост', time.time())
+    )
+    connection.execute('COMMIT')
@@ -0,0 +1,92 @@
+import asyncio
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+
+from core.asgi import WsgiToAsgi, build_environ
+
+
+def scope_for(url):
+    path, _, query = url.partition('?')
+    return {'type': 'http', 'method': 'GET', 'path': path,
+            'query_string': query.encode(), 'headers': [],
+            'server': ('localhost', 80),
+            #  Не из INTERNAL_IPS, чтобы не мерить debug_toolbar:
+            'client': ('192.0.2.1', 0)}
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность приложения в режимах '
+            'WSGI и ASGI, вызывая их в процессе без HTTP-сервера.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='*', default=['/'],
+                            help='Адреса, запрашиваемые по кругу')
+        parser.add_argument('--requests', type=int, default=500,
+                            help='Запросов в каждом режиме')
+        parser.add_argument('--concurrency', type=int, default=8,
+                            help='Одновременных запросов')
+
+    def handle(self, *args, **options):
+        urls = options['urls']
+        total = options['requests']
+        concurrency = options['concurrency']
+        application = get_wsgi_application()
+        targets = [urls[i % len(urls)] for i in range(total)]
+        for mode, bench in (('WSGI', self.wsgi), ('ASGI', self.asgi)):
+            started = time.perf_counter()
+            statuses = bench(application, targets, concurrency)
+            elapsed = time.perf_counter() - started
+            errors = sum(1 for status in statuses if status >= 400)
+            self.stdout.write(f'{mode}: {total} запросов за {elapsed:.2f} с, '
+                              f'{total / elapsed:.1f} запросов/с, '
+                              f'ошибок: {errors}')
+
+    def wsgi(self, application, targets, concurrency):
+        def request(url):
+            status = []
+            result = application(
+                build_environ(scope_for(url), io.BytesIO()),
+                lambda line, headers, exc_info=None: status.append(line)
+            )
+            for _ in result:
+                pass
+            result.close()
+            return int(status[0].split(' ', 1)[0])
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return list(executor.map(request, targets))
+
+    def asgi(self, application, targets, concurrency):
+        asgi_application = WsgiToAsgi(application, threads=concurrency)
+
+        async def request(url, semaphore):
+            status = []
+            messages = [{'type': 'http.request', 'body': b''}]
+
+            async def receive():
+                if not messages:
+                    #  Клиент не отключается, пока ждет ответ.
+                    await asyncio.Future()
+                return messages.pop()
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    status.append(message['status'])
+
+            async with semaphore:
+                await asgi_application(scope_for(url), receive, send)
+            return status[0]
+
+        async def run():
+            semaphore = asyncio.Semaphore(concurrency)
+            return await asyncio.gather(
+                *(request(url, semaphore) for url in targets))
+
+        try:
+            return asyncio.run(run())
+        finally:
+            asgi_application.executor.shutdown()
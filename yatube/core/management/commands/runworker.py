@@ -0,0 +1,65 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.tasks import claim_jobs, execute_job, requeue_stale_jobs
+
+
+class Command(BaseCommand):
+    help = 'Запускает воркер фоновых задач.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int,
+                            default=settings.TASKS_WORKERS,
+                            help='Количество параллельно выполняемых задач')
+        parser.add_argument('--pool', choices=['thread', 'process'],
+                            default=settings.TASKS_POOL,
+                            help='Потоки или процессы для выполнения задач')
+        parser.add_argument('--poll', type=float,
+                            default=settings.TASKS_POLL_INTERVAL,
+                            help='Пауза между опросами очереди, секунд')
+        parser.add_argument('--requeue', type=float,
+                            default=settings.TASKS_REQUEUE_INTERVAL,
+                            help='Пауза между поисками зависших задач, '
+                                 'секунд')
+        parser.add_argument('--burst', action='store_true',
+                            help='Выйти, когда очередь опустеет')
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        if options['pool'] == 'process':
+            #  Дочерние процессы не должны унаследовать соединения с БД:
+            connections.close_all()
+            pool = ProcessPoolExecutor(max_workers=workers)
+        else:
+            pool = ThreadPoolExecutor(max_workers=workers,
+                                      thread_name_prefix='worker')
+        self.stdout.write(f'Воркер запущен: {workers} ({options["pool"]})')
+        running = set()
+        next_requeue = 0
+        with pool:
+            while True:
+                #  Задачи упавших воркеров возвращаются в очередь
+                #  не только при запуске, но и по ходу работы.
+                if time.monotonic() >= next_requeue:
+                    self.requeue()
+                    next_requeue = time.monotonic() + options['requeue']
+                running = {future for future in running if not future.done()}
+                claimed = claim_jobs(workers - len(running))
+                for pk in claimed:
+                    running.add(pool.submit(execute_job, pk))
+                if claimed:
+                    continue
+                if options['burst'] and not running:
+                    break
+                time.sleep(options['poll'])
+        self.stdout.write('Очередь пуста, воркер остановлен.')
+
+    def requeue(self):
+        requeued = requeue_stale_jobs()
+        if requeued:
+            self.stdout.write(f'Возвращено в очередь зависших задач: '
+                              f'{requeued}')
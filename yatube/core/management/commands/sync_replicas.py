@@ -0,0 +1,38 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.db import copy_database
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную базу SQLite в реплики DATABASE_REPLICAS '
+            'через backup API. Для PostgreSQL используется его '
+            'собственная репликация.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Повторять каждые N секунд; 0 - один раз')
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('DATABASE_REPLICAS пуст')
+        while True:
+            for alias in settings.DATABASE_REPLICAS:
+                self.sync(alias)
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def sync(self, alias):
+        primary = settings.DATABASES['default']
+        replica = settings.DATABASES[alias]
+        for database in (primary, replica):
+            if not database['ENGINE'].endswith('sqlite3'):
+                raise CommandError(f'{alias}: копирование поддерживается '
+                                   f'только для SQLite')
+        started = time.monotonic()
+        copy_database(primary['NAME'], replica['NAME'])
+        self.stdout.write(f'{alias}: скопирована за '
+                          f'{time.monotonic() - started:.2f} с')
@@ -0,0 +1,228 @@
+import atexit
+import glob
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (10 ** 4, 10 ** 5, 5 * 10 ** 5, 10 ** 6, 5 * 10 ** 6, 10 ** 7)
+
+
+class Metric:
+    type = None
+
+    def __init__(self, registry, name, help, labels=()):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.lock = threading.Lock()
+        self.samples = {}
+
+    def key(self, labels):
+        return tuple(str(labels[label]) for label in self.labels)
+
+    def dump(self):
+        with self.lock:
+            return [[list(key), value] for key, value in self.samples.items()]
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.samples[key] = self.samples.get(key, 0) + amount
+        self.registry.changed()
+
+
+class Histogram(Metric):
+    '''
+    Гистограмма: для каждого набора меток хранится количество
+    наблюдений по корзинам (не накопленное), сумма и число.
+    '''
+    type = 'histogram'
+
+    def __init__(self, registry, name, help, labels=(),
+                 buckets=LATENCY_BUCKETS):
+        super().__init__(registry, name, help, labels)
+        self.buckets = tuple(buckets) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        index = next(i for i, bound in enumerate(self.buckets)
+                     if value <= bound)
+        with self.lock:
+            sample = self.samples.get(key)
+            if sample is None:
+                sample = self.samples[key] = [0] * len(self.buckets) + [0, 0]
+            sample[index] += 1
+            sample[-2] += value
+            sample[-1] += 1
+        self.registry.changed()
+
+
+def _merge(total, value):
+    if isinstance(value, list):
+        return [a + b for a, b in zip(total, value)] if total else value
+    return (total or 0) + value
+
+
+class Registry:
+    '''
+    Реестр метрик процесса. Если задан METRICS_DIR, процесс
+    периодически (не чаще раза в METRICS_FLUSH_INTERVAL секунд)
+    сохраняет свои значения в файл <pid>.json в этом каталоге,
+    а /metrics суммирует файлы всех процессов. Каталог нужно
+    очищать при перезапуске сервиса.
+    '''
+
+    def __init__(self):
+        self.metrics = {}
+        self.flushed = 0.0
+        self.lock = threading.Lock()
+        #  Последние изменения не должны потеряться при остановке:
+        atexit.register(self.changed, force=True)
+
+    def counter(self, name, help, labels=()):
+        return self.register(Counter(self, name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(self, name, help, labels, buckets))
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def dump(self):
+        return {name: metric.dump() for name, metric in self.metrics.items()}
+
+    def changed(self, force=False):
+        '''
+        Сохраняет значения в файл, если пора. Проверку и запись
+        выполняет один поток: остальные в это время не ждут,
+        а пропускают сохранение. Ошибка записи только попадает
+        в лог и не ломает запрос, изменивший метрику.
+        '''
+        if not settings.METRICS_DIR:
+            return
+        if not self.lock.acquire(blocking=force):
+            return
+        try:
+            if (force or time.monotonic() - self.flushed
+                    >= settings.METRICS_FLUSH_INTERVAL):
+                self.flush()
+        except Exception:
+            logger.exception('Не удалось сохранить метрики в %s',
+                             settings.METRICS_DIR)
+        finally:
+            self.lock.release()
+
+    def flush(self):
+        self.flushed = time.monotonic()
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        path = os.path.join(settings.METRICS_DIR, f'{os.getpid()}.json')
+        descriptor, temporary = tempfile.mkstemp(
+            dir=settings.METRICS_DIR, prefix=f'{os.getpid()}.', suffix='.tmp'
+        )
+        try:
+            with os.fdopen(descriptor, 'w') as output:
+                json.dump(self.dump(), output)
+            #  Замена атомарна: читатель не увидит недописанный файл.
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+    def collect(self):
+        '''
+        Значения всех процессов: файлы других процессов
+        и текущее состояние этого.
+        '''
+        dumps = [self.dump()]
+        if settings.METRICS_DIR:
+            own = os.path.join(settings.METRICS_DIR, f'{os.getpid()}.json')
+            for path in glob.glob(os.path.join(settings.METRICS_DIR,
+                                               '*.json')):
+                if path == own:
+                    continue
+                try:
+                    with open(path) as source:
+                        dumps.append(json.load(source))
+                except (OSError, ValueError):
+                    continue
+        totals = {name: {} for name in self.metrics}
+        for dump in dumps:
+            for name, samples in dump.items():
+                if name not in totals:
+                    continue
+                for key, value in samples:
+                    key = tuple(key)
+                    totals[name][key] = _merge(totals[name].get(key), value)
+        return totals
+
+    def exposition(self):
+        '''
+        Метрики в текстовом формате Prometheus.
+        '''
+        lines = []
+        for name, samples in self.collect().items():
+            metric = self.metrics[name]
+            lines.append(f'# HELP {name} {metric.help}')
+            lines.append(f'# TYPE {name} {metric.type}')
+            for key, value in sorted(samples.items()):
+                labels = list(zip(metric.labels, key))
+                if metric.type == 'counter':
+                    lines.append(f'{name}{_labels(labels)} {value}')
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric.buckets, value):
+                    cumulative += count
+                    le = '+Inf' if bound == math.inf else f'{bound}'
+                    lines.append(f'{name}_bucket'
+                                 f'{_labels(labels + [("le", le)])} '
+                                 f'{cumulative}')
+                lines.append(f'{name}_sum{_labels(labels)} {value[-2]}')
+                lines.append(f'{name}_count{_labels(labels)} {value[-1]}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return (str(value).replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{label}="{_escape(value)}"'
+                          for label, value in pairs) + '}'
+
+
+registry = Registry()
+
+VIEW_LATENCY = registry.histogram(
+    'yatube_view_latency_seconds', 'Время обработки запроса по view',
+    labels=['view'])
+VIEW_QUERIES = registry.histogram(
+    'yatube_view_queries', 'SQL-запросов на запрос по view',
+    labels=['view'], buckets=QUERY_BUCKETS)
+CACHE_REQUESTS = registry.counter(
+    'yatube_cache_requests_total', 'Обращения к кэшу по префиксу ключа',
+    labels=['prefix', 'result'])
+IMAGE_PROCESSING = registry.histogram(
+    'yatube_image_processing_seconds', 'Время создания миниатюры',
+    labels=['geometry'])
+UPLOAD_SIZE = registry.histogram(
+    'yatube_upload_size_bytes', 'Размер загруженных картинок',
+    buckets=SIZE_BUCKETS)
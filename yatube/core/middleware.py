@@ -0,0 +1,112 @@
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .metrics import VIEW_LATENCY, VIEW_QUERIES
+from .profiling import QueryBudgetExceeded, RequestProfile, current_profile
+from .routers import RequestRouting, current_routing
+
+logger = logging.getLogger('core.profiling')
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+
+def query_budget(view_name):
+    return settings.QUERY_BUDGETS.get(view_name, settings.QUERY_BUDGET)
+
+
+class ProfilingMiddleware:
+    '''
+    Считает для каждого запроса SQL-запросы и их время, время
+    шаблонов и view. Пишет их в заголовок Server-Timing и в лог
+    core.profiling строкой JSON с именем view. Если view превысил
+    бюджет запросов (QUERY_BUDGETS или QUERY_BUDGET), пишет
+    предупреждение или, при QUERY_BUDGET_ACTION = 'raise',
+    выбрасывает QueryBudgetExceeded.
+    '''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profile = RequestProfile()
+        token = current_profile.set(profile)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile))
+                response = self.get_response(request)
+        finally:
+            current_profile.reset(token)
+        finished = time.perf_counter()
+        total = finished - started
+        if profile.view_started is not None:
+            profile.view_time = finished - profile.view_started
+
+        match = request.resolver_match
+        view_name = match.view_name if match else None
+        record = {
+            'view': view_name,
+            'method': request.method,
+            'status': response.status_code,
+            'queries': profile.queries,
+            'db_ms': round(profile.db_time * 1000, 2),
+            'template_ms': round(profile.template_time * 1000, 2),
+            'view_ms': round(profile.view_time * 1000, 2),
+            'total_ms': round(total * 1000, 2),
+        }
+        logger.info(json.dumps(record), extra={'profile': record})
+        VIEW_LATENCY.observe(total, view=view_name or 'unresolved')
+        VIEW_QUERIES.observe(profile.queries, view=view_name or 'unresolved')
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = (f'{profile.server_timing()}, '
+                                         f'total;dur={total * 1000:.1f}')
+
+        budget = query_budget(view_name)
+        if budget is not None and profile.queries > budget:
+            message = (f'{view_name}: {profile.queries} SQL-запросов '
+                       f'при бюджете {budget}')
+            if settings.QUERY_BUDGET_ACTION == 'raise':
+                raise QueryBudgetExceeded(message)
+            logger.warning(message, extra={'profile': record})
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        #  Время view отсчитывается с момента, когда до него дошла
+        #  очередь, до возврата ответа во внешние middleware.
+        profile = current_profile.get()
+        if profile is not None:
+            profile.view_started = time.perf_counter()
+
+
+class ReplicaMiddleware:
+    '''
+    Закрепляет запрос за основной базой, если метод небезопасный
+    или клиент недавно что-то записал: иначе он мог бы не увидеть
+    свою запись на отстающей реплике. После записи ставит cookie
+    REPLICA_PIN_COOKIE на REPLICA_STICKY_SECONDS секунд.
+    '''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        routing = RequestRouting(
+            pinned=request.method not in SAFE_METHODS
+            or settings.REPLICA_PIN_COOKIE in request.COOKIES
+        )
+        token = current_routing.set(routing)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_routing.reset(token)
+        if routing.wrote and settings.DATABASE_REPLICAS:
+            response.set_cookie(settings.REPLICA_PIN_COOKIE, '1',
+                                max_age=settings.REPLICA_STICKY_SECONDS,
+                                httponly=True)
+        return response
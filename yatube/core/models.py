@@ -0,0 +1,63 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    '''
+    Фоновая задача очереди: путь к функции-задаче и ее аргументы.
+    Выполняется командой manage.py runworker.
+    '''
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = [
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    ]
+
+    name = models.CharField(max_length=255, verbose_name='Задача')
+    payload = models.TextField(default='{}', verbose_name='Аргументы')
+    status = models.CharField(max_length=10,
+                              choices=STATUSES,
+                              default=QUEUED,
+                              verbose_name='Статус'
+                              )
+    attempts = models.PositiveIntegerField(default=0,
+                                           verbose_name='Попыток'
+                                           )
+    max_attempts = models.PositiveIntegerField(default=3,
+                                               verbose_name='Максимум попыток'
+                                               )
+    retry_delay = models.PositiveIntegerField(
+        default=60,
+        verbose_name='Пауза перед повтором, секунд'
+    )
+    run_at = models.DateTimeField(default=timezone.now,
+                                  verbose_name='Запустить не раньше'
+                                  )
+    created = models.DateTimeField(auto_now_add=True,
+                                   verbose_name='Создана'
+                                   )
+    started = models.DateTimeField(null=True, blank=True,
+                                   verbose_name='Начата'
+                                   )
+    finished = models.DateTimeField(null=True, blank=True,
+                                    verbose_name='Завершена'
+                                    )
+    last_error = models.TextField(blank=True,
+                                  verbose_name='Последняя ошибка'
+                                  )
+
+    class Meta:
+        ordering = ['-created']
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        indexes = [models.Index(fields=['status', 'run_at'],
+                                name='job_status_run_at_idx'),
+                   ]
+
+    def __str__(self):
+        return f'{self.name} ({self.get_status_display()})'
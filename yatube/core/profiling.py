@@ -0,0 +1,56 @@
+import time
+from contextvars import ContextVar
+
+current_profile = ContextVar('current_profile', default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    '''
+    View выполнил больше SQL-запросов, чем разрешено бюджетом.
+    '''
+
+
+class RequestProfile:
+    '''
+    Счетчики одного запроса: SQL-запросы и их время, время
+    рендеринга шаблонов и время работы view, в секундах.
+    '''
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.view_time = 0.0
+        self.view_started = None
+
+    def __call__(self, execute, sql, params, many, context):
+        '''
+        Обертка connection.execute_wrapper, замеряющая запросы.
+        '''
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+    def server_timing(self):
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'view;dur={self.view_time * 1000:.1f}',
+        ])
+
+
+class timed_render:
+    '''
+    Добавляет время рендеринга к профилю текущего запроса.
+    '''
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        profile = current_profile.get()
+        if profile is not None:
+            profile.template_time += time.perf_counter() - self.started
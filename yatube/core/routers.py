@@ -0,0 +1,130 @@
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.db.utils import ConnectionDoesNotExist
+
+#  Состояние текущего запроса; None вне запроса (команды, задачи).
+current_routing = ContextVar('current_routing', default=None)
+
+#  Сессия читается на каждом запросе, и новая сессия после входа
+#  не должна теряться из-за отставания реплики.
+PRIMARY_APPS = {'sessions'}
+
+
+class RequestRouting:
+    '''
+    Маршрутизация одного запроса: pinned - все чтения идут
+    в основную базу, wrote - запрос что-то записал.
+    '''
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+@contextmanager
+def primary_reads():
+    '''
+    Внутри блока чтения текущего запроса идут в основную базу.
+    Нужен там, где прочитанное сохраняется для других запросов
+    (общий кэш): отставшая реплика не должна попасть туда под
+    новым поколением.
+    '''
+    routing = current_routing.get()
+    if routing is None or routing.pinned:
+        yield
+        return
+    routing.pinned = True
+    try:
+        yield
+    finally:
+        #  Если в блоке была запись, запрос остается закрепленным.
+        routing.pinned = routing.wrote
+
+
+class ReplicaHealth:
+    '''
+    Кэш доступности реплик процесса: реплика проверяется запросом
+    к таблице миграций не чаще раза в REPLICA_HEALTH_INTERVAL
+    секунд. Просто SELECT 1 не годится: SQLite создает пустой
+    файл ни разу не синхронизированной реплики при подключении.
+    '''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checked = {}
+
+    def is_healthy(self, alias):
+        now = time.monotonic()
+        with self.lock:
+            healthy, checked_at = self.checked.get(alias, (None, 0.0))
+        if (healthy is not None
+                and now - checked_at < settings.REPLICA_HEALTH_INTERVAL):
+            return healthy
+        healthy = self.check(alias)
+        with self.lock:
+            self.checked[alias] = (healthy, now)
+        return healthy
+
+    def check(self, alias):
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute('SELECT 1 FROM django_migrations LIMIT 1')
+        except (ConnectionDoesNotExist, DatabaseError):
+            return False
+        return True
+
+
+class ReplicaRouter:
+    '''
+    Запись - в основную базу, чтение в запросах - по кругу
+    в доступные реплики из DATABASE_REPLICAS. Чтение идет
+    в основную базу, если:
+    - реплик нет или все недоступны;
+    - модель из PRIMARY_APPS (сессии);
+    - код выполняется вне запроса (команды, фоновые задачи);
+    - открыта транзакция в основной базе;
+    - запрос уже что-то записал или запрос закреплен за основной
+      базой middleware ReplicaMiddleware (небезопасный метод или
+      недавняя запись этого клиента).
+    '''
+
+    def __init__(self):
+        self.counter = itertools.count()
+        self.health = ReplicaHealth()
+
+    def db_for_read(self, model, **hints):
+        routing = current_routing.get()
+        replicas = settings.DATABASE_REPLICAS
+        if (routing is None or routing.pinned or not replicas
+                or model._meta.app_label in PRIMARY_APPS
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        start = next(self.counter)
+        for offset in range(len(replicas)):
+            alias = replicas[(start + offset) % len(replicas)]
+            if self.health.is_healthy(alias):
+                return alias
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        routing = current_routing.get()
+        if routing is not None:
+            #  Дальше запрос читает свои записи из основной базы.
+            routing.wrote = routing.pinned = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        #  Реплики получают схему вместе с данными основной базы.
+        return db not in settings.DATABASE_REPLICAS
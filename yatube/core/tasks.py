@@ -0,0 +1,137 @@
+import functools
+import json
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+
+class TaskFunction:
+    '''
+    Функция, которую можно выполнить в фоне:
+    func.delay(*args) ставит ее в очередь,
+    func.schedule(when, *args) - на определенное время.
+    Аргументы должны сериализоваться в JSON.
+    '''
+
+    def __init__(self, func, max_attempts, retry_delay):
+        functools.update_wrapper(self, func)
+        self.func = func
+        self.name = f'{func.__module__}.{func.__name__}'
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        return self.schedule(None, *args, **kwargs)
+
+    def schedule(self, when, *args, **kwargs):
+        '''
+        Ставит задачу в очередь. when - datetime, timedelta
+        от текущего момента или None (как можно скорее).
+        '''
+        if settings.TASKS_ALWAYS_EAGER:
+            self.func(*args, **kwargs)
+            return None
+        if when is None:
+            when = timezone.now()
+        elif isinstance(when, timedelta):
+            when = timezone.now() + when
+        return Job.objects.create(
+            name=self.name,
+            payload=json.dumps({'args': args, 'kwargs': kwargs}),
+            run_at=when,
+            max_attempts=self.max_attempts,
+            retry_delay=self.retry_delay,
+        )
+
+
+def task(func=None, *, max_attempts=3, retry_delay=60):
+    '''
+    Декоратор, регистрирующий функцию как фоновую задачу.
+    '''
+    if func is None:
+        return functools.partial(task, max_attempts=max_attempts,
+                                 retry_delay=retry_delay)
+    return TaskFunction(func, max_attempts, retry_delay)
+
+
+def claim_jobs(limit):
+    '''
+    Забирает до limit готовых к запуску задач и помечает их
+    выполняемыми. Условие status=QUEUED в UPDATE не дает двум
+    воркерам забрать одну и ту же задачу.
+    '''
+    if limit <= 0:
+        return []
+    now = timezone.now()
+    candidates = list(Job.objects.filter(status=Job.QUEUED, run_at__lte=now)
+                      .order_by('run_at')
+                      .values_list('pk', flat=True)[:limit])
+    claimed = []
+    for pk in candidates:
+        if Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+            status=Job.RUNNING, started=now, attempts=F('attempts') + 1
+        ):
+            claimed.append(pk)
+    return claimed
+
+
+def requeue_stale_jobs():
+    '''
+    Возвращает в очередь задачи, зависшие в статусе "выполняется"
+    дольше TASKS_TIMEOUT, например после падения воркера.
+    '''
+    deadline = timezone.now() - timedelta(seconds=settings.TASKS_TIMEOUT)
+    return Job.objects.filter(status=Job.RUNNING,
+                              started__lt=deadline).update(status=Job.QUEUED)
+
+
+def run_job(pk):
+    '''
+    Выполняет забранную задачу. При ошибке задача возвращается
+    в очередь с экспоненциально растущей паузой, пока не исчерпаны
+    попытки.
+    '''
+    job = Job.objects.get(pk=pk)
+    try:
+        payload = json.loads(job.payload)
+        import_string(job.name)(*payload['args'], **payload['kwargs'])
+    except Exception:
+        logger.exception('Задача %s (%s) завершилась ошибкой',
+                         job.pk, job.name)
+        job.last_error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = Job.QUEUED
+            job.run_at = timezone.now() + timedelta(
+                seconds=job.retry_delay * 2 ** (job.attempts - 1)
+            )
+        else:
+            job.status = Job.FAILED
+            job.finished = timezone.now()
+    else:
+        job.status = Job.DONE
+        job.finished = timezone.now()
+    job.save(update_fields=['status', 'run_at', 'finished', 'last_error'])
+    return job.status
+
+
+def execute_job(pk):
+    '''
+    Точка входа для потока или процесса воркера.
+    '''
+    try:
+        return run_job(pk)
+    finally:
+        close_old_connections()
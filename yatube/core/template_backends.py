@@ -0,0 +1,25 @@
+from django.template.backends.django import DjangoTemplates, Template
+
+from .profiling import timed_render
+
+
+class TimedTemplate(Template):
+
+    def render(self, context=None, request=None):
+        with timed_render():
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    '''
+    Шаблонизатор Django, который замеряет время рендеринга
+    для профиля запроса. Вложенные include рендерятся внутри
+    замера внешнего шаблона и отдельно не считаются.
+    '''
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
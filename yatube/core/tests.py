@@ -0,0 +1,837 @@
+import asyncio
+import importlib
+import io
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.http import HttpResponse
+from django.test import (RequestFactory, SimpleTestCase, TestCase,
+                         override_settings)
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+from .asgi import WsgiToAsgi, build_environ
+from .cache_backends import SQLiteCache
+from .caching import early_expired, get_or_recompute
+from .db import (PRODUCTION_PRAGMAS, apply_pragmas, configure_sqlite,
+                 copy_database)
+from .events import FileBroker, LocalBroker, get_broker
+from .metrics import Registry
+from .middleware import ReplicaMiddleware
+from .models import Job
+from .profiling import QueryBudgetExceeded
+from .routers import ReplicaRouter, RequestRouting, current_routing
+from .tasks import claim_jobs, run_job, task
+
+CALLS = []
+
+
+@task(max_attempts=2, retry_delay=0)
+def record(value):
+    CALLS.append(value)
+
+
+@task(max_attempts=2, retry_delay=0)
+def explode():
+    raise ValueError('Ошибка задачи')
+
+
+class TestTasks(TestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        CALLS.clear()
+
+    def run_queue(self):
+        for pk in claim_jobs(10):
+            run_job(pk)
+
+    def test_delay_runs_in_worker(self):
+        '''Задача ставится в очередь и выполняется воркером'''
+        job = record.delay('value')
+
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(CALLS, [])
+
+        self.run_queue()
+        job.refresh_from_db()
+
+        self.assertEqual(CALLS, ['value'])
+        self.assertEqual(job.status, Job.DONE)
+
+    def test_scheduled_job_waits(self):
+        '''Отложенная задача не выполняется раньше времени'''
+        record.schedule(timedelta(hours=1), 'later')
+
+        self.assertEqual(claim_jobs(10), [])
+
+    def test_retries_then_fails(self):
+        '''Упавшая задача повторяется до исчерпания попыток'''
+        job = explode.delay()
+
+        self.run_queue()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.attempts, 1)
+
+        self.run_queue()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIn('Ошибка задачи', job.last_error)
+
+    def test_worker_requeues_periodically(self):
+        '''Зависшие задачи ищутся не только при запуске воркера'''
+        command = 'core.management.commands.runworker'
+        batches = iter([[1], [2]])
+        with mock.patch(f'{command}.claim_jobs',
+                        side_effect=lambda limit: next(batches, [])), \
+                mock.patch(f'{command}.execute_job'), \
+                mock.patch(f'{command}.requeue_stale_jobs',
+                           return_value=1) as requeue:
+            out = io.StringIO()
+            call_command('runworker', burst=True, requeue=0, poll=0,
+                         stdout=out)
+
+        self.assertGreaterEqual(requeue.call_count, 3)
+        self.assertIn('Возвращено в очередь зависших задач: 1',
+                      out.getvalue())
+
+    @override_settings(TASKS_ALWAYS_EAGER=True)
+    def test_eager_mode(self):
+        '''В режиме TASKS_ALWAYS_EAGER задача выполняется сразу'''
+        self.assertIsNone(record.delay('now'))
+        self.assertEqual(CALLS, ['now'])
+        self.assertFalse(Job.objects.exists())
+
+
+class TestEvents(SimpleTestCase):
+
+    def test_local_broker(self):
+        '''Событие получают только подписчики его каналов'''
+        broker = LocalBroker()
+        posts = broker.subscribe(['posts'])
+        group = broker.subscribe(['group:1'])
+
+        broker.publish(['posts'], {'id': 1})
+
+        self.assertEqual(posts.get(0), {'id': 1})
+        self.assertIsNone(group.get(0))
+
+        posts.close()
+        broker.publish(['posts'], {'id': 2})
+        self.assertIsNone(posts.get(0))
+        self.assertEqual(broker.subscriptions, {'group:1': {group}})
+
+    @override_settings(EVENTS_QUEUE_SIZE=1)
+    def test_slow_subscriber(self):
+        '''Переполненная очередь клиента не блокирует публикацию'''
+        broker = LocalBroker()
+        subscription = broker.subscribe(['posts'])
+
+        broker.publish(['posts'], {'id': 1})
+        broker.publish(['posts'], {'id': 2})
+
+        self.assertEqual(subscription.get(0), {'id': 1})
+        self.assertIsNone(subscription.get(0))
+
+    def test_file_broker_shared(self):
+        '''Брокеры разных процессов обмениваются событиями через файл'''
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'events.log')
+        with override_settings(EVENTS_FILE=path, EVENTS_POLL_INTERVAL=0.01):
+            publisher, reader = FileBroker(), FileBroker()
+            subscription = reader.subscribe(['posts'])
+            publisher.publish(['posts', 'author:1'], {'id': 7})
+
+            self.assertEqual(subscription.get(5), {'id': 7})
+            publisher.stop()
+            reader.stop()
+        shutil.rmtree(directory)
+
+
+class TestAsgi(SimpleTestCase):
+
+    def call(self, application, scope, messages):
+        sent = []
+
+        async def receive():
+            if not messages:
+                #  Как сервер: следующего сообщения можно ждать вечно.
+                await asyncio.Future()
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(application(scope, receive, send))
+        return sent
+
+    def test_environ(self):
+        '''HTTP-scope переводится в окружение WSGI'''
+        environ = build_environ({
+            'method': 'POST', 'path': '/группа/', 'query_string': b'a=1',
+            'headers': [(b'content-type', b'text/plain'),
+                        (b'x-forwarded-for', b'1.1.1.1'),
+                        (b'x-forwarded-for', b'2.2.2.2')],
+        }, io.BytesIO())
+
+        self.assertEqual(environ['REQUEST_METHOD'], 'POST')
+        self.assertEqual(environ['PATH_INFO'].encode('latin-1').decode(),
+                         '/группа/')
+        self.assertEqual(environ['QUERY_STRING'], 'a=1')
+        self.assertEqual(environ['CONTENT_TYPE'], 'text/plain')
+        self.assertEqual(environ['HTTP_X_FORWARDED_FOR'],
+                         '1.1.1.1,2.2.2.2')
+
+    def test_request(self):
+        '''Запрос через ASGI обрабатывается приложением Django'''
+        application = WsgiToAsgi(get_wsgi_application(), threads=2)
+        sent = self.call(application, {
+            'type': 'http', 'method': 'GET', 'path': '/about/author/',
+            'headers': [(b'host', b'testserver')],
+        }, [{'type': 'http.request', 'body': b''}])
+        application.executor.shutdown()
+
+        self.assertEqual(sent[0]['type'], 'http.response.start')
+        self.assertEqual(sent[0]['status'], 200)
+        body = b''.join(message.get('body', b'') for message in sent[1:])
+        self.assertIn(b'<html', body)
+        self.assertFalse(sent[-1].get('more_body'))
+
+    def test_disconnect(self):
+        '''Отключение клиента прерывает и закрывает потоковый ответ'''
+        closed = []
+
+        class Endless:
+
+            def __iter__(self):
+                while True:
+                    time.sleep(0.01)
+                    yield b'data'
+
+            def close(self):
+                closed.append(True)
+
+        def wsgi(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return Endless()
+
+        application = WsgiToAsgi(wsgi, threads=1)
+        sent = self.call(application, {
+            'type': 'http', 'method': 'GET', 'path': '/',
+        }, [{'type': 'http.request', 'body': b''},
+            {'type': 'http.disconnect'}])
+        application.executor.shutdown()
+
+        self.assertEqual(closed, [True])
+        self.assertFalse(any(message.get('more_body') is False
+                             for message in sent))
+
+    @override_settings(EVENTS_ENABLED=True, EVENTS_KEEPALIVE=5)
+    def test_event_stream(self):
+        '''Поток событий через ASGI не занимает поток пула'''
+        application = WsgiToAsgi(get_wsgi_application(), threads=1)
+        sent = []
+
+        async def run():
+            loop = asyncio.get_running_loop()
+            disconnected = asyncio.Event()
+            messages = [{'type': 'http.request', 'body': b''}]
+
+            async def receive():
+                if messages:
+                    return messages.pop(0)
+                await disconnected.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                sent.append(message)
+                body = message.get('body', b'')
+                if body.startswith(b'retry:'):
+                    #  Единственный поток пула свободен, пока поток открыт.
+                    self.assertEqual(await asyncio.wait_for(
+                        loop.run_in_executor(application.executor, str, 1),
+                        1
+                    ), '1')
+                    get_broker().publish(['posts'], {'id': 7})
+                elif body.startswith(b'id: 7'):
+                    disconnected.set()
+
+            await asyncio.wait_for(application({
+                'type': 'http', 'method': 'GET',
+                'path': reverse('posts:events'),
+                'headers': [(b'host', b'testserver')],
+            }, receive, send), 5)
+
+        asyncio.run(run())
+        application.executor.shutdown()
+
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertIn((b'content-type', b'text/event-stream'),
+                      sent[0]['headers'])
+        self.assertEqual(sent[-1]['body'], b'id: 7\nevent: post\n'
+                                           b'data: {"id": 7}\n\n')
+        self.assertEqual(get_broker().subscriptions.get('posts', set()),
+                         set())
+
+    def test_lifespan(self):
+        '''Приложение отвечает на события запуска и остановки'''
+        application = WsgiToAsgi(get_wsgi_application(), threads=1)
+        sent = self.call(application, {'type': 'lifespan'}, [
+            {'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}
+        ])
+
+        self.assertEqual([message['type'] for message in sent],
+                         ['lifespan.startup.complete',
+                          'lifespan.shutdown.complete'])
+
+    def test_compare_servers(self):
+        '''Сравнение режимов выводит скорость обоих'''
+        stdout = io.StringIO()
+        call_command('compare_servers', '/about/author/', requests=4,
+                     concurrency=2, stdout=stdout)
+
+        for mode in ('WSGI', 'ASGI'):
+            with self.subTest(mode=mode):
+                self.assertIn(f'{mode}: 4 запросов', stdout.getvalue())
+        self.assertEqual(stdout.getvalue().count('ошибок: 0'), 2)
+
+
+class TestProfiling(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        Group.objects.create(title='Группа', slug='group',
+                             description='Описание')
+
+    def test_server_timing(self):
+        '''Замеры запроса отдаются в заголовке Server-Timing'''
+        response = self.client.get('/group/group/')
+        timing = response['Server-Timing']
+
+        for metric in ('db;dur=', 'tpl;dur=', 'view;dur=', 'total;dur='):
+            with self.subTest(metric=metric):
+                self.assertIn(metric, timing)
+        self.assertRegex(timing, r'desc="[1-9]\d* queries"')
+
+    def test_structured_log(self):
+        '''Замеры пишутся в лог строкой JSON с именем view'''
+        with self.assertLogs('core.profiling', 'INFO') as logs:
+            self.client.get('/group/group/')
+        record = json.loads(logs.records[0].getMessage())
+
+        self.assertEqual(record['view'], 'posts:group_list')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['queries'], 0)
+        self.assertGreater(record['template_ms'], 0)
+
+    @override_settings(QUERY_BUDGETS={'posts:group_list': 0})
+    def test_budget_logged(self):
+        '''Превышение бюджета запросов попадает в лог'''
+        with self.assertLogs('core.profiling', 'WARNING') as logs:
+            response = self.client.get('/group/group/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('posts:group_list', logs.output[0])
+
+    @override_settings(QUERY_BUDGET=0, QUERY_BUDGET_ACTION='raise')
+    def test_budget_raises(self):
+        '''В строгом режиме превышение бюджета - ошибка'''
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get('/group/group/')
+
+
+class TestMetrics(TestCase):
+
+    def test_exposition(self):
+        '''Счетчики и гистограммы выводятся в формате Prometheus'''
+        registry = Registry()
+        hits = registry.counter('hits_total', 'Попадания', ['prefix'])
+        latency = registry.histogram('latency_seconds', 'Время', ['view'],
+                                     buckets=(0.1, 1))
+        hits.inc(prefix='index_page')
+        hits.inc(2, prefix='index_page')
+        latency.observe(0.05, view='posts:index')
+        latency.observe(0.5, view='posts:index')
+
+        text = registry.exposition()
+        for line in ('# TYPE hits_total counter',
+                     'hits_total{prefix="index_page"} 3',
+                     '# TYPE latency_seconds histogram',
+                     'latency_seconds_bucket{view="posts:index",le="0.1"} 1',
+                     'latency_seconds_bucket{view="posts:index",le="1"} 2',
+                     'latency_seconds_bucket{view="posts:index",le="+Inf"} 2',
+                     'latency_seconds_count{view="posts:index"} 2'):
+            with self.subTest(line=line):
+                self.assertIn(line, text)
+
+    def test_processes_aggregated(self):
+        '''Метрики других процессов суммируются через общий каталог'''
+        directory = tempfile.mkdtemp()
+        registry = Registry()
+        hits = registry.counter('hits_total', 'Попадания')
+        hits.inc()
+        with open(os.path.join(directory, '99999.json'), 'w') as other:
+            json.dump({'hits_total': [[[], 4]], 'unknown': []}, other)
+
+        with override_settings(METRICS_DIR=directory):
+            text = registry.exposition()
+            registry.flush()
+        shutil.rmtree(directory)
+
+        self.assertIn('hits_total 5', text)
+
+    def test_concurrent_flush(self):
+        '''Одновременные сохранения из потоков не мешают друг другу'''
+        directory = tempfile.mkdtemp()
+        registry = Registry()
+        hits = registry.counter('hits_total', 'Попадания')
+
+        with override_settings(METRICS_DIR=directory,
+                               METRICS_FLUSH_INTERVAL=0):
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                list(executor.map(lambda _: hits.inc(), range(400)))
+            registry.changed(force=True)
+        files = os.listdir(directory)
+        with open(os.path.join(directory, f'{os.getpid()}.json')) as dump:
+            saved = json.load(dump)
+        shutil.rmtree(directory)
+
+        self.assertEqual(files, [f'{os.getpid()}.json'])
+        self.assertEqual(saved['hits_total'], [[[], 400]])
+
+    def test_flush_error_ignored(self):
+        '''Ошибка записи метрик не доходит до кода, меняющего метрику'''
+        directory = tempfile.mkdtemp()
+        blocker = os.path.join(directory, 'file')
+        open(blocker, 'w').close()
+        registry = Registry()
+        hits = registry.counter('hits_total', 'Попадания')
+
+        with override_settings(METRICS_DIR=blocker):
+            with self.assertLogs('core.metrics', 'ERROR'):
+                hits.inc()
+        shutil.rmtree(directory)
+
+        self.assertIn('hits_total 1', registry.exposition())
+
+    def test_metrics_endpoint(self):
+        '''/metrics показывает время view и обращения к кэшу'''
+        self.client.get('/')
+        self.client.get('/')
+        text = self.client.get('/metrics').content.decode()
+
+        for line in ('yatube_view_latency_seconds_count{view="posts:index"}',
+                     'yatube_cache_requests_total{prefix="index_page",'
+                     'result="hit"}',
+                     'yatube_cache_requests_total{prefix="index_page",'
+                     'result="miss"}'):
+            with self.subTest(line=line):
+                self.assertIn(line, text)
+
+
+class TestDatabaseSettings(SimpleTestCase):
+
+    def tearDown(self) -> None:
+        super().tearDown()
+        sys.modules.pop('yatube.settings_production', None)
+
+    def production_settings(self, **environ):
+        sys.modules.pop('yatube.settings_production', None)
+        with mock.patch.dict(os.environ, environ):
+            return importlib.import_module('yatube.settings_production')
+
+    def test_pragmas_applied_on_new_connection(self):
+        '''Новое соединение с SQLite получает SQLITE_PRAGMAS'''
+        path = os.path.join(tempfile.mkdtemp(), 'db.sqlite3')
+        connection = mock.Mock(vendor='sqlite',
+                               connection=sqlite3.connect(path))
+        with override_settings(SQLITE_PRAGMAS=PRODUCTION_PRAGMAS):
+            configure_sqlite(sender=None, connection=connection)
+        values = {
+            name: connection.connection.execute(f'PRAGMA {name}').fetchone()[0]
+            for name in ('journal_mode', 'busy_timeout', 'cache_size')
+        }
+        connection.connection.close()
+        shutil.rmtree(os.path.dirname(path))
+
+        self.assertEqual(values, {'journal_mode': 'wal',
+                                  'busy_timeout': 5000,
+                                  'cache_size': -64000})
+
+    def test_pragma_names_are_checked(self):
+        with self.assertRaises(ValueError):
+            apply_pragmas(mock.Mock(), {'cache_size; DROP TABLE x': 1})
+
+    def test_production_settings(self):
+        '''Настройки берутся из окружения, debug_toolbar отключен'''
+        production = self.production_settings(
+            DJANGO_SECRET_KEY='secret', DJANGO_ALLOWED_HOSTS='a.ru, b.ru',
+            DJANGO_CONN_MAX_AGE='60', DJANGO_DB_PATH='/srv/yatube.sqlite3'
+        )
+
+        self.assertFalse(production.DEBUG)
+        self.assertEqual(production.SECRET_KEY, 'secret')
+        self.assertEqual(production.ALLOWED_HOSTS, ['a.ru', 'b.ru'])
+        self.assertEqual(production.DATABASES['default']['CONN_MAX_AGE'], 60)
+        self.assertEqual(production.DATABASES['default']['NAME'],
+                         '/srv/yatube.sqlite3')
+        self.assertEqual(production.SQLITE_PRAGMAS['journal_mode'], 'WAL')
+        self.assertNotIn('debug_toolbar', production.INSTALLED_APPS)
+        self.assertFalse(any('debug_toolbar' in middleware
+                             for middleware in production.MIDDLEWARE))
+
+    def test_production_requires_secret_key(self):
+        with mock.patch.dict(os.environ):
+            os.environ.pop('DJANGO_SECRET_KEY', None)
+            with self.assertRaises(ImproperlyConfigured):
+                self.production_settings()
+
+    def test_benchmark_sqlite(self):
+        stdout = io.StringIO()
+        call_command('benchmark_sqlite', duration=0.2, readers=2, writers=1,
+                     rows=100, stdout=stdout)
+        self.assertIn('по умолчанию: чтений', stdout.getvalue())
+        self.assertIn('production: чтений', stdout.getvalue())
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'],
+                   REPLICA_HEALTH_INTERVAL=30)
+class TestReplicaRouter(SimpleTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.router = ReplicaRouter()
+        self.healthy = {'replica1': True, 'replica2': True}
+        self.checks = []
+
+        def check(alias):
+            self.checks.append(alias)
+            return self.healthy[alias]
+
+        self.router.health.check = check
+        self.routing = RequestRouting()
+        token = current_routing.set(self.routing)
+        self.addCleanup(current_routing.reset, token)
+
+    def reads(self, count=4):
+        return [self.router.db_for_read(Post) for _ in range(count)]
+
+    def test_round_robin(self):
+        '''Чтения по кругу распределяются между репликами'''
+        self.assertEqual(self.reads(),
+                         ['replica1', 'replica2', 'replica1', 'replica2'])
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+
+    def test_unhealthy_replica_skipped(self):
+        '''Недоступная реплика пропускается, проверка кэшируется'''
+        self.healthy['replica1'] = False
+        self.assertEqual(self.reads(), ['replica2'] * 4)
+        self.assertEqual(sorted(self.checks), ['replica1', 'replica2'])
+
+        self.healthy['replica2'] = False
+        with override_settings(REPLICA_HEALTH_INTERVAL=0):
+            self.assertEqual(self.reads(2), ['default', 'default'])
+
+    def test_sessions_read_from_primary(self):
+        self.assertEqual(self.router.db_for_read(Session), 'default')
+
+    def test_reads_after_write_stay_on_primary(self):
+        self.router.db_for_write(Post)
+        self.assertTrue(self.routing.wrote)
+        self.assertEqual(self.reads(2), ['default', 'default'])
+
+    def test_primary_outside_request_and_transaction(self):
+        with mock.patch.object(connections['default'], 'in_atomic_block',
+                               True):
+            self.assertEqual(self.reads(1), ['default'])
+        current_routing.set(None)
+        self.assertEqual(self.reads(1), ['default'])
+
+    def test_missing_alias_is_unhealthy(self):
+        self.assertFalse(ReplicaRouter().health.check('missing'))
+
+    def test_unsynced_replica_is_unhealthy(self):
+        '''Реплика без схемы (пустой файл SQLite) считается недоступной'''
+        directory = tempfile.mkdtemp()
+        connections.databases['empty'] = {
+            **connections.databases['default'],
+            'NAME': os.path.join(directory, 'replica.sqlite3'),
+        }
+        try:
+            self.assertFalse(ReplicaRouter().health.check('empty'))
+        finally:
+            connections['empty'].close()
+            del connections.databases['empty']
+            delattr(connections._connections, 'empty')
+            shutil.rmtree(directory)
+
+    @override_settings(DATABASE_REPLICAS=['replica1'])
+    def test_cache_recompute_reads_primary(self):
+        '''Пересчет общего кэша не читает отстающую реплику'''
+        reads = []
+
+        def recompute():
+            reads.append(self.router.db_for_read(Post))
+            return 'страница'
+
+        cache.clear()
+        get_or_recompute('replica-key', recompute, 60, version=1)
+        get_or_recompute('replica-key', recompute, 60, version=2)
+
+        self.assertEqual(reads, ['default', 'default'])
+        self.assertFalse(self.routing.pinned)
+        self.assertEqual(self.reads(1), ['replica1'])
+
+
+@override_settings(DATABASE_REPLICAS=['missing'])
+class TestReplicaMiddleware(TestCase):
+
+    def routing_for(self, request):
+        seen = []
+
+        def view(request):
+            seen.append(current_routing.get().pinned)
+            return HttpResponse()
+
+        ReplicaMiddleware(view)(request)
+        return seen[0]
+
+    def test_pinning(self):
+        '''Небезопасный метод и cookie закрепляют запрос за основной базой'''
+        factory = RequestFactory()
+        self.assertFalse(self.routing_for(factory.get('/')))
+        self.assertTrue(self.routing_for(factory.post('/')))
+        request = factory.get('/')
+        request.COOKIES['use_primary'] = '1'
+        self.assertTrue(self.routing_for(request))
+
+    def test_write_sets_cookie(self):
+        '''После записи клиент получает cookie use_primary'''
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        self.client.force_login(reader)
+
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('use_primary', response.cookies)
+
+        response = self.client.get(reverse('posts:profile_follow',
+                                           args=[author.username]))
+        self.assertEqual(response.cookies['use_primary']['max-age'], 5)
+
+
+class TestSyncReplicas(SimpleTestCase):
+
+    def test_copy_database(self):
+        directory = tempfile.mkdtemp()
+        primary = os.path.join(directory, 'primary.sqlite3')
+        replica = os.path.join(directory, 'replica.sqlite3')
+        with sqlite3.connect(primary) as connection:
+            connection.execute('CREATE TABLE item (id INTEGER)')
+            connection.execute('INSERT INTO item VALUES (1)')
+        connection.close()
+        copy_database(primary, replica)
+        copied = sqlite3.connect(replica)
+        rows = copied.execute('SELECT id FROM item').fetchall()
+        copied.close()
+        shutil.rmtree(directory)
+
+        self.assertEqual(rows, [(1,)])
+
+    def test_sync_requires_replicas(self):
+        with self.assertRaisesMessage(CommandError, 'DATABASE_REPLICAS'):
+            call_command('sync_replicas', stdout=io.StringIO())
+
+
+class TestSQLiteCache(SimpleTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'cache.sqlite3')
+        self.cache = self.create()
+
+    def create(self, **options):
+        return SQLiteCache(self.path, {'OPTIONS': options})
+
+    def test_basic_operations(self):
+        cache = self.cache
+        cache.set('page', {'html': 'главная'})
+        self.assertEqual(cache.get('page'), {'html': 'главная'})
+        self.assertIsNone(cache.get('missing'))
+        self.assertTrue(cache.has_key('page'))
+        self.assertFalse(cache.add('page', 'другое'))
+        self.assertTrue(cache.add('lock', 1))
+        cache.set_many({'a': 1, 'b': 2})
+        self.assertEqual(cache.get_many(['a', 'b', 'c']), {'a': 1, 'b': 2})
+        cache.delete_many(['a', 'page'])
+        self.assertEqual(cache.get_many(['a', 'b', 'page']), {'b': 2})
+        cache.clear()
+        self.assertIsNone(cache.get('b'))
+
+    def test_expiration(self):
+        cache = self.cache
+        cache.set('expired', 1, timeout=0)
+        self.assertIsNone(cache.get('expired'))
+        self.assertFalse(cache.has_key('expired'))
+        self.assertTrue(cache.add('expired', 2))
+        self.assertEqual(cache.get('expired'), 2)
+        self.assertTrue(cache.touch('expired', timeout=None))
+        self.assertFalse(cache.touch('missing'))
+
+    def test_incr_is_atomic(self):
+        '''Параллельные incr не теряют обновлений'''
+        self.cache.set('counter', 0)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+        def increment(_):
+            self.cache.incr('counter')
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(increment, range(200)))
+        self.assertEqual(self.cache.get('counter'), 200)
+        self.assertEqual(self.cache.decr('counter', 50), 150)
+
+    def test_lru_eviction(self):
+        '''При переполнении удаляются давно не читавшиеся ключи'''
+        cache = self.create(MAX_ENTRIES=5, CULL_FREQUENCY=3)
+        cache.LRU_RESOLUTION = 0
+        for number in range(5):
+            cache.set(f'key{number}', number)
+        cache.get('key0')
+        cache.set('key5', 5)
+
+        self.assertEqual(sorted(cache.get_many([f'key{number}'
+                                                for number in range(6)])),
+                         ['key0', 'key3', 'key4', 'key5'])
+
+    def test_shared_between_instances(self):
+        '''Запись и удаление в одном процессе видны другому'''
+        other = self.create()
+        self.cache.set('index_page', 'html')
+        self.assertEqual(other.get('index_page'), 'html')
+        other.delete('index_page')
+        self.assertIsNone(self.cache.get('index_page'))
+
+    def test_benchmark_cache(self):
+        stdout = io.StringIO()
+        call_command('benchmark_cache', keys=20, operations=100, threads=2,
+                     size=10, stdout=stdout)
+        lines = stdout.getvalue().splitlines()
+        self.assertTrue(lines[1].startswith('LocMemCache'))
+        self.assertTrue(lines[1].endswith('0%'))
+        self.assertTrue(lines[3].startswith('SQLiteCache'))
+        self.assertTrue(lines[3].endswith('100%'))
+
+
+class TestStaleWhileRevalidate(SimpleTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+        self.calls = []
+
+    def recompute(self, value='новое'):
+        def recompute():
+            self.calls.append(value)
+            return value
+        return recompute
+
+    def test_hit_and_version_change(self):
+        '''Актуальная запись отдается без пересчета, новая версия - с ним'''
+        self.assertEqual(get_or_recompute('key', self.recompute('старое'),
+                                          60, version=1), ('старое', True))
+        self.assertEqual(get_or_recompute('key', self.recompute(), 60,
+                                          version=1), ('старое', True))
+        self.assertEqual(get_or_recompute('key', self.recompute(), 60,
+                                          version=2), ('новое', True))
+        self.assertEqual(self.calls, ['старое', 'новое'])
+        self.assertIsNone(cache.get('key:lock'))
+
+    def test_stale_served_while_locked(self):
+        '''Пока запись пересчитывает другой запрос, отдается старая'''
+        get_or_recompute('key', self.recompute('старое'), 60, version=1)
+        cache.add('key:lock', 1)
+
+        self.assertEqual(get_or_recompute('key', self.recompute(), 60,
+                                          version=2), ('старое', False))
+        self.assertEqual(self.calls, ['старое'])
+
+    def test_expired_entry_stale_while_locked(self):
+        get_or_recompute('key', self.recompute('старое'), 0, version=1)
+        cache.add('key:lock', 1)
+        self.assertEqual(get_or_recompute('key', self.recompute(), 0,
+                                          version=1), ('старое', True))
+        cache.delete('key:lock')
+        self.assertEqual(get_or_recompute('key', self.recompute(), 0,
+                                          version=1), ('новое', True))
+
+    def test_early_expiration(self):
+        now = 1000.0
+        self.assertFalse(early_expired(now + 10, 0, 1.0, now))
+        self.assertTrue(early_expired(now, 0, 1.0, now))
+        #  Долгий пересчет почти наверняка начинается заранее:
+        self.assertTrue(early_expired(now + 1, 1000, 1.0, now))
+
+    def test_single_recompute_under_concurrency(self):
+        '''После истечения записи пересчитывает только один поток'''
+        get_or_recompute('key', self.recompute('старое'), 0, version=1)
+        self.calls.clear()
+
+        def slow():
+            self.calls.append('новое')
+            time.sleep(0.1)
+            return 'новое'
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(
+                lambda _: get_or_recompute('key', slow, 60, version=2)[0],
+                range(8)
+            ))
+        self.assertEqual(self.calls, ['новое'])
+        self.assertEqual(results.count('новое'), 1)
+        self.assertEqual(results.count('старое'), 7)
+
+    def test_single_compute_on_empty_cache(self):
+        '''Пустой кэш заполняет один поток, остальные ждут запись'''
+        def slow():
+            self.calls.append('новое')
+            time.sleep(0.1)
+            return 'новое'
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(
+                lambda _: get_or_recompute('key', slow, 60, version=1),
+                range(8)
+            ))
+        self.assertEqual(self.calls, ['новое'])
+        self.assertEqual(results, [('новое', True)] * 8)
+        self.assertIsNone(cache.get('key:lock'))
+
+    @override_settings(CACHE_LOCK_WAIT=0.1)
+    def test_empty_cache_wait_timeout(self):
+        '''Не дождавшись записи, запрос считает ее сам'''
+        cache.add('key:lock', 1)
+        self.assertEqual(get_or_recompute('key', self.recompute(), 60,
+                                          version=1), ('новое', True))
+        self.assertEqual(self.calls, ['новое'])
+        #  Чужую блокировку запрос не снимает.
+        self.assertEqual(cache.get('key:lock'), 1)
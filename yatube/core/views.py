@@ -1,5 +1,8 @@
+from django.http import HttpResponse
 from django.shortcuts import render
 
+from .metrics import registry
+
 
 def page_not_found(request, exception):
 
@@ -18,3 +21,9 @@ def server_error(request):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def metrics(request):
+    return HttpResponse(registry.exposition(),
+                        content_type='text/plain; version=0.0.4; '
+                                     'charset=utf-8')
@@ -1,6 +1,7 @@
 from django.contrib import admin
 
 from .models import Comment, Follow, Group, Post
+from .search import search_posts
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -10,9 +11,18 @@ class PostAdmin(admin.ModelAdmin):
     list_editable = ['group']
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        '''
+        Ищет по полнотекстовому индексу вместо LIKE по всей таблице.
+        '''
+        if not search_term:
+            return queryset, False
+        found = search_posts(search_term).values('pk')
+        return queryset.filter(pk__in=found), False
+
 
 class GroupAdmin(admin.ModelAdmin):
-    list_display = ['title']
+    list_display = ['title', 'posts_count']
     prepopulated_fields = {
         "slug": ("title",)
     }
@@ -0,0 +1,356 @@
+import io
+import math
+import random
+import subprocess
+import time
+import tracemalloc
+from datetime import timedelta
+from itertools import accumulate
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import Count, Max
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from .cache import invalidate_index
+from .counters import recount_all
+from .feed import rebuild_feed
+from .importer import keep_dates
+from .models import Comment, Follow, Group, Post, SearchEntry, User
+from .search import index_post
+
+USER_PREFIX = 'bench_'
+GROUP_PREFIX = 'bench-'
+IMAGES = 8
+WORDS = (
+    'кот собака город утро вечер новость проект дорога книга музыка '
+    'фильм погода лето зима работа отпуск море горы друзья семья '
+    'программа код ошибка релиз тест сервер база запрос кэш лента '
+    'подписка автор группа пост комментарий фотография прогулка парк '
+    'кофе чай завтрак ужин поезд самолет путешествие история идея план'
+).split()
+
+
+def zipf_weights(size, exponent=1.1):
+    '''
+    Накопленные веса закона Ципфа: i-й элемент выбирается
+    с вероятностью, пропорциональной 1 / (i + 1) ** exponent.
+    '''
+    return list(accumulate(1 / (rank + 1) ** exponent
+                           for rank in range(size)))
+
+
+def bench_images():
+    '''
+    Создает в хранилище несколько картинок для постов
+    и возвращает их имена.
+    '''
+    names = []
+    for number in range(IMAGES):
+        name = f'posts/{USER_PREFIX}{number}.png'
+        if not default_storage.exists(name):
+            image = Image.new('RGB', (960, 640),
+                              (number * 30 % 256, 120, 200 - number * 20))
+            content = io.BytesIO()
+            image.save(content, 'PNG')
+            default_storage.save(name, ContentFile(content.getvalue()))
+        names.append(name)
+    return names
+
+
+def clear_benchmark_data():
+    '''
+    Удаляет пользователей и группы, созданные seed_benchmark,
+    вместе с их постами, комментариями и подписками.
+    '''
+    Group.objects.filter(slug__startswith=GROUP_PREFIX).delete()
+    User.objects.filter(username__startswith=USER_PREFIX).delete()
+
+
+def seed(users=1000, posts=10000, groups=20, comments=3.0, images=0.2,
+         follows=20, seed=0, batch_size=1000, log=None):
+    '''
+    Создает воспроизводимый (при том же seed) набор данных:
+    популярность авторов и число подписчиков распределены по
+    степенному закону, у постов есть группы, картинки и
+    комментарии. Строки вставляются через bulk_create, затем
+    пересчитываются счетчики, ленты и поисковый индекс.
+    '''
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+    now = timezone.now()
+
+    User.objects.bulk_create(
+        [User(username=f'{USER_PREFIX}{number}',
+              first_name=rng.choice(WORDS).title(), password='!')
+         for number in range(users)],
+        ignore_conflicts=True
+    )
+    user_ids = list(User.objects.filter(username__startswith=USER_PREFIX)
+                    .order_by('pk').values_list('pk', flat=True))
+    Group.objects.bulk_create(
+        [Group(title=f'Группа {number}', slug=f'{GROUP_PREFIX}{number}',
+               description=' '.join(rng.choices(WORDS, k=12)))
+         for number in range(groups)],
+        ignore_conflicts=True
+    )
+    group_ids = list(Group.objects.filter(slug__startswith=GROUP_PREFIX)
+                     .order_by('pk').values_list('pk', flat=True))
+    log(f'Пользователей: {len(user_ids)}, групп: {len(group_ids)}')
+
+    #  Случайный порядок, чтобы популярность не совпадала с pk.
+    authors = user_ids[:]
+    rng.shuffle(authors)
+    author_weights = zipf_weights(len(authors))
+    group_weights = zipf_weights(len(group_ids))
+    image_names = bench_images() if images else []
+
+    next_pk = (Post.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+    created = {'posts': 0, 'comments': 0, 'follows': 0}
+    for start in range(0, posts, batch_size):
+        batch = []
+        for pk in range(next_pk + start,
+                        next_pk + min(start + batch_size, posts)):
+            group = None
+            if group_ids and rng.random() < 0.7:
+                group = rng.choices(group_ids, cum_weights=group_weights)[0]
+            image = ''
+            if image_names and rng.random() < images:
+                image = rng.choice(image_names)
+            batch.append(Post(
+                pk=pk,
+                text=' '.join(rng.choices(WORDS, k=rng.randint(5, 60))),
+                author_id=rng.choices(authors,
+                                      cum_weights=author_weights)[0],
+                group_id=group,
+                image=image,
+                pub_date=now - timedelta(
+                    seconds=rng.randint(0, 365 * 24 * 3600)),
+            ))
+        post_comments = [
+            Comment(post_id=post.pk,
+                    author_id=rng.choices(
+                        authors, cum_weights=author_weights)[0],
+                    text=' '.join(rng.choices(WORDS, k=rng.randint(3, 20))),
+                    created=post.pub_date + timedelta(
+                        minutes=rng.randint(1, 10000)))
+            for post in batch
+            for _ in range(int(rng.expovariate(1 / comments)
+                               if comments else 0))
+        ]
+        with transaction.atomic(), keep_dates():
+            Post.objects.bulk_create(batch)
+            Comment.objects.bulk_create(post_comments)
+        created['posts'] += len(batch)
+        created['comments'] += len(post_comments)
+        log(f'Постов: {created["posts"]}, '
+            f'комментариев: {created["comments"]}')
+
+    #  Число подписок у читателя - распределение Парето со средним
+    #  около follows, авторы выбираются по популярности.
+    pairs = []
+    for user_id in user_ids:
+        amount = min(len(authors) - 1,
+                     int(rng.paretovariate(1.5) * follows / 3))
+        chosen = set(rng.choices(authors, cum_weights=author_weights,
+                                 k=amount))
+        chosen.discard(user_id)
+        pairs.extend(Follow(user_id=user_id, author_id=author_id)
+                     for author_id in chosen)
+        if len(pairs) >= batch_size:
+            Follow.objects.bulk_create(pairs, ignore_conflicts=True)
+            pairs = []
+    Follow.objects.bulk_create(pairs, ignore_conflicts=True)
+    #  Повторный запуск пропускает существующие подписки.
+    created['follows'] = Follow.objects.filter(
+        user__username__startswith=USER_PREFIX
+    ).count()
+    log(f'Подписок: {created["follows"]}')
+
+    rebuild_derived(user_ids, next_pk)
+    created['users'] = len(user_ids)
+    created['groups'] = len(group_ids)
+    return created
+
+
+def rebuild_derived(user_ids, first_post_pk):
+    '''
+    bulk_create не вызывает сигналы, поэтому счетчики, ленты
+    и поисковый индекс новых данных строятся отдельно.
+    '''
+    with transaction.atomic():
+        recount_all()
+    for user_id in user_ids:
+        with transaction.atomic():
+            rebuild_feed(user_id)
+    last_pk = first_post_pk - 1
+    while True:
+        batch = list(Post.objects.filter(pk__gt=last_pk).order_by('pk')
+                     .only('pk', 'text')[:1000])
+        if not batch:
+            break
+        with transaction.atomic():
+            for post in batch:
+                index_post(post)
+        last_pk = batch[-1].pk
+    invalidate_index()
+
+
+def percentile(values, share):
+    '''
+    Процентиль методом ближайшего ранга.
+    '''
+    ordered = sorted(values)
+    rank = max(1, math.ceil(share * len(ordered)))
+    return ordered[rank - 1]
+
+
+def targets():
+    '''
+    Адреса для замера: по одному представителю каждой страницы
+    постов, выбранному по текущим данным (самые популярные
+    группа, автор и пост, самый активный читатель).
+    Возвращает список (имя, адрес, пользователь или None).
+    '''
+    result = [
+        ('posts:index', reverse('posts:index'), None),
+        ('posts:index?page=2', f'{reverse("posts:index")}?page=2', None),
+        ('posts:feed_rss', reverse('posts:feed_rss'), None),
+        ('api:post_list', reverse('api:post_list'), None),
+    ]
+    group = Group.objects.order_by('-posts_count').first()
+    if group:
+        result.append(('posts:group_list',
+                       reverse('posts:group_list', args=[group.slug]), None))
+    author = User.objects.order_by('-stats__followers_count').first()
+    if author:
+        result.append(('posts:profile',
+                       reverse('posts:profile', args=[author.username]),
+                       None))
+    post = Post.objects.order_by('-comments_count').first()
+    if post:
+        result.append(('posts:post_detail',
+                       reverse('posts:post_detail', args=[post.pk]), None))
+    reader = User.objects.order_by('-stats__following_count').first()
+    if reader:
+        result.append(('posts:follow_index', reverse('posts:follow_index'),
+                       reader))
+    term = (SearchEntry.objects.values('term').annotate(posts=Count('pk'))
+            .order_by('-posts').values_list('term', flat=True).first())
+    if term:
+        result.append(('posts:search',
+                       f'{reverse("posts:search")}?q={term}', None))
+    return result
+
+
+def measure(url, user=None, iterations=20, cold=False):
+    '''
+    Запрашивает url через тестовый клиент iterations раз.
+    Пиковая память замеряется отдельным запросом, потому что
+    tracemalloc сам замедляет выполнение.
+    '''
+    #  Не из INTERNAL_IPS, чтобы не мерить debug_toolbar.
+    client = Client(REMOTE_ADDR='192.0.2.1')
+    if user is not None:
+        client.force_login(user)
+    times, queries, statuses = [], [], set()
+    for _ in range(iterations):
+        if cold:
+            cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = client.get(url)
+            times.append(time.perf_counter() - started)
+        queries.append(len(captured))
+        statuses.add(response.status_code)
+
+    if cold:
+        cache.clear()
+    tracemalloc.start()
+    client.get(url)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return summary(times, queries, statuses, peak)
+
+
+def regression_dataset():
+    '''
+    Небольшой фиксированный набор данных для проверки регрессий:
+    одинаков при каждом запуске тестов.
+    '''
+    return seed(users=30, posts=300, groups=4, comments=2, images=0,
+                follows=6, seed=2024)
+
+
+def regression_profile(iterations=5):
+    '''
+    Число SQL-запросов (с холодным кэшем, поэтому детерминировано)
+    и медиана времени ответа для каждой страницы из targets().
+    '''
+    profile = {}
+    for name, url, user in targets():
+        cache.clear()
+        result = measure(url, user, iterations)
+        profile[name] = {'queries': result['queries'],
+                         'p50_ms': result['p50_ms']}
+    return profile
+
+
+def measure_server(base_url, url, iterations=20):
+    '''
+    То же для запущенного сервера: запросы и память процесса
+    сервера отсюда не видны.
+    '''
+    from urllib.error import HTTPError
+    from urllib.request import urlopen
+
+    times, statuses = [], set()
+    for _ in range(iterations):
+        started = time.perf_counter()
+        try:
+            with urlopen(base_url.rstrip('/') + url) as response:
+                response.read()
+                statuses.add(response.status)
+        except HTTPError as error:
+            statuses.add(error.code)
+        times.append(time.perf_counter() - started)
+    return summary(times, None, statuses, None)
+
+
+def summary(times, queries, statuses, peak):
+    return {
+        'requests': len(times),
+        'statuses': sorted(statuses),
+        'p50_ms': round(percentile(times, 0.5) * 1000, 2),
+        'p95_ms': round(percentile(times, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(times, 0.99) * 1000, 2),
+        'mean_ms': round(sum(times) / len(times) * 1000, 2),
+        'queries': max(queries) if queries else None,
+        'peak_memory_kb': round(peak / 1024, 1) if peak else None,
+    }
+
+
+def dataset():
+    return {
+        'users': User.objects.count(),
+        'groups': Group.objects.count(),
+        'posts': Post.objects.count(),
+        'comments': Comment.objects.count(),
+        'follows': Follow.objects.count(),
+    }
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+            check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
@@ -0,0 +1,39 @@
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.core.paginator import Page
+
+INDEX_PAGE_KEY = 'index_page'
+INDEX_GENERATION_KEY = f'{INDEX_PAGE_KEY}:generation'
+#  ETag устаревшего ответа: никогда не совпадает с текущим.
+STALE_ETAG = 'stale'
+
+
+def index_generation():
+    '''
+    Возвращает текущее поколение кэша главной страницы.
+    Страницы кэшируются вместе с поколением, поэтому смена
+    поколения разом делает их все устаревшими.
+    '''
+    return cache.get_or_set(INDEX_GENERATION_KEY, uuid4().hex, None)
+
+
+def invalidate_index():
+    cache.set(INDEX_GENERATION_KEY, uuid4().hex, None)
+
+
+def index_page_key(page_number):
+    return f'{INDEX_PAGE_KEY}:{page_number}'
+
+
+def freeze_page(page_obj):
+    '''
+    Готовит страницу паджинатора к помещению в кэш:
+    вычисляет посты страницы и отвязывает паджинатор
+    от QuerySet. Количество постов паджинатор уже посчитал
+    в get_page() и хранит у себя, поэтому оно сохраняется.
+    '''
+    page_obj.object_list = list(page_obj.object_list)
+    if isinstance(page_obj, Page):
+        page_obj.paginator.object_list = []
+    return page_obj
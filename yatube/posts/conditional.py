@@ -0,0 +1,66 @@
+import hashlib
+
+from django.db.models import Count, Max
+
+from .cache import index_generation
+from .models import FeedEntry, Group, Post, User
+
+
+def page_etag(request, *parts):
+    '''
+    Собирает ETag страницы из адреса (страница, курсор, запрос),
+    посетителя и переданных частей. Посетитель входит в ETag,
+    потому что шапка и формы страницы зависят от него.
+    Поколение кэша постов меняется при любом сохранении или
+    удалении поста, поэтому правки тоже меняют ETag.
+    '''
+    user = request.user
+    viewer = user.pk if user.is_authenticated else 'anonymous'
+    key = ':'.join(str(part) for part in (
+        request.get_full_path(), viewer, index_generation(), *parts
+    ))
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def index_etag(request):
+    '''
+    Главная показывает только посты, поэтому поколения кэша
+    достаточно, и проверка обходится без запроса к базе.
+    '''
+    return page_etag(request)
+
+
+def group_etag(request, slug):
+    group = (Group.objects.filter(slug=slug)
+             .values_list('title', 'description', 'posts_count')
+             .first())
+    if group is None:
+        return None
+    return page_etag(request, *group)
+
+
+def profile_etag(request, username):
+    author = (User.objects.filter(username=username)
+              .values_list('first_name', 'last_name', 'stats__posts_count',
+                           'stats__followers_count',
+                           'stats__following_count')
+              .first())
+    if author is None:
+        return None
+    return page_etag(request, *author)
+
+
+def post_etag(request, post_id):
+    post = (Post.objects.filter(pk=post_id).order_by()
+            .values_list('comments_count', 'author__stats__posts_count')
+            .first())
+    if post is None:
+        return None
+    return page_etag(request, *post)
+
+
+def follow_etag(request):
+    feed = FeedEntry.objects.filter(user=request.user).aggregate(
+        latest=Max('pub_date'), count=Count('pk')
+    )
+    return page_etag(request, feed['latest'], feed['count'])
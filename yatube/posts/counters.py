@@ -0,0 +1,85 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+def bump(model, pk, field, delta):
+    '''
+    Атомарно меняет счетчик на delta одним UPDATE
+    и возвращает количество обновленных строк.
+    Счетчик не опускается ниже нуля.
+    '''
+    if pk is None:
+        return 0
+    rows = model.objects.filter(pk=pk)
+    if delta < 0:
+        rows = rows.filter(**{f'{field}__gte': -delta})
+    return rows.update(**{field: F(field) + delta})
+
+
+def bump_user(user_id, field, delta):
+    '''
+    Меняет счетчик пользователя. Если строки статистики еще нет,
+    она создается с пересчитанными с нуля значениями.
+    '''
+    if not bump(UserStats, user_id, field, delta) and delta > 0:
+        recount_user(user_id)
+
+
+def user_stats(user):
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        return recount_user(user.pk)
+
+
+def recount_user(user_id):
+    stats, _ = UserStats.objects.update_or_create(
+        user_id=user_id,
+        defaults={
+            'posts_count': Post.objects.filter(author_id=user_id).count(),
+            'followers_count': (Follow.objects.filter(author_id=user_id)
+                                .count()),
+            'following_count': (Follow.objects.filter(user_id=user_id)
+                                .count()),
+        }
+    )
+    return stats
+
+
+def count_of(queryset, field):
+    '''
+    Подзапрос количества строк queryset, связанных с внешней
+    строкой через field; для строк без связей дает 0.
+    '''
+    counts = (queryset.filter(**{field: OuterRef('pk')})
+              .order_by().values(field)
+              .annotate(total=Count('pk')).values('total'))
+    return Coalesce(Subquery(counts), 0)
+
+
+def recount_all():
+    '''
+    Пересчитывает все счетчики с нуля, исправляя накопившийся
+    дрейф. Каждая таблица обновляется одним UPDATE с подзапросами.
+    '''
+    missing = User.objects.filter(stats__isnull=True).values_list('pk',
+                                                                  flat=True)
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=user_id) for user_id in missing],
+        ignore_conflicts=True
+    )
+    return {
+        'users': UserStats.objects.update(
+            posts_count=count_of(Post.objects.all(), 'author'),
+            followers_count=count_of(Follow.objects.all(), 'author'),
+            following_count=count_of(Follow.objects.all(), 'user'),
+        ),
+        'groups': Group.objects.update(
+            posts_count=count_of(Post.objects.all(), 'group')
+        ),
+        'posts': Post.objects.update(
+            comments_count=count_of(Comment.objects.all(), 'post')
+        ),
+    }
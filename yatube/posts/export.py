@@ -0,0 +1,155 @@
+import csv
+import json
+import zlib
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+from .models import Comment, Post
+
+EXPORTS = {
+    'posts': {
+        'model': Post,
+        'date': 'pub_date',
+        'group': 'group__slug',
+        'columns': (
+            ('id', 'id'),
+            ('text', 'text'),
+            ('pub_date', 'pub_date'),
+            ('author', 'author__username'),
+            ('group', 'group__slug'),
+            ('image', 'image'),
+            ('comments_count', 'comments_count'),
+        ),
+    },
+    'comments': {
+        'model': Comment,
+        'date': 'created',
+        'group': 'post__group__slug',
+        'columns': (
+            ('id', 'id'),
+            ('post', 'post_id'),
+            ('author', 'author__username'),
+            ('text', 'text'),
+            ('created', 'created'),
+        ),
+    },
+}
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def export_filters(kind, since=None, until=None, author=None, group=None):
+    '''
+    Переводит параметры выгрузки в условия filter(). Границы
+    дат включительные и задаются по локальному времени.
+    '''
+    export = EXPORTS[kind]
+    filters = {}
+    if since:
+        filters[f'{export["date"]}__gte'] = timezone.make_aware(
+            datetime.combine(since, time.min))
+    if until:
+        filters[f'{export["date"]}__lt'] = timezone.make_aware(
+            datetime.combine(until + timedelta(days=1), time.min))
+    if author:
+        filters['author__username'] = author
+    if group:
+        filters[export['group']] = group
+    return filters
+
+
+def export_rows(kind, filters, batch_size=1000):
+    '''
+    Отдает строки выгрузки кортежами значений. Таблица читается
+    пачками по первичному ключу (pk > последнего выгруженного),
+    так что память не зависит от размера таблицы, а каждый запрос
+    использует индекс, а не OFFSET.
+    '''
+    export = EXPORTS[kind]
+    lookups = [lookup for _, lookup in export['columns']]
+    queryset = export['model'].objects.filter(**filters).order_by('pk')
+    last_pk = 0
+    while True:
+        batch = queryset.filter(pk__gt=last_pk).values_list(
+            *lookups)[:batch_size]
+        count = 0
+        for row in batch.iterator(chunk_size=batch_size):
+            count += 1
+            yield row
+        if count < batch_size:
+            break
+        last_pk = row[0]
+
+
+def _value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+class _Line:
+    '''
+    Буфер для csv.writer, который сразу возвращает записанную строку.
+    '''
+
+    def write(self, value):
+        return value
+
+
+def render_lines(kind, rows, fmt):
+    '''
+    Превращает строки выгрузки в строки NDJSON или CSV.
+    '''
+    names = [name for name, _ in EXPORTS[kind]['columns']]
+    if fmt == 'csv':
+        writer = csv.writer(_Line())
+        yield writer.writerow(names)
+        for row in rows:
+            yield writer.writerow(
+                ['' if value is None else _value(value) for value in row])
+        return
+    for row in rows:
+        yield json.dumps(dict(zip(names, map(_value, row))),
+                         ensure_ascii=False) + '\n'
+
+
+def buffered(lines, size=64 * 1024):
+    '''
+    Склеивает короткие строки в куски примерно по size байт,
+    чтобы не отправлять клиенту каждую строку отдельно.
+    '''
+    buffer, length = [], 0
+    for line in lines:
+        data = line.encode()
+        buffer.append(data)
+        length += len(data)
+        if length >= size:
+            yield b''.join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def gzip_chunks(chunks):
+    '''
+    Сжимает поток gzip по мере чтения, не собирая его целиком.
+    '''
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(kind, filters, fmt='ndjson', compress=False,
+                  batch_size=1000):
+    '''
+    Поток байтов выгрузки для файла или StreamingHttpResponse.
+    '''
+    rows = export_rows(kind, filters, batch_size)
+    chunks = buffered(render_lines(kind, rows, fmt))
+    return gzip_chunks(chunks) if compress else chunks
@@ -0,0 +1,95 @@
+from django.conf import settings
+from django.db import connection
+
+from .models import FeedEntry, Follow, Post
+
+#  Номер записи в ленте читателя считает оконная функция,
+#  поэтому ленты всех читателей обрезаются одним запросом.
+TRIM_FEEDS_SQL = '''
+DELETE FROM {table} WHERE id IN (
+    SELECT id FROM (
+        SELECT id, ROW_NUMBER() OVER (
+            PARTITION BY user_id ORDER BY pub_date DESC, id DESC
+        ) AS position
+        FROM {table} WHERE user_id IN ({readers})
+    ) AS ranked WHERE ranked.position > %s
+)
+'''
+
+
+def trim_feed(user_id):
+    '''
+    Удаляет из ленты читателя записи, не попадающие
+    в последние FEED_DEPTH постов.
+    '''
+    stale = list(FeedEntry.objects.filter(user_id=user_id)
+                 .order_by('-pub_date', '-id')
+                 .values_list('pk', flat=True)[settings.FEED_DEPTH:])
+    if stale:
+        FeedEntry.objects.filter(pk__in=stale).delete()
+
+
+def trim_feeds(readers):
+    '''
+    Обрезает до FEED_DEPTH ленты всех читателей из readers
+    (queryset из одного поля с id пользователя) одним DELETE,
+    а не запросом на каждого читателя.
+    '''
+    readers_sql, params = readers.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            TRIM_FEEDS_SQL.format(table=FeedEntry._meta.db_table,
+                                  readers=readers_sql),
+            (*params, settings.FEED_DEPTH)
+        )
+
+
+def push_post(post):
+    '''
+    Раскладывает новый пост в ленты всех подписчиков автора.
+    '''
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    FeedEntry.objects.bulk_create(
+        [FeedEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in followers],
+        ignore_conflicts=True
+    )
+    trim_feeds(followers)
+
+
+def pull_author(user_id, author_id):
+    '''
+    Добавляет в ленту читателя последние посты автора,
+    на которого он подписался.
+    '''
+    posts = (Post.objects.filter(author_id=author_id)
+             .values_list('pk', 'pub_date')[:settings.FEED_DEPTH])
+    FeedEntry.objects.bulk_create(
+        [FeedEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+         for post_id, pub_date in posts],
+        ignore_conflicts=True
+    )
+    trim_feed(user_id)
+
+
+def drop_author(user_id, author_id):
+    '''
+    Убирает из ленты читателя посты автора, от которого он отписался.
+    '''
+    FeedEntry.objects.filter(user_id=user_id,
+                             post__author_id=author_id).delete()
+
+
+def rebuild_feed(user_id):
+    '''
+    Полностью пересобирает ленту читателя по текущим подпискам.
+    '''
+    FeedEntry.objects.filter(user_id=user_id).delete()
+    posts = (Post.objects.filter(author__following__user_id=user_id)
+             .values_list('pk', 'pub_date')[:settings.FEED_DEPTH])
+    FeedEntry.objects.bulk_create(
+        [FeedEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+         for post_id, pub_date in posts]
+    )
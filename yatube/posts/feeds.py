@@ -0,0 +1,164 @@
+import hashlib
+from calendar import timegm
+
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse, reverse_lazy
+from django.utils.cache import get_conditional_response
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.http import http_date, quote_etag
+from django.utils.text import Truncator
+
+from core.caching import get_or_recompute
+from .cache import STALE_ETAG, index_generation
+from .models import Group, Post, User
+
+FEED_KEY = 'feed'
+
+
+class LatestPostsFeed(Feed):
+    title = 'Yatube: последние записи'
+    link = reverse_lazy('posts:index')
+    description = 'Последние опубликованные записи проекта Yatube'
+
+    def latest(self):
+        '''
+        Дата самого нового поста ленты: один запрос по индексу
+        (-pub_date, -id), без рендеринга.
+        '''
+        return (self.posts().order_by('-pub_date')
+                .values_list('pub_date', flat=True).first())
+
+    def posts(self, obj=None):
+        return Post.objects.all()
+
+    def items(self, obj=None):
+        return (self.posts(obj).select_related('author', 'group')
+                .order_by('-pub_date', '-id')[:settings.FEED_ITEMS])
+
+    def item_title(self, post):
+        return Truncator(post.text).words(10)
+
+    def item_description(self, post):
+        return post.text
+
+    def item_link(self, post):
+        return reverse('posts:post_detail', args=[post.pk])
+
+    def item_pubdate(self, post):
+        return post.pub_date
+
+    def item_author_name(self, post):
+        return post.author.get_full_name() or post.author.get_username()
+
+
+class GroupFeed(LatestPostsFeed):
+
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def latest(self, slug):
+        return (Post.objects.filter(group__slug=slug).order_by('-pub_date')
+                .values_list('pub_date', flat=True).first())
+
+    def posts(self, group):
+        return Post.objects.filter(group=group)
+
+    def title(self, group):
+        return f'Yatube: группа {group.title}'
+
+    def link(self, group):
+        return reverse('posts:group_list', args=[group.slug])
+
+    def description(self, group):
+        return group.description
+
+
+class AuthorFeed(LatestPostsFeed):
+
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def latest(self, username):
+        return (Post.objects.filter(author__username=username)
+                .order_by('-pub_date')
+                .values_list('pub_date', flat=True).first())
+
+    def posts(self, author):
+        return Post.objects.filter(author=author)
+
+    def title(self, author):
+        return f'Yatube: записи {author.get_username()}'
+
+    def link(self, author):
+        return reverse('posts:profile', args=[author.get_username()])
+
+    def description(self, author):
+        return f'Все записи пользователя {author.get_username()}'
+
+
+class LatestPostsAtomFeed(LatestPostsFeed):
+    feed_type = Atom1Feed
+    subtitle = LatestPostsFeed.description
+
+
+class GroupAtomFeed(GroupFeed):
+    feed_type = Atom1Feed
+    subtitle = GroupFeed.description
+
+
+class AuthorAtomFeed(AuthorFeed):
+    feed_type = Atom1Feed
+    subtitle = AuthorFeed.description
+
+
+def conditional_feed(feed_class):
+    '''
+    Превращает ленту во view с условным GET: ETag и Last-Modified
+    считаются по дате самого нового поста и поколению кэша постов,
+    которое меняется при любом сохранении или удалении поста.
+    Если клиент уже получил эту версию, отдается 304 без рендеринга,
+    иначе тело берется из кэша или рендерится и кэшируется.
+    '''
+    feed = feed_class()
+
+    def view(request, **kwargs):
+        latest = feed.latest(**kwargs)
+        generation = index_generation()
+        digest = hashlib.md5(
+            f'{request.path}:{generation}:{latest}'.encode()
+        ).hexdigest()
+        headers = HttpResponse()
+        headers['ETag'] = quote_etag(digest)
+        last_modified = None
+        if latest is not None:
+            last_modified = timegm(latest.utctimetuple())
+            headers['Last-Modified'] = http_date(last_modified)
+        #  Если версия не совпала, возвращается сам headers.
+        conditional = get_conditional_response(
+            request, etag=headers['ETag'], last_modified=last_modified,
+            response=headers
+        )
+        if conditional is not headers:
+            return conditional
+
+        def render():
+            response = feed(request, **kwargs)
+            return response.content, response['Content-Type']
+
+        path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+        (content, content_type), fresh = get_or_recompute(
+            f'{FEED_KEY}:{path}', render, settings.FEED_CACHE_TIMEOUT,
+            version=digest, metric=FEED_KEY
+        )
+        response = HttpResponse(content, content_type=content_type)
+        if not fresh:
+            response['ETag'] = quote_etag(STALE_ETAG)
+            return response
+        for header in ('ETag', 'Last-Modified'):
+            if header in headers:
+                response[header] = headers[header]
+        return response
+    return view
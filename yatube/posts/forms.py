@@ -13,3 +13,14 @@ class CommentForm(forms.ModelForm):
     class Meta:
         model = Comment
         fields = ['text']
+
+
+class ExportForm(forms.Form):
+    format = forms.ChoiceField(choices=[('ndjson', 'NDJSON'),
+                                        ('csv', 'CSV')],
+                               required=False)
+    since = forms.DateField(required=False, label='С даты')
+    until = forms.DateField(required=False, label='По дату')
+    author = forms.CharField(required=False, label='Автор')
+    group = forms.CharField(required=False, label='Группа')
+    gzip = forms.BooleanField(required=False, label='Сжать gzip')
@@ -0,0 +1,293 @@
+import json
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Comment, Follow, Group, Post, User
+
+MODELS = {
+    'user': User,
+    'group': Group,
+    'post': Post,
+    'comment': Comment,
+    'follow': Follow,
+}
+#  Порядок сохранения: строки ссылаются только на типы левее.
+IMPORT_ORDER = ('user', 'group', 'post', 'comment', 'follow')
+#  Сколько ошибок хранится для отчета, остальные только считаются.
+MAX_REPORTED_ERRORS = 100
+#  Столько значений SQLite принимает в одном IN (...).
+LOOKUP_CHUNK = 500
+#  Поля, по которым строка выгрузки узнается в базе.
+NATURAL_KEYS = {
+    'user': ('username',),
+    'group': ('slug',),
+    'post': ('pk',),
+    'comment': ('pk',),
+    'follow': ('user_id', 'author_id'),
+}
+#  Установлен только в контексте keep_dates().
+explicit_dates = ContextVar('explicit_dates', default=False)
+
+
+class RowError(Exception):
+    '''
+    Строка, которую нельзя импортировать.
+    '''
+
+
+class Lookup:
+    '''
+    Отображение естественного ключа (username, slug) в pk,
+    которое держится в памяти и дополняется одним запросом
+    на пачку ненайденных ключей.
+    '''
+
+    def __init__(self, model, field):
+        self.model = model
+        self.field = field
+        self.pks = {}
+
+    def load(self, keys):
+        missing = list({key for key in keys if key not in self.pks})
+        for start in range(0, len(missing), LOOKUP_CHUNK):
+            chunk = missing[start:start + LOOKUP_CHUNK]
+            self.pks.update(self.model.objects.filter(
+                **{f'{self.field}__in': chunk}
+            ).values_list(self.field, 'pk'))
+
+    def __getitem__(self, key):
+        try:
+            return self.pks[key]
+        except KeyError:
+            raise RowError(f'{self.model._meta.verbose_name} '
+                           f'"{key}" не найден')
+
+
+@contextmanager
+def keep_dates():
+    '''
+    Внутри блока поля auto_now_add постов и комментариев сохраняют
+    заданные даты (из выгрузки), и bulk_create не подставляет
+    текущее время. Действует только в текущем контексте: другие
+    потоки и запросы процесса по-прежнему получают текущее время.
+    '''
+    token = explicit_dates.set(True)
+    try:
+        yield
+    finally:
+        explicit_dates.reset(token)
+
+
+def _allow_explicit(field):
+    pre_save = field.pre_save
+
+    def keep_explicit(model_instance, add):
+        value = getattr(model_instance, field.attname)
+        if explicit_dates.get() and value is not None:
+            return value
+        return pre_save(model_instance, add)
+
+    field.pre_save = keep_explicit
+
+
+_allow_explicit(Post._meta.get_field('pub_date'))
+_allow_explicit(Comment._meta.get_field('created'))
+
+
+def stored(model, fields, objects):
+    '''
+    Сколько объектов objects (по ключу из полей fields) уже есть
+    в базе. Объекты без ключа (новые посты без id) не считаются.
+    '''
+    keys = {tuple(getattr(obj, field) for field in fields)
+            for obj in objects}
+    keys = {key for key in keys if None not in key}
+    values = list({key[0] for key in keys})
+    found = 0
+    for start in range(0, len(values), LOOKUP_CHUNK):
+        rows = model.objects.filter(
+            **{f'{fields[0]}__in': values[start:start + LOOKUP_CHUNK]}
+        ).values_list(*fields)
+        found += sum(1 for row in rows if tuple(row) in keys)
+    return found
+
+
+def _date(value):
+    if not value:
+        return timezone.now()
+    date = parse_datetime(value)
+    if date is None:
+        raise RowError(f'Некорректная дата "{value}"')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+class Importer:
+    '''
+    Загружает строки выгрузки пачками через bulk_create.
+    Строки копятся в буфере своего типа; перед сохранением пачки
+    сохраняются буферы типов, на которые она ссылается, и одним
+    запросом подгружаются нужные авторы и группы.
+    Сигналы при bulk_create не срабатывают, поэтому счетчики,
+    ленты и поисковый индекс нужно пересобрать после импорта.
+    '''
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.users = Lookup(User, 'username')
+        self.groups = Lookup(Group, 'slug')
+        self.buffers = {kind: [] for kind in IMPORT_ORDER}
+        self.imported = dict.fromkeys(IMPORT_ORDER, 0)
+        self.errors = []
+        self.failed = 0
+
+    def error(self, line_number, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line_number, message))
+
+    def add(self, line_number, line):
+        try:
+            row = json.loads(line)
+            kind = row.pop('type')
+        except (ValueError, KeyError, AttributeError, TypeError):
+            self.error(line_number, 'Строка не является записью '
+                                    'с полем "type"')
+            return
+        if kind not in self.buffers:
+            self.error(line_number, f'Неизвестный тип "{kind}"')
+            return
+        buffer = self.buffers[kind]
+        buffer.append((line_number, row))
+        if len(buffer) >= self.batch_size:
+            self.flush(kind)
+
+    def flush(self, kind=IMPORT_ORDER[-1]):
+        '''
+        Сохраняет буфер kind и все буферы, от которых он зависит.
+        '''
+        for current in IMPORT_ORDER[:IMPORT_ORDER.index(kind) + 1]:
+            rows = self.buffers[current]
+            if rows:
+                self.buffers[current] = []
+                self.save(current, rows)
+
+    def save(self, kind, rows):
+        self.users.load(row.get(key) for _, row in rows
+                        for key in ('author', 'user'))
+        self.groups.load(row.get('group') for _, row in rows)
+        build = getattr(self, f'build_{kind}')
+        objects = []
+        for line_number, row in rows:
+            try:
+                obj = build(row)
+                obj.clean_fields(exclude=EXCLUDE[kind])
+            except ValidationError as error:
+                self.error(line_number, '; '.join(error.messages))
+            except KeyError as error:
+                self.error(line_number, f'Нет поля {error}')
+            except (RowError, TypeError, ValueError) as error:
+                self.error(line_number, str(error))
+            else:
+                objects.append((line_number, obj))
+        if kind == 'comment':
+            objects = self.existing_posts(objects)
+        objects = [obj for _, obj in objects]
+        #  Дубликаты уже загруженных строк пропускаются и не считаются:
+        #  вставлено столько, на сколько выросло число ключей пачки.
+        model, fields = MODELS[kind], NATURAL_KEYS[kind]
+        before = stored(model, fields, objects)
+        unkeyed = sum(1 for obj in objects
+                      if any(getattr(obj, field) is None for field in fields))
+        with keep_dates():
+            model.objects.bulk_create(objects, ignore_conflicts=True)
+        self.imported[kind] += (stored(model, fields, objects) - before
+                                + unkeyed)
+
+    def existing_posts(self, comments):
+        post_ids = list({comment.post_id for _, comment in comments})
+        found = set()
+        for start in range(0, len(post_ids), LOOKUP_CHUNK):
+            found.update(Post.objects.filter(
+                pk__in=post_ids[start:start + LOOKUP_CHUNK]
+            ).values_list('pk', flat=True))
+        existing = []
+        for line_number, comment in comments:
+            if comment.post_id in found:
+                existing.append((line_number, comment))
+            else:
+                self.error(line_number, f'Пост {comment.post_id} не найден')
+        return existing
+
+    def build_user(self, row):
+        user = User(username=row['username'],
+                    email=row.get('email', ''),
+                    first_name=row.get('first_name', ''),
+                    last_name=row.get('last_name', ''))
+        user.set_unusable_password()
+        return user
+
+    def build_group(self, row):
+        return Group(title=row['title'], slug=row['slug'],
+                     description=row.get('description', ''))
+
+    def build_post(self, row):
+        group = row.get('group')
+        return Post(pk=row.get('id'), text=row['text'],
+                    pub_date=_date(row.get('pub_date')),
+                    author_id=self.users[row['author']],
+                    group_id=self.groups[group] if group else None,
+                    image=row.get('image') or '')
+
+    def build_comment(self, row):
+        return Comment(pk=row.get('id'), post_id=int(row['post']),
+                       author_id=self.users[row['author']],
+                       text=row['text'],
+                       created=_date(row.get('created')))
+
+    def build_follow(self, row):
+        user_id = self.users[row['user']]
+        author_id = self.users[row['author']]
+        if user_id == author_id:
+            raise RowError('Нельзя подписаться на себя')
+        return Follow(user_id=user_id, author_id=author_id)
+
+    def run(self, lines, transaction_size=10000, progress=None):
+        '''
+        Импортирует строки, фиксируя транзакцию каждые
+        transaction_size строк. В памяти одновременно держится
+        не больше одной такой порции. progress(count) вызывается
+        после каждой транзакции.
+        '''
+        numbered = enumerate(lines, 1)
+        count = 0
+        while True:
+            chunk = list(islice(numbered, transaction_size))
+            if not chunk:
+                break
+            with transaction.atomic():
+                for line_number, line in chunk:
+                    if line.strip():
+                        self.add(line_number, line)
+                self.flush()
+            count = chunk[-1][0]
+            if progress:
+                progress(count)
+        return count
+
+
+#  Связи проверяются поиском в базе, а не clean_fields.
+EXCLUDE = {
+    'user': ['password', 'last_login', 'date_joined'],
+    'group': ['posts_count'],
+    'post': ['id', 'author', 'group', 'comments_count'],
+    'comment': ['id', 'post', 'author'],
+    'follow': ['user', 'author'],
+}
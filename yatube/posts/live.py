@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.http import Http404
+from django.template.loader import render_to_string
+
+from core.events import EventStreamResponse, get_broker
+
+POSTS_CHANNEL = 'posts'
+
+
+def group_channel(group_id):
+    return f'group:{group_id}'
+
+
+def author_channel(author_id):
+    return f'author:{author_id}'
+
+
+def publish_post(post):
+    '''
+    Отправляет подписчикам событие о новом посте: в общий канал,
+    канал группы и канал автора. Фрагмент HTML рендерится один
+    раз здесь, а не для каждого подключенного клиента.
+    '''
+    channels = [POSTS_CHANNEL, author_channel(post.author_id)]
+    if post.group_id is not None:
+        channels.append(group_channel(post.group_id))
+    get_broker().publish(channels, {
+        'id': post.pk,
+        'author': post.author.get_username(),
+        'group': post.group.slug if post.group_id else None,
+        'html': render_to_string('includes/post_snippet.html',
+                                 {'post': post}),
+    })
+
+
+def stream_response(channels):
+    '''
+    Ответ text/event-stream с новыми постами из каналов channels.
+    Пока живые обновления выключены (EVENTS_ENABLED), потоков нет.
+    '''
+    if not settings.EVENTS_ENABLED:
+        raise Http404('Живые обновления выключены')
+    return EventStreamResponse(channels, 'post')
@@ -0,0 +1,51 @@
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.export import EXPORTS, export_filters, export_stream
+from posts.forms import ExportForm
+
+
+class Command(BaseCommand):
+    help = ('Выгружает посты или комментарии в NDJSON или CSV, '
+            'читая базу пачками.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(EXPORTS),
+                            help='Что выгружать')
+        parser.add_argument('--format', choices=['ndjson', 'csv'],
+                            default='ndjson', help='Формат выгрузки')
+        parser.add_argument('--output', default='-',
+                            help='Файл для записи, "-" - stdout')
+        parser.add_argument('--gzip', action='store_true',
+                            help='Сжать выгрузку gzip')
+        parser.add_argument('--since', help='С даты (ГГГГ-ММ-ДД)')
+        parser.add_argument('--until', help='По дату (ГГГГ-ММ-ДД)')
+        parser.add_argument('--author', help='Только этого автора')
+        parser.add_argument('--group', help='Только этой группы (slug)')
+        parser.add_argument('--batch-size', type=int,
+                            default=settings.EXPORT_BATCH_SIZE,
+                            help='Строк в одном запросе к базе')
+
+    def handle(self, *args, **options):
+        form = ExportForm({key: options[key] for key in
+                           ('format', 'since', 'until', 'author', 'group')
+                           if options[key]})
+        if not form.is_valid():
+            raise CommandError(form.errors.as_text())
+        filters = export_filters(options['kind'], form.cleaned_data['since'],
+                                 form.cleaned_data['until'],
+                                 options['author'], options['group'])
+        stream = export_stream(options['kind'], filters, options['format'],
+                               options['gzip'], options['batch_size'])
+        if options['output'] == '-':
+            output = sys.stdout.buffer
+            for chunk in stream:
+                output.write(chunk)
+            output.flush()
+            return
+        with open(options['output'], 'wb') as output:
+            for chunk in stream:
+                output.write(chunk)
+        self.stderr.write(f'Выгрузка записана в {options["output"]}')
@@ -0,0 +1,34 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from posts.models import Post
+from posts.thumbnails import generate_thumbnails
+
+
+class Command(BaseCommand):
+    help = ('Создает миниатюры всех геометрий POST_THUMBNAILS '
+            'для уже загруженных картинок постов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int,
+                            default=settings.THUMBNAIL_WORKERS,
+                            help='Количество параллельных потоков')
+
+    def handle(self, *args, **options):
+        names = (Post.objects.exclude(image='')
+                 .values_list('image', flat=True)
+                 .distinct().iterator())
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            done = sum(1 for _ in executor.map(self.generate, names))
+        self.stdout.write(f'Обработано картинок: {done}')
+
+    def generate(self, name):
+        try:
+            generate_thumbnails(name)
+        except Exception as error:
+            self.stderr.write(f'{name}: {error}')
+        finally:
+            close_old_connections()
@@ -0,0 +1,62 @@
+import gzip
+import io
+import sys
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from posts.cache import invalidate_index
+from posts.importer import Importer
+
+
+class Command(BaseCommand):
+    help = ('Импортирует пользователей, группы, посты, комментарии '
+            'и подписки из NDJSON (по записи с полем "type" в строке).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path',
+                            help='Файл NDJSON (.gz - сжатый), "-" - stdin')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Строк в одном bulk_create')
+        parser.add_argument('--transaction-size', type=int, default=10000,
+                            help='Строк в одной транзакции')
+        parser.add_argument('--no-rebuild', action='store_true',
+                            help='Не пересобирать счетчики, ленты '
+                                 'и поисковый индекс после импорта')
+
+    def handle(self, *args, **options):
+        importer = Importer(options['batch_size'])
+        started = time.monotonic()
+
+        def progress(count):
+            elapsed = time.monotonic() - started or 1e-9
+            self.stderr.write(f'Прочитано строк: {count} '
+                              f'({count / elapsed:.0f} строк/с)')
+
+        with self.open(options['path']) as lines:
+            count = importer.run(lines, options['transaction_size'],
+                                 progress)
+        elapsed = time.monotonic() - started or 1e-9
+
+        for line_number, message in importer.errors:
+            self.stderr.write(f'Строка {line_number}: {message}')
+        imported = ', '.join(f'{kind} - {total}'
+                             for kind, total in importer.imported.items())
+        self.stdout.write(f'Импортировано: {imported}. '
+                          f'Ошибок: {importer.failed}. '
+                          f'{count} строк за {elapsed:.1f} с '
+                          f'({count / elapsed:.0f} строк/с)')
+
+        if not options['no_rebuild']:
+            call_command('recount', stdout=self.stdout)
+            call_command('rebuild_feed', stdout=self.stdout)
+            call_command('rebuild_search_index', stdout=self.stdout)
+        invalidate_index()
+
+    def open(self, path):
+        if path == '-':
+            return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+        if path.endswith('.gz'):
+            return gzip.open(path, 'rt', encoding='utf-8')
+        return open(path, encoding='utf-8')
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts.feed import rebuild_feed
+from posts.models import FeedEntry, Follow, User
+
+
+class Command(BaseCommand):
+    help = ('Пересобирает материализованные ленты подписок '
+            'по текущему графу подписок.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('usernames', nargs='*',
+                            help='Имена пользователей (по умолчанию - все)')
+
+    def handle(self, *args, **options):
+        usernames = options['usernames']
+        if usernames:
+            user_ids = list(User.objects.filter(username__in=usernames)
+                            .values_list('pk', flat=True))
+            if len(user_ids) != len(set(usernames)):
+                raise CommandError('Не все пользователи найдены.')
+        else:
+            user_ids = (
+                set(Follow.objects.values_list('user_id', flat=True))
+                | set(FeedEntry.objects.values_list('user_id', flat=True))
+            )
+        for user_id in user_ids:
+            with transaction.atomic():
+                rebuild_feed(user_id)
+        self.stdout.write(f'Пересобрано лент: {len(user_ids)}')
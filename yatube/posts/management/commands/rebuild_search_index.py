@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.cache import invalidate_index
+from posts.models import Post, SearchEntry
+from posts.search import index_post
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Постов в одной транзакции')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        SearchEntry.objects.all().delete()
+        last_pk = 0
+        indexed = 0
+        while True:
+            posts = list(Post.objects.filter(pk__gt=last_pk)
+                         .order_by('pk').only('pk', 'text')[:chunk_size])
+            if not posts:
+                break
+            with transaction.atomic():
+                for post in posts:
+                    index_post(post)
+            last_pk = posts[-1].pk
+            indexed += len(posts)
+        #  Сбрасывает и закэшированную статистику поиска.
+        invalidate_index()
+        self.stdout.write(f'Проиндексировано постов: {indexed}')
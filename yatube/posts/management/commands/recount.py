@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.counters import recount_all
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счетчики постов, комментариев и подписок, '
+            'исправляя расхождения с данными.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            updated = recount_all()
+        self.stdout.write(
+            'Пересчитано: пользователей - {users}, групп - {groups}, '
+            'постов - {posts}'.format(**updated)
+        )
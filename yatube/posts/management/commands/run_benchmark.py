@@ -0,0 +1,74 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from posts.benchmark import (current_commit, dataset, measure,
+                             measure_server, targets)
+
+
+class Command(BaseCommand):
+    help = ('Замеряет задержку (p50/p95/p99), число SQL-запросов '
+            'и пиковую память страниц постов на текущих данных.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20,
+                            help='Запросов к каждой странице')
+        parser.add_argument('--cold', action='store_true',
+                            help='Очищать кэш перед каждым запросом')
+        parser.add_argument('--base-url',
+                            help='Запрашивать запущенный сервер, '
+                                 'а не тестовый клиент')
+        parser.add_argument('--output', help='Сохранить результат в JSON')
+        parser.add_argument('--compare',
+                            help='JSON прошлого запуска для сравнения')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations должно быть больше нуля')
+        base_url = options['base_url']
+        results = {}
+        for name, url, user in targets():
+            if base_url:
+                if user is not None:
+                    #  Вход на запущенный сервер не поддерживается.
+                    continue
+                results[name] = measure_server(base_url, url,
+                                               options['iterations'])
+            else:
+                results[name] = measure(url, user, options['iterations'],
+                                        options['cold'])
+            results[name]['url'] = url
+        report = {
+            'commit': current_commit(),
+            'created': timezone.now().isoformat(),
+            'iterations': options['iterations'],
+            'cold': options['cold'],
+            'base_url': base_url,
+            'dataset': dataset(),
+            'results': results,
+        }
+        previous = None
+        if options['compare']:
+            with open(options['compare']) as source:
+                previous = json.load(source)['results']
+        self.print_table(results, previous)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, ensure_ascii=False, indent=2)
+
+    def print_table(self, results, previous):
+        self.stdout.write(f'{"страница":<22}{"p50":>9}{"p95":>9}{"p99":>9}'
+                          f'{"SQL":>5}{"КБ":>9}')
+        for name, result in results.items():
+            line = (f'{name:<22}{result["p50_ms"]:>9}{result["p95_ms"]:>9}'
+                    f'{result["p99_ms"]:>9}{result["queries"] or "-":>5}'
+                    f'{result["peak_memory_kb"] or "-":>9}')
+            before = (previous or {}).get(name)
+            if before:
+                line += (f'  p95 {result["p95_ms"] - before["p95_ms"]:+.2f}'
+                         f' мс')
+                if result['queries'] is not None and before['queries']:
+                    line += (f', SQL '
+                             f'{result["queries"] - before["queries"]:+d}')
+            self.stdout.write(line)
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.benchmark import clear_benchmark_data, seed
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими данными для замеров: '
+            'пользователи bench_*, группы bench-*, посты, комментарии '
+            'и подписки со степенным распределением популярности.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--comments', type=float, default=3.0,
+                            help='Среднее число комментариев к посту')
+        parser.add_argument('--follows', type=float, default=20.0,
+                            help='Среднее число подписок пользователя')
+        parser.add_argument('--images', type=float, default=0.2,
+                            help='Доля постов с картинкой')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Зерно генератора: тот же seed - '
+                                 'те же данные')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Строк в одном bulk_create')
+        parser.add_argument('--clear', action='store_true',
+                            help='Сначала удалить данные прошлого запуска')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        if options['clear']:
+            clear_benchmark_data()
+        created = seed(
+            users=options['users'], posts=options['posts'],
+            groups=options['groups'], comments=options['comments'],
+            images=options['images'], follows=options['follows'],
+            seed=options['seed'], batch_size=options['batch_size'],
+            log=self.stderr.write,
+        )
+        summary = ', '.join(f'{kind} - {total}'
+                            for kind, total in created.items())
+        self.stdout.write(f'Создано: {summary} за '
+                          f'{time.monotonic() - started:.1f} с')
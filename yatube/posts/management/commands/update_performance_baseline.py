@@ -0,0 +1,39 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import (setup_test_environment,
+                               teardown_test_environment)
+
+from posts.benchmark import (current_commit, regression_dataset,
+                             regression_profile)
+
+
+class Command(BaseCommand):
+    help = ('Перезаписывает базовые замеры страниц для '
+            'posts/tests/test_performance.py. Замеры делаются на '
+            'временной тестовой базе с тем же набором данных, что '
+            'и в тесте.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=10,
+                            help='Запросов к каждой странице')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0,
+                                                      autoclobber=True)
+        try:
+            regression_dataset()
+            profile = regression_profile(options['iterations'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        with open(settings.PERFORMANCE_BASELINE, 'w') as output:
+            json.dump({'commit': current_commit(), 'views': profile},
+                      output, ensure_ascii=False, indent=2, sort_keys=True)
+            output.write('\n')
+        for name, result in sorted(profile.items()):
+            self.stdout.write(f'{name}: {result["queries"]} SQL, '
+                              f'{result["p50_ms"]} мс')
@@ -0,0 +1,45 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+from collections import Counter
+
+
+def index_posts(apps, schema_editor):
+    from posts.search import terms
+
+    Post = apps.get_model('posts', 'Post')
+    SearchEntry = apps.get_model('posts', 'SearchEntry')
+    for post in Post.objects.only('pk', 'text').iterator():
+        SearchEntry.objects.bulk_create(
+            SearchEntry(post_id=post.pk, term=term, frequency=frequency)
+            for term, frequency in Counter(terms(post.text)).items()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_comment_keyset_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='Термин')),
+                ('frequency', models.PositiveIntegerField(default=1, verbose_name='Частота')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_entries', to='posts.Post', verbose_name='Пост')),
+            ],
+            options={
+                'verbose_name': 'Запись поискового индекса',
+                'verbose_name_plural': 'Записи поискового индекса',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchentry',
+            constraint=models.UniqueConstraint(fields=('term', 'post'), name='unique_search_entry'),
+        ),
+        migrations.RunPython(index_posts, migrations.RunPython.noop),
+    ]
@@ -5,18 +5,51 @@ from django.contrib.auth import get_user_model
 User = get_user_model()
 
 
-class Group(models.Model):
+class CountersModel(models.Model):
+    '''
+    Модель со счетчиками, которые меняются только атомарным
+    UPDATE (posts.counters.bump). save() существующей строки
+    их не записывает: иначе устаревшее значение из памяти
+    (форма, админка) затерло бы изменения других запросов.
+    '''
+    counter_fields = ()
+
+    class Meta:
+        abstract = True
+
+    def save(self, force_insert=False, force_update=False, using=None,
+             update_fields=None):
+        if not self._state.adding and not force_insert:
+            if update_fields is None:
+                deferred = self.get_deferred_fields()
+                update_fields = [
+                    field.attname for field in self._meta.concrete_fields
+                    if not field.primary_key
+                    and field.attname not in deferred
+                ]
+            update_fields = [name for name in update_fields
+                             if name not in self.counter_fields]
+        super().save(force_insert, force_update, using, update_fields)
+
+
+class Group(CountersModel):
     title = models.CharField(max_length=200, verbose_name='Название группы')
     description = models.TextField(verbose_name='Описание группы',
                                    help_text='Укажите описание'
                                    )
     slug = models.SlugField(max_length=20, unique=True)
+    posts_count = models.PositiveIntegerField(default=0,
+                                              editable=False,
+                                              verbose_name='Количество постов'
+                                              )
+
+    counter_fields = ('posts_count',)
 
     def __str__(self) -> str:
         return self.title
 
 
-class Post(models.Model):
+class Post(CountersModel):
 
     text = models.TextField(verbose_name='Текст поста',
                             help_text='Напишите текст поста')
@@ -40,11 +73,25 @@ class Post(models.Model):
                               upload_to='posts/',
                               blank=True,
                               help_text='Загрузите картинку')
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество комментариев'
+    )
+
+    counter_fields = ('comments_count',)
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [models.Index(fields=['-pub_date', '-id'],
+                                name='post_pub_date_id_idx'),
+                   models.Index(fields=['author', '-pub_date', '-id'],
+                                name='post_author_pub_date_idx'),
+                   models.Index(fields=['group', '-pub_date', '-id'],
+                                name='post_group_pub_date_idx'),
+                   ]
 
     def __str__(self) -> str:
         return self.text[:15]
@@ -71,6 +118,9 @@ class Comment(models.Model):
         ordering = ['-created']
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [models.Index(fields=['post', '-created', '-id'],
+                                name='comment_post_created_idx'),
+                   ]
 
     def _str__(self):
         return self.text[:15]
@@ -95,3 +145,91 @@ class Follow(models.Model):
 
     def __str__(self):
         return f'Подписка на {self.author}'
+
+
+class UserStats(models.Model):
+    '''
+    Счетчики пользователя, поддерживаемые сигналами вместо
+    подсчета COUNT(*) при каждом показе страницы.
+    '''
+    user = models.OneToOneField(User,
+                                on_delete=models.CASCADE,
+                                primary_key=True,
+                                related_name='stats',
+                                verbose_name='Пользователь'
+                                )
+    posts_count = models.PositiveIntegerField(default=0,
+                                              verbose_name='Количество постов'
+                                              )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество подписчиков'
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество подписок'
+    )
+
+    class Meta:
+        verbose_name = 'Статистика пользователя'
+        verbose_name_plural = 'Статистика пользователей'
+
+    def __str__(self):
+        return f'Статистика {self.user}'
+
+
+class FeedEntry(models.Model):
+    '''
+    Запись материализованной ленты подписок: пост автора,
+    разложенный в ленту каждого подписчика при публикации.
+    '''
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name='feed',
+                             verbose_name='Читатель'
+                             )
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             related_name='feed_entries',
+                             verbose_name='Пост'
+                             )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        ordering = ['-pub_date']
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [models.UniqueConstraint(fields=['user', 'post'],
+                                               name='unique_feed_entry'),
+                       ]
+        indexes = [models.Index(fields=['user', '-pub_date', '-id'],
+                                name='feed_user_pub_date_idx'),
+                   ]
+
+    def __str__(self):
+        return f'{self.post} в ленте {self.user}'
+
+
+class SearchEntry(models.Model):
+    '''
+    Запись инвертированного индекса полнотекстового поиска:
+    сколько раз термин встречается в тексте поста.
+    '''
+    term = models.CharField(max_length=64, verbose_name='Термин')
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             related_name='search_entries',
+                             verbose_name='Пост'
+                             )
+    frequency = models.PositiveIntegerField(default=1,
+                                            verbose_name='Частота')
+
+    class Meta:
+        verbose_name = 'Запись поискового индекса'
+        verbose_name_plural = 'Записи поискового индекса'
+        constraints = [models.UniqueConstraint(fields=['term', 'post'],
+                                               name='unique_search_entry'),
+                       ]
+
+    def __str__(self):
+        return f'{self.term} в {self.post}'
@@ -0,0 +1,140 @@
+import base64
+import binascii
+import json
+from collections.abc import Sequence
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class CursorPage(Sequence):
+    '''
+    Страница курсорной навигации. В отличие от django.core.paginator.Page
+    не знает общего количества объектов и номеров страниц - только
+    курсоры на соседние страницы.
+    '''
+    is_cursor = True
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self.object_list)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    '''
+    Паджинатор по ключу (keyset): вместо COUNT(*) и OFFSET страница
+    выбирается условием "строго после/до позиции курсора" по полям
+    ordering, что позволяет базе идти по индексу сразу к нужному месту.
+    Последнее поле ordering должно быть уникальным (обычно id).
+    '''
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id')):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.fields = [field.lstrip('-') for field in self.ordering]
+
+    def get_page(self, cursor=None):
+        '''
+        Возвращает страницу после (или до) позиции из курсора.
+        Некорректный курсор приводит к первой странице.
+        '''
+        position, backwards = self.decode_cursor(cursor)
+        queryset = self.object_list
+        ordering = self.ordering
+        if backwards:
+            ordering = tuple(self._reverse(field) for field in ordering)
+        if position is not None:
+            queryset = queryset.filter(self._seek(position, ordering))
+        rows = list(queryset.order_by(*ordering)[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, position is not None
+        return CursorPage(
+            rows,
+            next_cursor=(self.encode_cursor(rows[-1])
+                         if has_next and rows else None),
+            previous_cursor=(self.encode_cursor(rows[0], backwards=True)
+                             if has_previous and rows else None),
+        )
+
+    def encode_cursor(self, obj, backwards=False):
+        position = [self._value(obj, name) for name in self.fields]
+        payload = json.dumps({'p': position, 'b': backwards}).encode()
+        return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None, False
+        try:
+            padding = '=' * (-len(cursor) % 4)
+            payload = base64.urlsafe_b64decode(cursor + padding)
+            data = json.loads(payload)
+            position = [self._field(name).to_python(value)
+                        for name, value in zip(self.fields, data['p'])]
+            backwards = bool(data['b'])
+        except (binascii.Error, ValueError, KeyError, TypeError,
+                ValidationError):
+            return None, False
+        if len(position) != len(self.fields):
+            return None, False
+        return position, backwards
+
+    def _field(self, name):
+        '''
+        Поле модели или аннотации queryset: по аннотациям можно
+        листать по полям связанной таблицы (например, ленты).
+        '''
+        annotation = self.object_list.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        return self.object_list.model._meta.get_field(name)
+
+    @staticmethod
+    def _value(obj, name):
+        value = getattr(obj, name)
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        return str(value)
+
+    @staticmethod
+    def _reverse(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    def _seek(self, position, ordering):
+        '''
+        Строит условие (a, b) > (x, y) с учетом направления
+        сортировки каждого поля:
+        a > x OR (a = x AND b > y).
+        '''
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
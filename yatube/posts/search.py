@@ -0,0 +1,192 @@
+import math
+import re
+from collections import Counter
+from hashlib import md5
+
+from django.conf import settings
+from django.db.models import Case, Count, F, FloatField, Sum, When
+
+from core.caching import get_or_recompute
+from .cache import index_generation
+from .models import Post, SearchEntry
+
+SEARCH_STATS_KEY = 'search_stats'
+WORD_RE = re.compile(r'\w+')
+TERM_LENGTH = SearchEntry._meta.get_field('term').max_length
+
+VOWELS = 'аеиоуыэюя'
+PERFECTIVE_GERUND = (('в', 'вши', 'вшись'),
+                     ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'))
+ADJECTIVE = ('ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой',
+             'ем', 'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых',
+             'ую', 'юю', 'ая', 'яя', 'ою', 'ею')
+PARTICIPLE = (('ем', 'нн', 'вш', 'ющ', 'щ'),
+              ('ивш', 'ывш', 'ующ'))
+REFLEXIVE = ('ся', 'сь')
+VERB = (('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но',
+         'ет', 'ют', 'ны', 'ть', 'ешь', 'нно'),
+        ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей',
+         'уй', 'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят',
+         'ует', 'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'))
+NOUN = ('а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии',
+        'и', 'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам',
+        'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия',
+        'ья', 'я')
+DERIVATIONAL = ('ост', 'ость')
+SUPERLATIVE = ('ейш', 'ейше')
+
+
+def _region(word, start=0):
+    '''
+    Начало области слова после первой пары "гласная-согласная"
+    (R1 в терминах Snowball), начиная с позиции start.
+    '''
+    for i in range(start + 1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            return i + 1
+    return len(word)
+
+
+def _remove(word, endings, preceded=None):
+    '''
+    Отрезает самое длинное окончание из endings. Для окончаний
+    первой группы (preceded) перед ними должна стоять "а" или "я".
+    Возвращает None, если подходящего окончания нет.
+    '''
+    groups = [(endings, False)] if preceded is None else [
+        (preceded, True), (endings, False)
+    ]
+    found = None
+    for group, needs_vowel in groups:
+        for ending in group:
+            if not word.endswith(ending):
+                continue
+            stem = word[:-len(ending)]
+            if needs_vowel and not stem.endswith(('а', 'я')):
+                continue
+            if found is None or len(ending) > len(word) - len(found):
+                found = stem
+    return found
+
+
+def stem(word):
+    '''
+    Стеммер Snowball для русского языка: отрезает окончания
+    и суффиксы, чтобы разные формы слова давали один термин.
+    '''
+    word = word.lower().replace('ё', 'е')
+    rv_start = next((i + 1 for i, char in enumerate(word)
+                     if char in VOWELS), len(word))
+    prefix, rv = word[:rv_start], word[rv_start:]
+
+    result = _remove(rv, PERFECTIVE_GERUND[1], PERFECTIVE_GERUND[0])
+    if result is None:
+        rv = _remove(rv, REFLEXIVE) or rv
+        result = _remove(rv, ADJECTIVE)
+        if result is not None:
+            result = _remove(result, PARTICIPLE[1], PARTICIPLE[0]) or result
+        else:
+            result = _remove(rv, VERB[1], VERB[0])
+            if result is None:
+                result = _remove(rv, NOUN)
+    rv = rv if result is None else result
+
+    if rv.endswith('и'):
+        rv = rv[:-1]
+
+    word = prefix + rv
+    r2 = _region(word, _region(word) - 1)
+    for ending in DERIVATIONAL:
+        if word.endswith(ending) and len(word) - len(ending) >= r2:
+            rv = rv[:-len(ending)]
+            break
+
+    if rv.endswith('нн'):
+        rv = rv[:-1]
+    else:
+        superlative = _remove(rv, SUPERLATIVE)
+        if superlative is not None:
+            rv = superlative[:-1] if superlative.endswith('нн') else (
+                superlative)
+        elif rv.endswith('ь'):
+            rv = rv[:-1]
+    return prefix + rv
+
+
+def terms(text):
+    '''
+    Разбивает текст на термины индекса: слова в нижнем регистре,
+    кириллические - приведенные стеммером к основе.
+    '''
+    result = []
+    for word in WORD_RE.findall(text.lower()):
+        if any('а' <= char <= 'я' or char == 'ё' for char in word):
+            word = stem(word)
+        if word:
+            result.append(word[:TERM_LENGTH])
+    return result
+
+
+def index_post(post):
+    '''
+    Перестраивает записи инвертированного индекса для поста.
+    '''
+    SearchEntry.objects.filter(post=post).delete()
+    SearchEntry.objects.bulk_create(
+        SearchEntry(post=post, term=term, frequency=frequency)
+        for term, frequency in Counter(terms(post.text)).items()
+    )
+
+
+def term_statistics(query_terms):
+    '''
+    Возвращает число постов и словарь {термин: число постов
+    с ним} для терминов запроса. Статистика кэшируется под
+    поколением кэша главной страницы: оно меняется при каждом
+    сохранении и удалении поста, то есть при каждом изменении
+    индекса, и запросы между изменениями ее не пересчитывают.
+    '''
+    generation = index_generation()
+    documents, _ = get_or_recompute(
+        f'{SEARCH_STATS_KEY}:documents', Post.objects.count,
+        settings.SEARCH_STATS_TIMEOUT, version=generation,
+        metric=SEARCH_STATS_KEY
+    )
+    digest = md5(' '.join(sorted(query_terms)).encode()).hexdigest()
+
+    def recompute():
+        return dict(SearchEntry.objects.filter(term__in=query_terms)
+                    .order_by().values('term')
+                    .annotate(posts=Count('pk'))
+                    .values_list('term', 'posts'))
+
+    frequencies, _ = get_or_recompute(
+        f'{SEARCH_STATS_KEY}:{digest}', recompute,
+        settings.SEARCH_STATS_TIMEOUT, version=generation,
+        metric=SEARCH_STATS_KEY
+    )
+    return documents, frequencies
+
+
+def search_posts(query):
+    '''
+    Ищет посты по инвертированному индексу. Посты ранжируются
+    по сумме tf-idf совпавших терминов, затем по дате.
+    '''
+    query_terms = set(terms(query))
+    if not query_terms:
+        return Post.objects.none()
+    documents, frequencies = term_statistics(query_terms)
+    total = documents or 1
+    #  Статистика может быть чуть устаревшей, пока ее пересчитывает
+    #  другой запрос: термин, которого в ней нет, все равно ищется.
+    weights = [
+        When(search_entries__term=term,
+             then=F('search_entries__frequency')
+             * math.log(1 + total / frequencies.get(term, 1)))
+        for term in query_terms
+    ]
+    return (Post.objects.filter(search_entries__term__in=query_terms)
+            .annotate(rank=Sum(Case(*weights, default=0,
+                                    output_field=FloatField())))
+            .order_by('-rank', '-pub_date', '-id'))
@@ -0,0 +1,115 @@
+from django.db import transaction
+from django.db.models import DEFERRED
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import feed, live, search, thumbnails
+from .cache import invalidate_index
+from .counters import bump, bump_user
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        feed.push_post(instance)
+
+
+@receiver(post_save, sender=Post)
+def publish_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        transaction.on_commit(lambda: live.publish_post(instance))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_index_cache(sender, **kwargs):
+    invalidate_index()
+
+
+@receiver(post_save, sender=Follow)
+def fill_feed_on_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        feed.pull_author(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def clean_feed_on_unfollow(sender, instance, **kwargs):
+    feed.drop_author(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_init, sender=Post)
+def remember_post_state(sender, instance, **kwargs):
+    #  Читаем из __dict__, чтобы не подгружать отложенные поля:
+    instance._saved_group_id = instance.__dict__.get('group_id', DEFERRED)
+    instance._saved_text = instance.__dict__.get('text', DEFERRED)
+    image = instance.__dict__.get('image', DEFERRED)
+    instance._saved_image = getattr(image, 'name', image)
+
+
+@receiver(post_save, sender=Post)
+def index_post_text(sender, instance, created, raw=False, **kwargs):
+    if not raw and (created or instance._saved_text != instance.text):
+        search.index_post(instance)
+    instance._saved_text = instance.text
+
+
+@receiver(post_save, sender=Post)
+def thumbnail_new_image(sender, instance, created, raw=False, **kwargs):
+    image = instance.__dict__.get('image', DEFERRED)
+    name = getattr(image, 'name', image)
+    changed = created or instance._saved_image != name
+    if not raw and changed and name not in ('', None, DEFERRED):
+        thumbnails.schedule_thumbnails(name)
+    instance._saved_image = name
+
+
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        bump_user(instance.author_id, 'posts_count', 1)
+        bump(Group, instance.group_id, 'posts_count', 1)
+    elif instance._saved_group_id not in (DEFERRED, instance.group_id):
+        bump(Group, instance._saved_group_id, 'posts_count', -1)
+        bump(Group, instance.group_id, 'posts_count', 1)
+    instance._saved_group_id = instance.group_id
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    bump_user(instance.author_id, 'posts_count', -1)
+    bump(Group, instance.group_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        bump(Post, instance.post_id, 'comments_count', 1)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    bump(Post, instance.post_id, 'comments_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        bump_user(instance.user_id, 'following_count', 1)
+        bump_user(instance.author_id, 'followers_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follow(sender, instance, **kwargs):
+    bump_user(instance.user_id, 'following_count', -1)
+    bump_user(instance.author_id, 'followers_count', -1)
@@ -1,7 +1,10 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
 
-from ..models import Group, Post
+from ..models import Comment, Follow, Group, Post, UserStats
 
 User = get_user_model()
 
@@ -94,3 +97,83 @@ class TestPostModel(TestCase):
                          'help_text для поля text модели '
                          'Post отображается неверно.'
                          )
+
+
+class TestCounters(TestCase):
+    '''
+    Тестирование счетчиков постов, комментариев и подписок.
+    '''
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа',
+                                         description='Описание',
+                                         slug='group-slug')
+        cls.other_group = Group.objects.create(title='Другая группа',
+                                               description='Описание',
+                                               slug='other-slug')
+
+    def assertCounters(self, obj, **expected):
+        obj.refresh_from_db()
+        for field, value in expected.items():
+            with self.subTest(obj=obj, field=field):
+                self.assertEqual(getattr(obj, field), value)
+
+    def test_counters_follow_changes(self):
+        post = Post.objects.create(text='Пост', author=self.author,
+                                   group=self.group)
+        Comment.objects.create(post=post, author=self.reader, text='Ок')
+        Follow.objects.create(user=self.reader, author=self.author)
+
+        self.assertCounters(self.author.stats, posts_count=1,
+                            followers_count=1, following_count=0)
+        self.assertCounters(self.reader.stats, posts_count=0,
+                            followers_count=0, following_count=1)
+        self.assertCounters(self.group, posts_count=1)
+        self.assertCounters(post, comments_count=1)
+
+        post.group = self.other_group
+        post.save()
+        self.assertCounters(self.group, posts_count=0)
+        self.assertCounters(self.other_group, posts_count=1)
+
+        Follow.objects.all().delete()
+        post.delete()
+        self.assertCounters(self.author.stats, posts_count=0,
+                            followers_count=0)
+        self.assertCounters(self.reader.stats, following_count=0)
+        self.assertCounters(self.other_group, posts_count=0)
+
+    def test_stale_save_keeps_counters(self):
+        '''save() устаревшего объекта не затирает счетчики'''
+        post = Post.objects.create(text='Пост', author=self.author,
+                                   group=self.group)
+        stale_post = Post.objects.get(pk=post.pk)
+        stale_group = Group.objects.get(pk=self.group.pk)
+        Comment.objects.create(post=post, author=self.reader, text='Ок')
+        Post.objects.create(text='Еще пост', author=self.author,
+                            group=self.group)
+
+        stale_post.text = 'Исправленный пост'
+        stale_post.save()
+        stale_group.title = 'Новое название'
+        stale_group.save()
+
+        self.assertCounters(post, comments_count=1, text='Исправленный пост')
+        self.assertCounters(self.group, posts_count=2, title='Новое название')
+
+    def test_recount_repairs_drift(self):
+        post = Post.objects.create(text='Пост', author=self.author,
+                                   group=self.group)
+        Comment.objects.create(post=post, author=self.reader, text='Ок')
+        UserStats.objects.update(posts_count=100)
+        Group.objects.update(posts_count=100)
+        Post.objects.update(comments_count=100)
+
+        call_command('recount', stdout=StringIO())
+
+        self.assertCounters(self.author.stats, posts_count=1)
+        self.assertCounters(self.group, posts_count=1)
+        self.assertCounters(post, comments_count=1)
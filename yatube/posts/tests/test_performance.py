@@ -0,0 +1,43 @@
+import json
+
+from django.conf import settings
+from django.test import TestCase
+
+from ..benchmark import regression_dataset, regression_profile
+
+
+class TestPerformance(TestCase):
+    '''
+    Сравнение числа SQL-запросов и времени ответа страниц
+    с базовыми замерами из PERFORMANCE_BASELINE. Если рост
+    ожидаем, замеры обновляются командой
+    python manage.py update_performance_baseline.
+    '''
+    @classmethod
+    def setUpTestData(cls):
+        regression_dataset()
+
+    def test_views_do_not_regress(self):
+        with open(settings.PERFORMANCE_BASELINE) as source:
+            baseline = json.load(source)['views']
+        profile = regression_profile()
+
+        for name, result in profile.items():
+            with self.subTest(name=name):
+                self.assertIn(name, baseline,
+                              f'Нет базового замера для {name}: обновите '
+                              f'его командой update_performance_baseline')
+                expected = baseline[name]
+                self.assertLessEqual(
+                    result['queries'],
+                    expected['queries'] + settings.PERFORMANCE_QUERY_SLACK,
+                    f'{name}: {result["queries"]} SQL-запросов вместо '
+                    f'{expected["queries"]}'
+                )
+                limit = (expected['p50_ms'] * settings.PERFORMANCE_TIME_FACTOR
+                         + settings.PERFORMANCE_TIME_SLACK)
+                self.assertLessEqual(
+                    result['p50_ms'], limit,
+                    f'{name}: медиана {result["p50_ms"]} мс при базовой '
+                    f'{expected["p50_ms"]} мс'
+                )
@@ -44,7 +44,7 @@ class TestPostsUrls(TestCase):
     @classmethod
     def tearDownClass(cls) -> None:
         super().tearDownClass()
-        cache.delete('index_page')
+        cache.clear()
 
     def setUp(self) -> None:
         super().setUp()
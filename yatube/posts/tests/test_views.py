@@ -1,16 +1,37 @@
+import csv
+import gzip
+import json
+import os
 import shutil
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+from unittest import skipUnless
 
 from django import forms
 from django.conf import settings
+from django.contrib import admin
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
+from django.core.management import call_command
+from django.db import connection
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-
-from yatube.settings import POSTS_AMOUNT
-from ..models import Group, Post, Follow
+from django.utils import timezone
+from sorl.thumbnail import default as thumbnail_default
+
+from core.models import Job
+from yatube.settings import COMMENTS_AMOUNT, POSTS_AMOUNT
+from ..benchmark import clear_benchmark_data, percentile, seed
+from ..cache import index_page_key
+from ..importer import Importer, keep_dates
+from ..models import Comment, FeedEntry, Follow, Group, Post
+from ..search import search_posts, stem
+from ..thumbnails import generate_thumbnails
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -67,6 +88,7 @@ class TestPostViews(TestCase):
 
     def setUp(self) -> None:
         super().setUp()
+        cache.clear()
 
         self.client = Client()
         self.client.force_login(self.user)
@@ -241,6 +263,194 @@ class TestPostViews(TestCase):
         self.assertEqual(context.text, form['text'])
 
 
+class TestPostDetailQueries(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create(username='Kirill')
+        cls.group = Group.objects.create(title='Test title',
+                                         description='Test description',
+                                         slug='test-slug'
+                                         )
+        cls.post = Post.objects.create(text='Test text',
+                                       author=cls.user,
+                                       group=cls.group)
+        cls.commenters = [User.objects.create(username=f'Commenter {i}')
+                          for i in range(5)]
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.client = Client()
+
+    def add_comments(self, amount):
+        authors = self.commenters
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=authors[i % len(authors)],
+                    text=f'Comment #{i}')
+            for i in range(amount)
+        )
+
+    def test_post_detail_queries_constant(self):
+        '''Количество запросов post_detail не зависит от числа
+        комментариев.'''
+        url = reverse('posts:post_detail', args=(self.post.id,))
+        for amount in (1, 500):
+            with self.subTest(comments=amount):
+                Comment.objects.all().delete()
+                self.add_comments(amount)
+                #  Запрос ETag, пост с автором и группой, комментарии.
+                with self.assertNumQueries(3):
+                    response = self.client.get(url)
+                self.assertEqual(len(response.context['comments']),
+                                 min(amount, COMMENTS_AMOUNT))
+
+    def test_comments_fragment(self):
+        '''Следующая порция комментариев отдается фрагментом'''
+        self.add_comments(COMMENTS_AMOUNT + 5)
+        response = self.client.get(reverse('posts:post_detail',
+                                           args=(self.post.id,)))
+        first_batch = response.context['comments']
+        self.assertTrue(first_batch.has_next())
+
+        response = self.client.get(reverse('posts:post_comments',
+                                           args=(self.post.id,)),
+                                   {'cursor': first_batch.next_cursor})
+        self.assertTemplateUsed(response, 'includes/comments.html')
+        next_batch = response.context['comments']
+
+        self.assertEqual(len(next_batch), 5)
+        self.assertFalse(next_batch.has_next())
+        self.assertFalse(set(first_batch) & set(next_batch))
+        self.assertContains(response, 'Comment #0')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class TestThumbnails(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create(username='Kirill')
+        cls.post = Post.objects.create(
+            text='Test text',
+            author=cls.user,
+            image=SimpleUploadedFile(name='Thumb.gif',
+                                     content=TEST_IMAGE,
+                                     content_type='image/gif')
+        )
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def lookup(self):
+        geometry, options = settings.POST_THUMBNAILS[0]
+        return thumbnail_default.backend.get_thumbnail(self.post.image,
+                                                       geometry,
+                                                       **options)
+
+    def test_lookup_does_not_generate(self):
+        '''Шаблон не создает миниатюру, а отдает исходную картинку'''
+        cache.clear()
+        self.assertEqual(self.lookup().name, self.post.image.name)
+
+    def test_scheduled_once_on_upload(self):
+        '''Миниатюры ставятся в очередь при загрузке, а не при показе'''
+        jobs = Job.objects.filter(name=generate_thumbnails.name)
+        self.assertEqual(jobs.count(), 1)
+
+        cache.clear()
+        self.lookup()
+        Client().get(reverse('posts:post_detail', args=(self.post.id,)))
+        self.post.text = 'Edited text'
+        self.post.save()
+        self.assertEqual(jobs.count(), 1)
+
+    def test_generated_thumbnail_used(self):
+        '''Созданная заранее миниатюра находится шаблоном'''
+        generate_thumbnails(self.post.image.name)
+        thumbnail = self.lookup()
+
+        self.assertNotEqual(thumbnail.name, self.post.image.name)
+        self.assertTrue(thumbnail.exists())
+        response = Client().get(reverse('posts:post_detail',
+                                        args=(self.post.id,)))
+        self.assertContains(response, thumbnail.url)
+
+
+class TestSearch(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create(username='Kirill')
+        cls.cats = Post.objects.create(text='Красивые котики гуляют',
+                                       author=cls.user)
+        cls.dog = Post.objects.create(text='Красивая собака спит',
+                                      author=cls.user)
+        cls.code = Post.objects.create(text='Заметки о программировании',
+                                       author=cls.user)
+
+    def search(self, query):
+        response = self.client.get(reverse('posts:search'), {'q': query})
+        return list(response.context['page_obj'])
+
+    def test_stemmer(self):
+        '''Разные формы слова приводятся к одной основе'''
+        forms = {
+            'красивая': 'красив',
+            'красивых': 'красив',
+            'котиками': 'котик',
+            'программирование': 'программирован',
+            'важнейший': 'важн',
+        }
+        for word, expected in forms.items():
+            with self.subTest(word=word):
+                self.assertEqual(stem(word), expected)
+
+    def test_search_ranking(self):
+        '''Пост, совпавший по большему числу слов, выше в выдаче'''
+        self.assertEqual(self.search('красивый котик'),
+                         [self.cats, self.dog])
+        self.assertEqual(self.search('программирование'), [self.code])
+        self.assertEqual(self.search('кошка'), [])
+
+    def test_index_updated_on_edit(self):
+        '''Индекс обновляется при редактировании поста'''
+        self.code.text = 'Заметки о рыбалке'
+        self.code.save()
+
+        self.assertEqual(self.search('программирование'), [])
+        self.assertEqual(self.search('рыбалка'), [self.code])
+
+    def test_statistics_not_recounted(self):
+        '''Статистика терминов пересчитывается только при смене индекса'''
+        cache.clear()
+        list(search_posts('котик'))
+        with self.assertNumQueries(1):
+            self.assertEqual(list(search_posts('котик')), [self.cats])
+
+        kitten = Post.objects.create(text='Котик спит', author=self.user)
+        self.assertEqual(list(search_posts('котик')), [kitten, self.cats])
+
+    def test_search_api(self):
+        response = self.client.get(reverse('posts:search_api'),
+                                   {'q': 'собаки'})
+        data = response.json()
+
+        self.assertEqual(data['count'], 1)
+        self.assertEqual(data['results'][0]['id'], self.dog.id)
+
+    def test_admin_search_uses_index(self):
+        post_admin = admin.site._registry[Post]
+        queryset, _ = post_admin.get_search_results(None,
+                                                    Post.objects.all(),
+                                                    'котики')
+        self.assertEqual(list(queryset), [self.cats])
+
+
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class TestCache(TestCase):
 
@@ -260,37 +470,78 @@ class TestCache(TestCase):
 
     def setUp(self) -> None:
         super().setUp()
+        cache.clear()
         self.client = Client()
-        self.client.force_login(self.user)
 
     def test_cache_working(self):
-
+        '''Проверка того, что главная страница отдается из кэша'''
         response = self.client.get(reverse('posts:index'))
-        context = response.content
         #  Проверяем, что главная страница отдает нам посты:
-        self.assertTrue(context)
+        self.assertContains(response, 'Test post')
 
-        #  Проверяем, что кэш после первого запроса сохранился
-        #  и существует:
+        #  Меняем посты в обход сигналов - страница должна
+        #  по-прежнему отдаваться из кэша без запросов к БД:
+        Post.objects.update(text='Changed post')
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Test post')
 
-        test_cache = cache.get('index_page')
-        self.assertTrue(test_cache)
+        #  Очищаем кэш и ожидаем актуальные данные:
+        cache.clear()
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Changed post')
 
-        #  Удаляем посты и запрашиваем главную страницу заново,
-        #  ожидая при этом QuerySet из кэша:
-        Post.objects.all().delete()
+    def test_cache_invalidated_on_write(self):
+        '''Проверка сброса кэша главной страницы при изменении постов'''
+        self.client.get(reverse('posts:index'))
+
+        post = Post.objects.create(text='New post', author=self.user)
         response = self.client.get(reverse('posts:index'))
-        context = response.content
+        self.assertContains(response, 'New post')
 
-        self.assertTrue(context)
+        post.text = 'Edited post'
+        post.save()
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Edited post')
 
-        #  Очищаем кэш и запрашиваем контекст (ожидаем пустой
-        #  QuerySet):
-        cache.delete('index_page')
+        post.delete()
         response = self.client.get(reverse('posts:index'))
-        context = response.content
+        self.assertNotContains(response, 'Edited post')
 
-        self.assertFalse(context)
+    def test_stale_page_while_recomputing(self):
+        '''Пока страницу пересчитывает другой запрос, отдается старая'''
+        self.client.get(reverse('posts:index'))
+        Post.objects.create(text='New post', author=self.user)
+        cache.add(f'{index_page_key(1)}:lock', 1)
+
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'New post')
+        self.assertEqual(response['ETag'], '"stale"')
+        response = self.client.get(reverse('posts:index'),
+                                   HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+        cache.delete(f'{index_page_key(1)}:lock')
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'New post')
+        self.assertNotEqual(response['ETag'], '"stale"')
+
+    def test_cache_keys_bounded(self):
+        '''Мусорные ?page= и ?cursor= не создают новых ключей кэша'''
+        for page in ('1', 'abc', '0', '999', '-5'):
+            self.client.get(reverse('posts:index') + f'?page={page}')
+        self.assertIsNotNone(cache.get(index_page_key(1)))
+        for page in ('abc', '0', '999', '-5'):
+            with self.subTest(page=page):
+                self.assertIsNone(cache.get(index_page_key(page)))
+
+        with override_settings(CURSOR_PAGINATION=True):
+            for cursor in ('', 'abc', '!!!'):
+                self.client.get(reverse('posts:index') + f'?cursor={cursor}')
+            self.assertIsNotNone(cache.get(index_page_key('')))
+            for cursor in ('abc', '!!!'):
+                with self.subTest(cursor=cursor):
+                    self.assertIsNone(cache.get(index_page_key(cursor)))
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
@@ -406,3 +657,693 @@ class TestFollowing(TestCase):
                                              ' не фолловера.'
                                              )
                          )
+
+    @override_settings(FEED_DEPTH=2)
+    def test_feed_trimmed_to_depth(self):
+        '''Проверка того, что лента подписок обрезается до FEED_DEPTH'''
+        Follow.objects.create(user=self.main_user, author=self.author)
+        for i in range(3):
+            Post.objects.create(text=f'Post #{i}', author=self.author)
+
+        response = self.auth_client.get(reverse('posts:follow_index'))
+        texts = [post.text for post in response.context['page_obj']]
+
+        self.assertEqual(texts, ['Post #2', 'Post #1'])
+
+    @override_settings(FEED_DEPTH=2)
+    def test_push_post_trims_in_one_query(self):
+        '''Новый пост обрезает ленты всех подписчиков одним запросом'''
+        readers = [User.objects.create(username=f'reader{i}')
+                   for i in range(5)]
+        for reader in readers:
+            Follow.objects.create(user=reader, author=self.author)
+        for i in range(2):
+            Post.objects.create(text=f'Post #{i}', author=self.author)
+
+        with CaptureQueriesContext(connection) as captured:
+            post = Post.objects.create(text='Post #2', author=self.author)
+        deletes = [query['sql'] for query in captured
+                   if query['sql'].lstrip().startswith('DELETE')
+                   and 'posts_feedentry' in query['sql']]
+
+        self.assertEqual(len(deletes), 1)
+        for reader in readers:
+            feed = list(FeedEntry.objects.filter(user=reader)
+                        .values_list('post_id', flat=True))
+            self.assertEqual(len(feed), 2)
+            self.assertIn(post.pk, feed)
+
+    def test_rebuild_feed_command(self):
+        '''Проверка пересборки ленты командой rebuild_feed'''
+        Follow.objects.create(user=self.main_user, author=self.author)
+        FeedEntry.objects.all().delete()
+
+        call_command('rebuild_feed', self.main_user.username,
+                     stdout=StringIO())
+
+        self.assertTrue(FeedEntry.objects.filter(user=self.main_user,
+                                                 post=self.post).exists()
+                        )
+
+
+@override_settings(CURSOR_PAGINATION=True)
+class TestCursorPagination(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create(username='Kirill')
+        for i in range(POSTS_AMOUNT + 5):
+            Post.objects.create(text=f'Post text #{i}', author=cls.user)
+
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+        self.client = Client()
+
+    def test_cursor_pages(self):
+        '''Проверка перехода по курсорам вперед и назад'''
+        url = reverse('posts:profile', args=(self.user.username,))
+        first_page = self.client.get(url).context['page_obj']
+
+        self.assertEqual(len(first_page), POSTS_AMOUNT)
+        self.assertFalse(first_page.has_previous())
+        self.assertTrue(first_page.has_next())
+
+        second_page = self.client.get(
+            url, {'cursor': first_page.next_cursor}
+        ).context['page_obj']
+
+        self.assertEqual(len(second_page), 5)
+        self.assertFalse(second_page.has_next())
+        self.assertEqual(second_page[-1].text, 'Post text #0')
+
+        previous_page = self.client.get(
+            url, {'cursor': second_page.previous_cursor}
+        ).context['page_obj']
+
+        self.assertEqual(list(previous_page), list(first_page))
+
+    def test_invalid_cursor(self):
+        '''Некорректный курсор ведет на первую страницу'''
+        response = self.client.get(reverse('posts:index'),
+                                   {'cursor': 'broken'})
+        page_obj = response.context['page_obj']
+
+        self.assertEqual(page_obj[0].text, f'Post text #{POSTS_AMOUNT + 4}')
+        self.assertFalse(page_obj.has_previous())
+
+
+class TestConditionalGet(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create(username='Kirill')
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.post = Post.objects.create(text='Пост', author=cls.author,
+                                       group=cls.group)
+
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def assertNotModified(self, url):
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        return etag
+
+    def assertModified(self, url, etag):
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_pages_not_modified(self):
+        '''Неизменившиеся страницы отдаются как 304'''
+        Follow.objects.create(user=self.reader, author=self.author)
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.author.username,)),
+            reverse('posts:post_detail', args=(self.post.pk,)),
+            reverse('posts:follow_index'),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertNotModified(url)
+
+    def test_not_modified_is_cheap(self):
+        '''Проверка ETag главной не обращается к базе'''
+        client = Client()
+        url = reverse('posts:index')
+        etag = client.get(url)['ETag']
+
+        with self.assertNumQueries(0):
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_changes_modify_pages(self):
+        '''Новые данные и правки меняют ETag страниц'''
+        index = reverse('posts:index')
+        detail = reverse('posts:post_detail', args=(self.post.pk,))
+        profile = reverse('posts:profile', args=(self.author.username,))
+        group = reverse('posts:group_list', args=(self.group.slug,))
+        etags = {url: self.assertNotModified(url)
+                 for url in (index, detail, profile, group)}
+
+        Comment.objects.create(post=self.post, author=self.reader,
+                               text='Комментарий')
+        self.assertModified(detail, etags[detail])
+
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertModified(profile, etags[profile])
+
+        self.group.title = 'Новое название'
+        self.group.save()
+        self.assertModified(group, etags[group])
+
+        self.post.text = 'Исправленный пост'
+        self.post.save()
+        self.assertModified(index, etags[index])
+
+    def test_viewer_changes_etag(self):
+        '''Другой посетитель не получает чужую версию страницы'''
+        url = reverse('posts:index')
+        etag = self.assertNotModified(url)
+
+        self.client.force_login(self.author)
+        self.assertModified(url, etag)
+        self.client.logout()
+        self.assertModified(url, etag)
+
+    def test_missing_objects(self):
+        '''Несуществующие объекты по-прежнему дают 404'''
+        urls = [
+            reverse('posts:group_list', args=('missing',)),
+            reverse('posts:profile', args=('missing',)),
+            reverse('posts:post_detail', args=(10 ** 6,)),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+
+@override_settings(EVENTS_ENABLED=True, EVENTS_KEEPALIVE=0.01,
+                   EVENTS_MAX_AGE=5)
+class TestPostEvents(TransactionTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.author = User.objects.create(username='Kirill')
+        self.reader = User.objects.create(username='reader')
+        self.group = Group.objects.create(title='Группа', slug='group',
+                                          description='Описание')
+        self.client = Client()
+
+    def open_stream(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = iter(response.streaming_content)
+        self.assertTrue(next(stream).startswith(b'retry:'))
+        return stream
+
+    def next_event(self, stream):
+        for chunk in stream:
+            if not chunk.startswith(b':'):
+                return chunk.decode()
+
+    def test_new_post_event(self):
+        '''Новый пост приходит в общий поток с готовым фрагментом'''
+        stream = self.open_stream(reverse('posts:events'))
+        post = Post.objects.create(text='Живой пост', author=self.author)
+
+        event = self.next_event(stream)
+        self.assertIn(f'id: {post.pk}\nevent: post\n', event)
+        data = json.loads(event.split('data: ', 1)[1])
+        self.assertEqual(data['author'], 'Kirill')
+        self.assertIn('Живой пост', data['html'])
+
+    def test_group_and_follow_streams(self):
+        '''Потоки группы и подписок получают только свои посты'''
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.client.force_login(self.reader)
+        group_stream = self.open_stream(
+            reverse('posts:group_events', args=('group',)))
+        follow_stream = self.open_stream(reverse('posts:follow_events'))
+
+        other = User.objects.create(username='other')
+        Post.objects.create(text='Чужой пост', author=other)
+        in_group = Post.objects.create(text='Пост в группе', author=other,
+                                       group=self.group)
+        followed = Post.objects.create(text='Пост автора',
+                                       author=self.author)
+
+        self.assertIn(f'id: {in_group.pk}\n',
+                      self.next_event(group_stream))
+        self.assertIn(f'id: {followed.pk}\n',
+                      self.next_event(follow_stream))
+
+    def test_missing_group_stream(self):
+        '''Поток несуществующей группы дает 404'''
+        response = self.client.get(reverse('posts:group_events',
+                                           args=('missing',)))
+        self.assertEqual(response.status_code, 404)
+
+    def test_live_posts_setting(self):
+        '''Без EVENTS_ENABLED потоков нет и страницы их не открывают'''
+        self.assertContains(self.client.get(reverse('posts:index')),
+                            reverse('posts:events'))
+        with override_settings(EVENTS_ENABLED=False):
+            response = self.client.get(reverse('posts:events'))
+            self.assertEqual(response.status_code, 404)
+            self.assertNotContains(self.client.get(reverse('posts:index')),
+                                   reverse('posts:events'))
+
+
+class TestFeeds(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create(username='Kirill')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.post = Post.objects.create(text='Пост в группе',
+                                       author=cls.user, group=cls.group)
+        Post.objects.create(text='Пост без группы', author=cls.user)
+
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+        self.client = Client()
+
+    def test_feeds_content(self):
+        '''Ленты содержат посты сайта, группы и автора'''
+        feeds = {
+            reverse('posts:feed_rss'): 2,
+            reverse('posts:feed_atom'): 2,
+            reverse('posts:group_feed_rss', args=('group',)): 1,
+            reverse('posts:group_feed_atom', args=('group',)): 1,
+            reverse('posts:profile_feed_rss', args=('Kirill',)): 2,
+            reverse('posts:profile_feed_atom', args=('Kirill',)): 2,
+        }
+        for url, count in feeds.items():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                content = response.content.decode()
+
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('Пост в группе', content)
+                self.assertEqual(content.count('Пост '), count * 2)
+
+    def test_missing_feed_object(self):
+        '''Лента несуществующей группы дает 404'''
+        response = self.client.get(reverse('posts:group_feed_rss',
+                                           args=('missing',)))
+        self.assertEqual(response.status_code, 404)
+
+    def test_not_modified(self):
+        '''Клиент с актуальной версией получает 304 за один запрос'''
+        url = reverse('posts:group_feed_rss', args=('group',))
+        response = self.client.get(url)
+
+        with self.assertNumQueries(1):
+            not_modified = self.client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+        not_modified = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_feed_body_cached(self):
+        '''Тело ленты кэшируется и сбрасывается при новом посте'''
+        url = reverse('posts:feed_atom')
+        etag = self.client.get(url)['ETag']
+
+        with self.assertNumQueries(1):
+            self.client.get(url)
+
+        Post.objects.create(text='Новый пост', author=self.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Новый пост', response.content.decode())
+
+    def test_edit_changes_etag(self):
+        '''Правка поста меняет ETag, хотя дата не меняется'''
+        url = reverse('posts:feed_rss')
+        etag = self.client.get(url)['ETag']
+        self.post.text = 'Исправленный пост'
+        self.post.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Исправленный пост', response.content.decode())
+
+
+class TestExport(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.admin = User.objects.create(username='admin', is_staff=True)
+        cls.user = User.objects.create(username='Kirill')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.posts = [
+            Post.objects.create(text=f'Пост {i}', author=cls.user,
+                                group=cls.group if i % 2 else None)
+            for i in range(7)
+        ]
+        Comment.objects.create(post=cls.posts[0], author=cls.admin,
+                               text='Комментарий')
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def read(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_export_for_staff_only(self):
+        '''Выгрузка доступна только сотрудникам'''
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(reverse('posts:export', args=('posts',)))
+
+        self.assertEqual(response.status_code, 302)
+
+    def test_ndjson_export(self):
+        '''Посты выгружаются построчно в NDJSON с фильтром группы'''
+        response = self.client.get(reverse('posts:export', args=('posts',)),
+                                   {'group': 'group'})
+        rows = [json.loads(line)
+                for line in self.read(response).splitlines()]
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual([row['text'] for row in rows],
+                         ['Пост 1', 'Пост 3', 'Пост 5'])
+        self.assertEqual(rows[0]['author'], 'Kirill')
+
+    def test_csv_gzip_export(self):
+        '''Комментарии выгружаются в CSV со сжатием gzip'''
+        response = self.client.get(
+            reverse('posts:export', args=('comments',)),
+            {'format': 'csv', 'gzip': 'on', 'author': 'admin'}
+        )
+        content = gzip.decompress(b''.join(response.streaming_content))
+        rows = list(csv.reader(content.decode().splitlines()))
+
+        self.assertEqual(rows[0], ['id', 'post', 'author', 'text',
+                                   'created'])
+        self.assertEqual(rows[1][1:4], [str(self.posts[0].pk), 'admin',
+                                        'Комментарий'])
+
+    def test_invalid_filters(self):
+        '''Неверные параметры и тип выгрузки отклоняются'''
+        url = reverse('posts:export', args=('posts',))
+        self.assertEqual(
+            self.client.get(url, {'since': 'вчера'}).status_code, 400)
+        self.assertEqual(self.client.get(
+            reverse('posts:export', args=('users',))).status_code, 404)
+
+    def test_export_command_batches(self):
+        '''Команда читает таблицу пачками и пишет все строки в файл'''
+        path = os.path.join(tempfile.mkdtemp(), 'posts.ndjson')
+        with CaptureQueriesContext(connection) as queries:
+            call_command('export_yatube', 'posts', output=path,
+                         batch_size=3, stderr=StringIO())
+        with open(path, encoding='utf-8') as export:
+            rows = [json.loads(line) for line in export]
+        shutil.rmtree(os.path.dirname(path))
+
+        self.assertEqual([row['id'] for row in rows],
+                         [post.pk for post in self.posts])
+        self.assertEqual(len(queries), 3)
+
+
+class TestImport(TestCase):
+
+    ROWS = [
+        {'type': 'user', 'username': 'legacy_author'},
+        {'type': 'user', 'username': 'legacy_reader'},
+        {'type': 'group', 'title': 'Группа', 'slug': 'legacy',
+         'description': 'Описание'},
+        {'type': 'comment', 'id': 500, 'post': 100,
+         'author': 'legacy_reader', 'text': 'Комментарий',
+         'created': '2020-01-02T10:00:00+00:00'},
+        {'type': 'post', 'id': 100, 'text': 'Старый пост о котах',
+         'author': 'legacy_author', 'group': 'legacy',
+         'pub_date': '2020-01-01T10:00:00+00:00'},
+        {'type': 'post', 'id': 101, 'text': 'Еще один пост',
+         'author': 'legacy_author',
+         'pub_date': '2020-01-03T10:00:00+00:00'},
+        {'type': 'follow', 'user': 'legacy_reader',
+         'author': 'legacy_author'},
+        {'type': 'post', 'text': 'Пост без автора', 'author': 'nobody'},
+        {'type': 'comment', 'post': 999, 'author': 'legacy_reader',
+         'text': 'Комментарий к несуществующему посту'},
+        {'type': 'group', 'title': 'Плохая группа', 'slug': 'не slug',
+         'description': 'Описание'},
+        {'type': 'unknown'},
+    ]
+
+    def import_rows(self, rows, **options):
+        path = os.path.join(tempfile.mkdtemp(), 'import.ndjson')
+        with open(path, 'w', encoding='utf-8') as source:
+            for row in rows:
+                source.write(json.dumps(row, ensure_ascii=False) + '\n')
+            source.write('не json\n')
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_yatube', path, stdout=stdout, stderr=stderr,
+                     **options)
+        shutil.rmtree(os.path.dirname(path))
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_import(self):
+        '''Импорт сохраняет данные, даты и пересобирает производные'''
+        stdout, stderr = self.import_rows(self.ROWS, batch_size=2,
+                                          transaction_size=3)
+        author = User.objects.get(username='legacy_author')
+        reader = User.objects.get(username='legacy_reader')
+        post = Post.objects.get(pk=100)
+
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(post.group.slug, 'legacy')
+        self.assertEqual(post.pub_date.year, 2020)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(Comment.objects.get(pk=500).created.day, 2)
+        self.assertEqual(author.stats.followers_count, 1)
+        self.assertEqual(post.group.posts_count, 1)
+        self.assertTrue(FeedEntry.objects.filter(user=reader,
+                                                 post=post).exists())
+        self.assertEqual(
+            list(self.client.get(reverse('posts:search'),
+                                 {'q': 'кот'}).context['page_obj']),
+            [post]
+        )
+        self.assertIn('Ошибок: 5', stdout)
+        self.assertIn('строк/с', stdout)
+        for message in ('"nobody"', 'Пост 999 не найден', 'Строка 12'):
+            with self.subTest(message=message):
+                self.assertIn(message, stderr)
+
+    def test_import_is_repeatable(self):
+        '''Повторный импорт той же выгрузки не создает дублей'''
+        first, _ = self.import_rows(self.ROWS[:7], no_rebuild=True)
+        second, _ = self.import_rows(self.ROWS[:7], no_rebuild=True)
+
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertIn('post - 2, comment - 1, follow - 1', first)
+        #  Пропущенные дубликаты не считаются импортированными:
+        self.assertIn('user - 0, group - 0, post - 0, comment - 0, '
+                      'follow - 0', second)
+
+    def test_auto_now_add_kept(self):
+        '''Во время импорта auto_now_add не отключается для процесса'''
+        flags = []
+        Importer().run(
+            [json.dumps(row) for row in self.ROWS[:7]],
+            progress=lambda count: flags.append(
+                Post._meta.get_field('pub_date').auto_now_add)
+        )
+
+        self.assertEqual(flags, [True])
+        self.assertEqual(Post.objects.get(pk=100).pub_date.year, 2020)
+
+    def test_keep_dates_is_context_local(self):
+        '''Даты выгрузки сохраняются только в контексте импорта'''
+        field = Post._meta.get_field('pub_date')
+        old = timezone.now() - timedelta(days=1000)
+        with keep_dates(), ThreadPoolExecutor(max_workers=1) as executor:
+            kept = field.pre_save(Post(pub_date=old), True)
+            elsewhere = executor.submit(field.pre_save, Post(pub_date=old),
+                                        True).result()
+
+        self.assertEqual(kept, old)
+        self.assertNotEqual(elsewhere, old)
+        self.assertNotEqual(field.pre_save(Post(pub_date=old), True), old)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class TestBenchmark(TestCase):
+
+    SIZE = {'users': 15, 'posts': 60, 'groups': 3, 'comments': 2,
+            'images': 0.5, 'follows': 4, 'batch_size': 25}
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def snapshot(self):
+        return list(Post.objects.order_by('pub_date').values_list(
+            'author__username', 'group__slug', 'text', 'image'
+        ))
+
+    def test_seed_is_deterministic(self):
+        '''Один и тот же seed дает одни и те же данные'''
+        seed(seed=7, **self.SIZE)
+        first = self.snapshot()
+        clear_benchmark_data()
+        self.assertFalse(Post.objects.exists())
+        seed(seed=7, **self.SIZE)
+
+        self.assertEqual(self.snapshot(), first)
+        self.assertEqual(len(first), self.SIZE['posts'])
+        self.assertTrue(any(image for *_, image in first))
+
+    def test_seed_rebuilds_derived_data(self):
+        '''После заполнения счетчики, ленты и индекс согласованы'''
+        created = seed(**self.SIZE)
+
+        self.assertEqual(Comment.objects.count(), created['comments'])
+        for group in Group.objects.all():
+            with self.subTest(group=group.slug):
+                self.assertEqual(group.posts_count, group.posts.count())
+        reader = User.objects.order_by('-stats__following_count').first()
+        self.assertEqual(
+            FeedEntry.objects.filter(user=reader).count(),
+            Post.objects.filter(author__following__user=reader).count()
+        )
+        self.assertEqual(
+            self.client.get(reverse('posts:search'), {'q': 'кот'})
+            .status_code, 200
+        )
+
+    def test_run_benchmark(self):
+        '''run_benchmark замеряет все страницы и сохраняет JSON'''
+        seed(**self.SIZE)
+        path = os.path.join(tempfile.mkdtemp(), 'result.json')
+        stdout = StringIO()
+        call_command('run_benchmark', iterations=3, output=path,
+                     stdout=stdout)
+        call_command('run_benchmark', iterations=2, cold=True,
+                     compare=path, stdout=stdout)
+        with open(path) as source:
+            report = json.load(source)
+        shutil.rmtree(os.path.dirname(path))
+
+        self.assertEqual(report['dataset']['posts'], self.SIZE['posts'])
+        for name in ('posts:index', 'posts:group_list', 'posts:profile',
+                     'posts:post_detail', 'posts:follow_index',
+                     'posts:search', 'posts:feed_rss', 'api:post_list'):
+            with self.subTest(name=name):
+                result = report['results'][name]
+                self.assertEqual(result['statuses'], [200])
+                self.assertEqual(result['requests'], 3)
+                self.assertGreater(result['queries'], 0)
+                self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        self.assertIn('p95', stdout.getvalue())
+        self.assertIn('SQL +', stdout.getvalue())
+
+    def test_percentile(self):
+        '''Процентиль считается методом ближайшего ранга'''
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0.5), 50)
+        self.assertEqual(percentile(values, 0.95), 95)
+        self.assertEqual(percentile([3], 0.99), 3)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN есть в SQLite')
+class TestQueryPlans(TestCase):
+    '''
+    Проверка того, что запросы лент идут по составным индексам,
+    а не сортируют таблицу целиком.
+    '''
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create(username='Author')
+        cls.reader = User.objects.create(username='Reader')
+        cls.group = Group.objects.create(title='Test title',
+                                         description='Test description',
+                                         slug='test-slug'
+                                         )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(POSTS_AMOUNT + 5):
+            cls.post = Post.objects.create(text=f'Post text #{i}',
+                                           author=cls.author,
+                                           group=cls.group)
+        Comment.objects.create(post=cls.post, author=cls.reader,
+                               text='Test comment')
+
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def query_plan(self, url, table):
+        '''
+        Возвращает план сортированного запроса view к таблице table.
+        '''
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        for query in queries.captured_queries:
+            sql = query['sql']
+            if f'FROM "{table}"' in sql and 'ORDER BY' in sql:
+                with connection.cursor() as cursor:
+                    cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                    return ' '.join(row[-1] for row in cursor.fetchall())
+        self.fail(f'Страница {url} не запрашивает таблицу {table}')
+
+    def test_views_use_indexes(self):
+        for cursor_pagination in (False, True):
+            with self.subTest(cursor_pagination=cursor_pagination):
+                with override_settings(CURSOR_PAGINATION=cursor_pagination):
+                    self.check_indexes()
+
+    def check_indexes(self):
+        views = {
+            'index': (reverse('posts:index'),
+                      'posts_post', 'post_pub_date_id_idx'),
+            'group_list': (reverse('posts:group_list',
+                                   args=(self.group.slug,)),
+                           'posts_post', 'post_group_pub_date_idx'),
+            'profile': (reverse('posts:profile',
+                                args=(self.author.username,)),
+                        'posts_post', 'post_author_pub_date_idx'),
+            'post_detail': (reverse('posts:post_detail',
+                                    args=(self.post.id,)),
+                            'posts_comment', 'comment_post_created_idx'),
+            'follow_index': (reverse('posts:follow_index'),
+                             'posts_post', 'feed_user_pub_date_idx'),
+        }
+        for name, (url, table, index) in views.items():
+            with self.subTest(name=name):
+                plan = self.query_plan(url, table)
+                self.assertIn(index, plan,
+                              f'Запрос страницы {name} не использует '
+                              f'индекс {index}: {plan}')
+                self.assertNotIn('TEMP B-TREE', plan,
+                                 f'Запрос страницы {name} сортирует '
+                                 f'строки без индекса: {plan}')
@@ -0,0 +1,72 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+from core.metrics import IMAGE_PROCESSING
+from core.tasks import task
+
+THUMBNAIL_TASK_KEY = 'thumbnails:scheduled'
+
+
+@task(max_attempts=3, retry_delay=30)
+def generate_thumbnails(name):
+    '''
+    Создает миниатюры картинки во всех геометриях из
+    POST_THUMBNAILS и записывает их в хранилище ключей sorl.
+    '''
+    backend = ThumbnailBackend()
+    for geometry, options in settings.POST_THUMBNAILS:
+        started = time.perf_counter()
+        backend.get_thumbnail(name, geometry, **options)
+        IMAGE_PROCESSING.observe(time.perf_counter() - started,
+                                 geometry=geometry)
+
+
+def schedule_thumbnails(name):
+    '''
+    Ставит создание миниатюр в очередь фоновых задач, чтобы запрос
+    не ждал обработки картинки. Повторная постановка той же картинки
+    в течение TASKS_TIMEOUT пропускается.
+    '''
+    if cache.add(f'{THUMBNAIL_TASK_KEY}:{name}', 1, settings.TASKS_TIMEOUT):
+        generate_thumbnails.delay(name)
+
+
+class LookupThumbnailBackend(ThumbnailBackend):
+    '''
+    Бэкенд sorl.thumbnail для шаблонов: только ищет готовую
+    миниатюру и ничего не записывает. Если ее еще нет, отдает
+    исходную картинку: создание миниатюр ставится в очередь
+    при сохранении поста с новой картинкой (posts.signals),
+    для старых картинок - командой generate_thumbnails.
+    '''
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if not file_:
+            raise ValueError('falsey file_ argument in get_thumbnail()')
+        source = ImageFile(file_)
+        options = self._thumbnail_options(source, options)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        cached = default.kvstore.get(ImageFile(name, default.storage))
+        return cached or source
+
+    def _thumbnail_options(self, source, options):
+        '''
+        Дополняет опции так же, как ThumbnailBackend.get_thumbnail,
+        чтобы имя миниатюры совпало с созданной в фоне.
+        '''
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        return options
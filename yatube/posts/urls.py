@@ -3,18 +3,48 @@ from django.conf.urls.static import static
 from django.urls import path
 
 from . import views
+from .feeds import (AuthorAtomFeed, AuthorFeed, GroupAtomFeed, GroupFeed,
+                    LatestPostsAtomFeed, LatestPostsFeed, conditional_feed)
 
 app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('rss/', conditional_feed(LatestPostsFeed), name='feed_rss'),
+    path('atom/', conditional_feed(LatestPostsAtomFeed), name='feed_atom'),
     path('group/<slug>/', views.group_posts, name='group_list'),
+    path('group/<slug>/rss/',
+         conditional_feed(GroupFeed),
+         name='group_feed_rss'
+         ),
+    path('group/<slug>/atom/',
+         conditional_feed(GroupAtomFeed),
+         name='group_feed_atom'
+         ),
     path('profile/<username>/', views.profile, name='profile'),
+    path('profile/<username>/rss/',
+         conditional_feed(AuthorFeed),
+         name='profile_feed_rss'
+         ),
+    path('profile/<username>/atom/',
+         conditional_feed(AuthorAtomFeed),
+         name='profile_feed_atom'
+         ),
     path('posts/<post_id>/edit/', views.post_edit, name='post_edit'),
     path('posts/<post_id>/', views.post_detail, name='post_detail'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<post_id>/comment/', views.add_comment, name='add_comment'),
+    path('posts/<post_id>/comments/',
+         views.post_comments,
+         name='post_comments'
+         ),
+    path('events/', views.post_events, name='events'),
+    path('group/<slug>/events/', views.group_events, name='group_events'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('follow/events/', views.follow_events, name='follow_events'),
+    path('search/', views.search, name='search'),
+    path('search/api/', views.search_api, name='search_api'),
+    path('export/<kind>/', views.export, name='export'),
     path('profile/<username>/follow/',
          views.profile_follow,
          name='profile_follow'
@@ -1,20 +1,91 @@
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.core.cache import cache
-from django.core.paginator import Paginator
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db.models import F
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.http import quote_etag
+from django.views.decorators.http import condition
 
-from yatube.settings import POSTS_AMOUNT
-from .forms import CommentForm, PostForm
+from core.caching import get_or_recompute
+from core.metrics import UPLOAD_SIZE
+from yatube.settings import (COMMENTS_AMOUNT, INDEX_CACHE_TIMEOUT,
+                             POSTS_AMOUNT)
+from .cache import (INDEX_PAGE_KEY, STALE_ETAG, freeze_page,
+                    index_generation, index_page_key)
+from .conditional import (follow_etag, group_etag, index_etag, post_etag,
+                          profile_etag)
+from .counters import user_stats
+from .export import EXPORTS, FORMATS, export_filters, export_stream
+from .forms import CommentForm, ExportForm, PostForm
+from .live import (POSTS_CHANNEL, author_channel, group_channel,
+                   stream_response)
 from .models import Follow, Group, Post, User
+from .paginators import CursorPaginator
+from .search import search_posts
 
+#  Порядок ленты подписок: по аннотациям из записей ленты.
+FEED_ORDERING = ('-feed_pub_date', '-feed_id')
 
-def create_pages(request, posts):
+
+def create_pages(request, posts, ordering=('-pub_date', '-id')):
+    if settings.CURSOR_PAGINATION:
+        paginator = CursorPaginator(posts, POSTS_AMOUNT, ordering)
+        return paginator.get_page(request.GET.get('cursor'))
     paginator = Paginator(posts, POSTS_AMOUNT)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return page_obj
 
 
+def index_paginator(posts, version):
+    '''
+    Паджинатор главной страницы. Количество постов для номеров
+    страниц берется из кэша поколения version.
+    '''
+    if settings.CURSOR_PAGINATION:
+        return CursorPaginator(posts, POSTS_AMOUNT)
+    paginator = Paginator(posts, POSTS_AMOUNT)
+    paginator.count, _ = get_or_recompute(
+        f'{INDEX_PAGE_KEY}:count', posts.count, INDEX_CACHE_TIMEOUT,
+        version=version
+    )
+    return paginator
+
+
+def page_token(request, paginator):
+    '''
+    Возвращает то, чем страница ленты задается в ключе кэша:
+    курсор, если он разбирается, или номер существующей страницы.
+    Неверные и несуществующие ?cursor= и ?page= сводятся к тем же
+    страницам, что покажет get_page(), поэтому ключей в кэше
+    не больше, чем страниц.
+    '''
+    if isinstance(paginator, CursorPaginator):
+        cursor = request.GET.get('cursor', '')
+        position, _ = paginator.decode_cursor(cursor)
+        return cursor if position is not None else ''
+    try:
+        return paginator.validate_number(request.GET.get('page', 1))
+    except PageNotAnInteger:
+        return 1
+    except EmptyPage:
+        return paginator.num_pages
+
+
+def paginate_comments(request, comments):
+    '''
+    Возвращает очередную порцию комментариев по курсору
+    на (created, id), не подсчитывая их общее количество.
+    '''
+    paginator = CursorPaginator(comments.select_related('author'),
+                                COMMENTS_AMOUNT,
+                                ordering=('-created', '-id'))
+    return paginator.get_page(request.GET.get('cursor'))
+
+
+@condition(etag_func=index_etag)
 def index(request):
     '''
     Функция возвращает данные
@@ -22,19 +93,29 @@ def index(request):
     и выводит их через шаблон на
     главную страницу сайта.
     '''
-    posts = cache.get('index_page')
-    if not posts:
-        posts = Post.objects.all().select_related('group', 'author')
-        cache.add('index_page', posts, 20)
-    page_obj = create_pages(request, posts)
+    posts = Post.objects.all().select_related('group', 'author')
+    generation = index_generation()
+    paginator = index_paginator(posts, generation)
+    token = page_token(request, paginator)
+    page_obj, fresh = get_or_recompute(
+        index_page_key(token),
+        lambda: freeze_page(paginator.get_page(token)),
+        INDEX_CACHE_TIMEOUT, version=generation, metric=INDEX_PAGE_KEY
+    )
     template = 'posts/index.html'
     context = {
         'posts': posts,
         'page_obj': page_obj
     }
-    return render(request, template, context)
+    response = render(request, template, context)
+    if not fresh:
+        #  Страница прошлого поколения не должна получить ETag
+        #  текущего, иначе браузер будет получать 304 на старую.
+        response['ETag'] = quote_etag(STALE_ETAG)
+    return response
 
 
+@condition(etag_func=group_etag)
 def group_posts(request, slug):
     '''
     Функция собирает информацию о постах
@@ -53,16 +134,18 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+@condition(etag_func=profile_etag)
 def profile(request, username):
     author = get_object_or_404(User, username=username)
     user = request.user
     posts = author.posts.all().select_related('group', 'author')
-    posts_count = posts.count()
+    stats = user_stats(author)
     page_obj = create_pages(request, posts)
     context = {
         'posts': posts,
         'author': author,
-        'count': posts_count,
+        'count': stats.posts_count,
+        'stats': stats,
         'page_obj': page_obj
     }
     if user != author:
@@ -73,11 +156,54 @@ def profile(request, username):
     return render(request, 'posts/profile.html', context)
 
 
+def search_results(request):
+    query = request.GET.get('q', '').strip()
+    posts = search_posts(query).select_related('group', 'author')
+    paginator = Paginator(posts, POSTS_AMOUNT)
+    return query, paginator.get_page(request.GET.get('page'))
+
+
+def search(request):
+    '''
+    Полнотекстовый поиск по постам с ранжированием по релевантности.
+    '''
+    query, page_obj = search_results(request)
+    context = {
+        'query': query,
+        'page_obj': page_obj
+    }
+    return render(request, 'posts/search.html', context)
+
+
+def search_api(request):
+    query, page_obj = search_results(request)
+    return JsonResponse({
+        'query': query,
+        'count': page_obj.paginator.count,
+        'page': page_obj.number,
+        'num_pages': page_obj.paginator.num_pages,
+        'results': [
+            {
+                'id': post.id,
+                'text': post.text,
+                'author': post.author.username,
+                'group': post.group.slug if post.group else None,
+                'pub_date': post.pub_date,
+                'rank': post.rank,
+            }
+            for post in page_obj
+        ]
+    })
+
+
+@condition(etag_func=post_etag)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id
+    )
     post_title = post.text
-    posts_count = post.author.posts.all().count()
-    comments = post.comments.all()
+    posts_count = user_stats(post.author).posts_count
+    comments = paginate_comments(request, post.comments.all())
     comment_form = CommentForm()
     context = {
         'post': post,
@@ -89,6 +215,19 @@ def post_detail(request, post_id):
     return render(request, 'posts/post_detail_comments.html', context)
 
 
+def post_comments(request, post_id):
+    '''
+    Фрагмент со следующей порцией комментариев к посту
+    для подгрузки на странице поста.
+    '''
+    post = get_object_or_404(Post.objects.only('id'), pk=post_id)
+    context = {
+        'post': post,
+        'comments': paginate_comments(request, post.comments.all())
+    }
+    return render(request, 'includes/comments.html', context)
+
+
 @login_required
 def post_create(request):
     template = 'posts/create_post.html'
@@ -99,6 +238,8 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        if post.image:
+            UPLOAD_SIZE.observe(post.image.size)
         return redirect('posts:profile', username=request.user)
     context = {
         'form': form,
@@ -121,7 +262,9 @@ def post_edit(request, post_id):
         'is_edit': True,
     }
     if form.is_valid():
-        form.save()
+        post = form.save()
+        if 'image' in form.changed_data and post.image:
+            UPLOAD_SIZE.observe(post.image.size)
         return redirect('posts:post_detail', post_id=post_id)
     return render(request, template, context)
 
@@ -139,11 +282,17 @@ def add_comment(request, post_id):
 
 
 @login_required
+@condition(etag_func=follow_etag)
 def follow_index(request):
     user = request.user
-    posts = (Post.objects.filter(author__following__user=user)
-             .select_related('group', 'author'))
-    page_obj = create_pages(request, posts)
+    #  Посты идут в порядке записей ленты, чтобы и номера страниц,
+    #  и курсоры шли по индексу ленты (user, -pub_date, -id).
+    posts = (Post.objects.filter(feed_entries__user=user)
+             .select_related('group', 'author')
+             .annotate(feed_pub_date=F('feed_entries__pub_date'),
+                       feed_id=F('feed_entries__id'))
+             .order_by(*FEED_ORDERING))
+    page_obj = create_pages(request, posts, FEED_ORDERING)
     template = 'posts/follow.html'
     context = {
         'posts': posts,
@@ -169,3 +318,53 @@ def profile_unfollow(request, username):
     Follow.objects.filter(user=user,
                           author__username=username).delete()
     return redirect('posts:profile', username)
+
+
+@staff_member_required
+def export(request, kind):
+    '''
+    Потоковая выгрузка постов или комментариев в NDJSON или CSV.
+    Ответ формируется по мере чтения базы пачками.
+    '''
+    if kind not in EXPORTS:
+        raise Http404
+    form = ExportForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    options = form.cleaned_data
+    fmt = options['format'] or 'ndjson'
+    filters = export_filters(kind, options['since'], options['until'],
+                             options['author'], options['group'])
+    stream = export_stream(kind, filters, fmt, options['gzip'],
+                           settings.EXPORT_BATCH_SIZE)
+    filename = f'{kind}.{fmt}'
+    if options['gzip']:
+        response = StreamingHttpResponse(stream,
+                                         content_type='application/gzip')
+        filename += '.gz'
+    else:
+        response = StreamingHttpResponse(stream, content_type=FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def post_events(request):
+    '''
+    Поток Server-Sent Events с новыми постами всего сайта.
+    '''
+    return stream_response([POSTS_CHANNEL])
+
+
+def group_events(request, slug):
+    group = get_object_or_404(Group.objects.only('id'), slug=slug)
+    return stream_response([group_channel(group.pk)])
+
+
+@login_required
+def follow_events(request):
+    '''
+    Новые посты авторов, на которых пользователь подписан
+    в момент подключения.
+    '''
+    authors = request.user.follower.values_list('author_id', flat=True)
+    return stream_response([author_channel(pk) for pk in authors])
@@ -1,7 +1,10 @@
 from django.contrib.auth import get_user_model
+from django.core import mail
 from django.test import Client, TestCase
 from http import HTTPStatus
 
+from core.tasks import claim_jobs, run_job
+
 User = get_user_model()
 
 
@@ -123,3 +126,13 @@ class TestUserUrls(TestCase):
                                          'со страницы изменения пароля '
                                          'работает некорректно.')
                              )
+
+    def test_password_reset_email_queued(self):
+        '''Письмо сброса пароля отправляется воркером, а не в запросе'''
+        Client().post('/auth/password_reset/', {'email': 'kirill@yandex.ru'})
+
+        self.assertEqual(len(mail.outbox), 0)
+        for pk in claim_jobs(10):
+            run_job(pk)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['kirill@yandex.ru'])
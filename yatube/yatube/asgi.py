@@ -0,0 +1,20 @@
+"""
+ASGI config for yatube project.
+
+It exposes the ASGI callable as a module-level variable named ``application``,
+e.g. ``uvicorn yatube.asgi:application``.
+
+Django 2.2 has no native ASGI handler, so the WSGI application is served
+through core.asgi.WsgiToAsgi: views run in a thread pool of ASGI_THREADS
+while the event loop handles slow clients.
+"""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+from core.asgi import WsgiToAsgi  # noqa: E402
+
+application = WsgiToAsgi(get_wsgi_application())
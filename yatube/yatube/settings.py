@@ -50,11 +50,13 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
-    'debug_toolbar'
 ]
 
 MIDDLEWARE = [
+    'core.middleware.ProfilingMiddleware',
+    'core.middleware.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -62,16 +64,21 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
+if DEBUG:
+    #  Панель отладки сама замедляет каждый запрос, поэтому
+    #  подключается только при разработке.
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backends.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -81,6 +88,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
+                'core.context_processors.events.live_posts',
             ],
         },
     },
@@ -99,6 +107,18 @@ DATABASES = {
     }
 }
 
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Псевдонимы баз-реплик для чтения, например ['replica1'];
+# в DATABASES у реплики нужен 'TEST': {'MIRROR': 'default'}
+DATABASE_REPLICAS = []
+REPLICA_HEALTH_INTERVAL = 30  # Как часто перепроверять реплику, секунд
+REPLICA_STICKY_SECONDS = 5  # Сколько читать из основной базы после записи
+REPLICA_PIN_COOKIE = 'use_primary'
+
+# PRAGMA, выполняемые на каждом новом соединении с SQLite (core.db);
+# настройки для боевого сервера - в yatube/settings_production.py
+SQLITE_PRAGMAS = {}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -150,12 +170,100 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 POSTS_AMOUNT = 10   # Количество постов, выводимых на страницу
+COMMENTS_AMOUNT = 20   # Количество комментариев в одной порции
+CURSOR_PAGINATION = False  # Навигация по курсору вместо номеров страниц
+FEED_ITEMS = 20   # Записей в RSS/Atom-ленте
+FEED_CACHE_TIMEOUT = 60 * 15   # Время жизни кэша лент, секунд
+EXPORT_BATCH_SIZE = 1000   # Строк в одном запросе при выгрузке
+API_MAX_PAGE_SIZE = 100   # Максимальный размер страницы API
+FEED_DEPTH = 1000   # Сколько последних постов хранится в ленте подписок
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+INDEX_CACHE_TIMEOUT = 20  # Время жизни кэша главной страницы, секунд
+# Stale-while-revalidate (core.caching): сколько секунд после срока
+# годности запись еще отдается, пока ее пересчитывает другой запрос
+CACHE_STALE_TIMEOUT = 60
+CACHE_LOCK_TIMEOUT = 10  # Время жизни блокировки пересчета, секунд
+# Сколько секунд запрос ждет запись, которую считает другой запрос,
+# если в кэше ее еще нет, и как часто проверяет кэш
+CACHE_LOCK_WAIT = 2
+CACHE_LOCK_POLL = 0.05
+CACHE_EARLY_BETA = 1.0  # Насколько рано записи обновляются досрочно
+SEARCH_STATS_TIMEOUT = 60 * 60  # Время жизни статистики поиска, секунд
+
+THUMBNAIL_BACKEND = 'posts.thumbnails.LookupThumbnailBackend'
+# Геометрии миниатюр, используемые в шаблонах: создаются при загрузке
+POST_THUMBNAILS = [
+    ('960x339', {'crop': 'center', 'upscale': True}),
+]
+THUMBNAIL_WORKERS = 2  # Потоков для фонового создания миниатюр
+
+TASKS_ALWAYS_EAGER = False  # Выполнять фоновые задачи сразу, без очереди
+TASKS_WORKERS = 4  # Параллельных задач в одном воркере
+TASKS_POOL = 'thread'  # 'thread' или 'process'
+TASKS_POLL_INTERVAL = 1  # Пауза между опросами очереди, секунд
+TASKS_TIMEOUT = 600  # Через сколько секунд зависшая задача вернется в очередь
+TASKS_REQUEUE_INTERVAL = 60  # Как часто воркер ищет зависшие задачи, секунд
+
+# Брокер событий о новых постах (Server-Sent Events):
+# core.events.LocalBroker - внутри процесса,
+# core.events.FileBroker - общий для процессов через EVENTS_FILE.
+EVENTS_BROKER = 'core.events.LocalBroker'
+# Живые обновления лент (потоки /events/ и их подключение на страницах).
+# Включайте только при запуске через yatube.asgi: там соединение держит
+# корутина, а через WSGI каждое открытое соединение занимает поток.
+EVENTS_ENABLED = False
+EVENTS_FILE = os.path.join(BASE_DIR, 'events.log')
+EVENTS_FILE_MAX_SIZE = 1024 * 1024  # Размер, после которого файл обнуляется
+EVENTS_POLL_INTERVAL = 0.5  # Пауза между чтениями EVENTS_FILE, секунд
+EVENTS_QUEUE_SIZE = 100  # Событий в очереди одного клиента
+EVENTS_KEEPALIVE = 15  # Пауза между keepalive-комментариями, секунд
+EVENTS_MAX_AGE = 300  # Через сколько секунд поток закрывается
+EVENTS_RETRY = 3000  # Пауза перед переподключением браузера, мс
+
+SERVER_TIMING = True  # Отдавать замеры запроса в заголовке Server-Timing
+QUERY_BUDGET = None  # Максимум SQL-запросов на view, None - без ограничения
+# Бюджеты отдельных view, по имени из urls: {'posts:index': 3}
+QUERY_BUDGETS = {}
+QUERY_BUDGET_ACTION = 'log'  # 'log' - предупреждение, 'raise' - исключение
+
+# Базовые замеры страниц для posts/tests/test_performance.py,
+# обновляются командой update_performance_baseline.
+PERFORMANCE_BASELINE = os.path.join(BASE_DIR, 'posts', 'tests',
+                                    'performance_baseline.json')
+PERFORMANCE_QUERY_SLACK = 0  # Допустимый рост числа SQL-запросов
+PERFORMANCE_TIME_FACTOR = 3  # Во сколько раз может вырасти медиана времени
+PERFORMANCE_TIME_SLACK = 50  # Запас по времени сверх множителя, мс
+
+# Каталог, через который процессы-воркеры складывают метрики
+# для /metrics; None - метрики только текущего процесса
+METRICS_DIR = os.environ.get('METRICS_DIR')
+METRICS_FLUSH_INTERVAL = 5  # Как часто процесс сохраняет метрики, секунд
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # Замеры каждого запроса пишутся на уровне INFO
+        'core.profiling': {
+            'handlers': ['console'],
+            'level': os.environ.get('PROFILING_LOG_LEVEL', 'WARNING'),
+        },
+    },
+}
+
+ASGI_THREADS = 32  # Потоков для выполнения запросов в режиме ASGI
+
+# Кэш отдельный в каждом процессе. Общий для всех воркеров кэш
+# без внешнего сервиса - 'core.cache_backends.SQLiteCache' с путем
+# к файлу в LOCATION (так настроено в settings_production).
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
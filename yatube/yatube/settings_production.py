@@ -0,0 +1,84 @@
+"""
+Settings for running yatube in production.
+
+Use with DJANGO_SETTINGS_MODULE=yatube.settings_production. Everything
+that differs between deployments comes from the environment:
+
+    DJANGO_SECRET_KEY     required
+    DJANGO_ALLOWED_HOSTS  comma-separated host names
+    DJANGO_DB_PATH        path to the SQLite database file
+    DJANGO_CONN_MAX_AGE   seconds to keep a database connection open
+    DJANGO_DB_REPLICAS    comma-separated paths to SQLite read replicas,
+                          kept in sync by the sync_replicas command
+    DJANGO_CACHE_PATH     SQLite file of the cache shared by all workers
+    DJANGO_SECURE         "1" to send cookies over HTTPS only
+    DJANGO_LIVE_POSTS     "1" to enable live feed updates; only when
+                          serving through yatube.asgi
+"""
+
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from core.db import PRODUCTION_PRAGMAS
+from .settings import *  # noqa: F401,F403
+from .settings import (ALLOWED_HOSTS, BASE_DIR, DATABASES, INSTALLED_APPS,
+                       MIDDLEWARE)
+
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY')
+if not SECRET_KEY:
+    raise ImproperlyConfigured('Не задана переменная DJANGO_SECRET_KEY')
+
+DEBUG = False
+
+ALLOWED_HOSTS = [
+    host.strip()
+    for host in os.environ.get('DJANGO_ALLOWED_HOSTS',
+                               ','.join(ALLOWED_HOSTS)).split(',')
+    if host.strip()
+]
+
+# Панель отладки подключается в базовых настройках при DEBUG = True
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app != 'debug_toolbar']
+MIDDLEWARE = [middleware for middleware in MIDDLEWARE
+              if not middleware.startswith('debug_toolbar.')]
+
+DATABASES = {
+    'default': {
+        **DATABASES['default'],
+        'NAME': os.environ.get('DJANGO_DB_PATH',
+                               DATABASES['default']['NAME']),
+        # Соединение живет между запросами, а не открывается заново
+        'CONN_MAX_AGE': int(os.environ.get('DJANGO_CONN_MAX_AGE', 600)),
+    }
+}
+
+for number, path in enumerate(
+        filter(None, os.environ.get('DJANGO_DB_REPLICAS', '').split(',')),
+        start=1):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'NAME': path.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+
+SQLITE_PRAGMAS = PRODUCTION_PRAGMAS
+
+# Один кэш на все процессы: главная, ленты и сброс поколения
+# кэша постов видны каждому воркеру
+CACHES = {
+    'default': {
+        'BACKEND': 'core.cache_backends.SQLiteCache',
+        'LOCATION': os.environ.get('DJANGO_CACHE_PATH',
+                                   os.path.join(BASE_DIR, 'cache.sqlite3')),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+
+SESSION_COOKIE_SECURE = CSRF_COOKIE_SECURE = (
+    os.environ.get('DJANGO_SECURE') == '1'
+)
+SECURE_CONTENT_TYPE_NOSNIFF = True
+
+EVENTS_ENABLED = os.environ.get('DJANGO_LIVE_POSTS') == '1'